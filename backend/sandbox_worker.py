@@ -0,0 +1,751 @@
+"""Sandbox worker process for /code/run.
+
+The API server keeps a pool of these warm. Each worker reads one JSON job per
+line on stdin, forks a short-lived child to execute it under resource limits,
+and writes one JSON result per line on stdout. Forking from an already-running
+interpreter means a run never pays interpreter startup, and every run starts
+from the same clean state.
+
+The isolation boundary is the child process itself: it runs as `nobody` in an
+empty network namespace, with an empty environment and tight rlimits, so it
+holds no secrets, cannot reach the network and can only touch files any user
+could. A run refuses to start if any of that could not be set up. The audit
+hook installed on top is defence in depth only: submitted code shares the
+interpreter with it, so nothing may rely on the hook alone. For the same reason
+gradings are judged by the worker, not the child: expected answers are withheld
+from the run, which only reports raw outputs. Complexity is timed by the worker
+too, from the CPU time the kernel charged to each run.
+
+Only the standard library is used so the worker starts fast and can run with
+`python -I`.
+"""
+
+import builtins
+import io
+import json
+import math
+import os
+import resource
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Warm common modules so forked children get them for free
+import bisect  # noqa: F401
+import collections  # noqa: F401
+import functools  # noqa: F401
+import heapq  # noqa: F401
+import itertools  # noqa: F401
+import re  # noqa: F401
+import string  # noqa: F401
+
+SANDBOX_UID = 65534  # nobody
+
+# Python-level stand-in for a seccomp filter: audit events a submission may never trigger
+BLOCKED_EVENTS = frozenset({
+    "os.system", "os.exec", "os.posix_spawn", "os.spawn", "os.fork", "os.forkpty", "os.kill", "os.killpg",
+    "subprocess.Popen", "pty.spawn",
+    "socket.__new__", "socket.connect", "socket.bind", "socket.getaddrinfo", "socket.sendto",
+    "os.remove", "os.rename", "os.rmdir", "os.mkdir", "os.chmod", "os.chown", "os.truncate",
+    "os.symlink", "os.link", "os.chdir", "os.putenv", "os.unsetenv",
+    "shutil.rmtree", "shutil.copyfile", "shutil.move",
+    "ctypes.dlopen", "ctypes.dlsym", "ctypes.cdata", "ctypes.call_function",
+    "sys.addaudithook", "sys.settrace", "sys.setprofile",
+    "gc.get_objects", "gc.get_referrers", "gc.get_referents",
+    "urllib.Request", "webbrowser.open",
+})
+BLOCKED_IMPORTS = frozenset({"ctypes", "_ctypes", "cffi", "multiprocessing", "_posixsubprocess"})
+WRITE_MODES = frozenset("wax+")
+
+
+class OutputLimitExceeded(Exception):
+    pass
+
+
+class BoundedOutput(io.TextIOBase):
+    """stdout/stderr replacement that stops the run once `limit` characters were written."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.size += len(text)
+        if self.size > self.limit:
+            raise OutputLimitExceeded()
+        self.parts.append(text)
+        return len(text)
+
+    def getvalue(self):
+        return "".join(self.parts)
+
+
+PATH_EVENTS = frozenset({"open", "os.listdir", "os.scandir"})
+READABLE_FILES = frozenset({"/dev/null", "/dev/urandom"})
+
+
+def _install_audit_hook():
+    """Install the audit hook with its whole policy frozen into locals of this call.
+
+    The hook never looks at a module global, a builtin or an os.path helper at event time,
+    since submitted code can rebind all of those. Paths are normalized here without
+    touching the filesystem, and only exact str/bytes paths are trusted; anything else
+    could report one path to the hook and open another.
+    """
+    blocked_events = BLOCKED_EVENTS
+    blocked_imports = BLOCKED_IMPORTS
+    path_events = PATH_EVENTS
+    write_modes = WRITE_MODES
+    write_flags = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+    readable_files = READABLE_FILES
+    str_type, bytes_type, int_type, type_, frozenset_ = str, bytes, int, type, frozenset
+    split, join, startswith, decode = str.split, str.join, str.startswith, bytes.decode
+    denied = PermissionError
+
+    def normalize(path):
+        parts = []
+        for part in split(path, "/"):
+            if part == "..":
+                if parts:
+                    parts.pop()
+            elif part and part != ".":
+                parts.append(part)
+        return "/" + join("/", parts)
+
+    # Whatever the interpreter may import from stays readable; nothing else does
+    readable_roots = tuple(normalize(entry) + "/" for entry in sys.path if entry and entry[0] == "/")
+
+    def readable(path):
+        if type_(path) is int_type:
+            return True  # an already-open descriptor
+        if type_(path) is bytes_type:
+            path = decode(path, "utf-8", "surrogateescape")
+        if type_(path) is not str_type:
+            return False
+        path = normalize(path)
+        return path in readable_files or startswith(path + "/", readable_roots)
+
+    def hook(event, args):
+        if event in blocked_events:
+            raise denied(f"Operation not permitted in sandbox: {event}")
+        if event in path_events:
+            if event == "open":
+                mode, flags = args[1], args[2]
+                if (type_(mode) is str_type and write_modes & frozenset_(mode)) or (type_(flags) is int_type and flags & write_flags):
+                    raise denied("Writing files is not permitted in sandbox")
+            if not readable(args[0]):
+                raise denied("Reading this path is not permitted in sandbox")
+        elif event == "import" and split(args[0], ".")[0] in blocked_imports:
+            raise denied(f"Module not permitted in sandbox: {args[0]}")
+
+    sys.addaudithook(hook)
+
+
+def _isolate_network():
+    """Move the worker into an empty network namespace; forked runs inherit it.
+
+    Interpreters without os.unshare are started inside one by the server instead.
+    Failure is not fatal here: every run checks isolation again and refuses to start.
+    """
+    if hasattr(os, "unshare") and hasattr(os, "CLONE_NEWNET"):
+        try:
+            os.unshare(os.CLONE_NEWNET)
+        except OSError:
+            pass
+
+
+def _check_network_isolated():
+    if any(name != "lo" for _, name in socket.if_nameindex()):
+        raise PermissionError("network namespace isolation is unavailable")
+
+
+def _apply_limits(job):
+    cpu_seconds = max(1, math.ceil(job["timeout"]))
+    memory_bytes = job["memory_mb"] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (32, 32))
+    _check_network_isolated()
+    os.chdir("/")
+    if os.getuid() == 0:
+        os.setgroups([])
+        os.setgid(SANDBOX_UID)
+        os.setuid(SANDBOX_UID)
+    if os.getuid() != SANDBOX_UID:
+        raise PermissionError("sandbox worker must start as root to drop privileges")
+    # Only effective for non-root, hence after dropping privileges
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _describe_error(e):
+    if isinstance(e, OutputLimitExceeded):
+        return "output_limit", "Output limit exceeded"
+    if isinstance(e, MemoryError):
+        return "memory_limit", "Memory limit exceeded"
+    if isinstance(e, SyntaxError):
+        return "error", "".join(traceback.format_exception_only(type(e), e))
+    frames = [f for f in traceback.extract_tb(e.__traceback__) if f.filename == "<submission>"]
+    return "error", "".join(traceback.format_list(frames) + traceback.format_exception_only(type(e), e))
+
+
+def execute(job, output, emit):
+    """Run the submission in the current (child) process and return a result dict."""
+    # ListNode/TreeNode are predefined, as in the task statements; submissions may shadow them
+    namespace = {"__name__": "__main__", "__builtins__": builtins, "ListNode": ListNode, "TreeNode": TreeNode}
+    # Bound before the submission runs, since it can rebind time.perf_counter
+    timer = time.perf_counter
+    started = timer()
+    status, error = "ok", None
+    try:
+        exec(compile(job["code"], "<submission>", "exec"), namespace)
+    except BaseException as e:  # noqa: BLE001 - anything the submission raises is a result
+        status, error = _describe_error(e)
+    result = {"status": status, "output": output.getvalue(), "error": error}
+    if status == "ok" and job.get("mode") == "grade":
+        result.update(run_cases(namespace, job["tests"], emit, timer))
+    elif status == "ok" and job.get("mode") == "measure":
+        result.update(run_measurement(namespace, job["tests"], job["size"], job.get("baseline", False)))
+    result["time_ms"] = round((timer() - started) * 1000, 2)
+    return result
+
+
+# ---- grading ----
+
+class ListNode:
+    def __init__(self, val=0, next=None):
+        self.val = val
+        self.next = next
+
+
+class TreeNode:
+    def __init__(self, val=0, left=None, right=None):
+        self.val = val
+        self.left = left
+        self.right = right
+
+
+def build_list(values, cycle_pos=-1):
+    nodes = [ListNode(v) for v in values]
+    for node, following in zip(nodes, nodes[1:]):
+        node.next = following
+    if nodes and cycle_pos >= 0:
+        nodes[-1].next = nodes[cycle_pos]
+    return nodes[0] if nodes else None
+
+
+def list_values(head, limit=10 ** 6):
+    values = []
+    while head is not None and len(values) < limit:
+        values.append(head.val)
+        head = head.next
+    return values
+
+
+def build_tree(level_order):
+    """LeetCode-style level order (None marks a missing child) to a TreeNode."""
+    if not level_order or level_order[0] is None:
+        return None
+    values = iter(level_order)
+    root = TreeNode(next(values))
+    queue = collections.deque([root])
+    while queue:
+        node = queue.popleft()
+        for side in ("left", "right"):
+            value = next(values, None)
+            if value is not None:
+                child = TreeNode(value)
+                setattr(node, side, child)
+                queue.append(child)
+    return root
+
+
+def tree_values(root):
+    values, queue = [], collections.deque([root])
+    while queue:
+        node = queue.popleft()
+        values.append(None if node is None else node.val)
+        if node is not None:
+            queue.extend((node.left, node.right))
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+
+def _call_plain(fn, args):
+    return fn(*args)
+
+
+def _call_inplace(fn, args):
+    fn(*args)
+    return args[0]
+
+
+def _call_linked_list(fn, args):
+    result = fn(*[build_list(a) if isinstance(a, list) else a for a in args])
+    return list_values(result) if result is None or hasattr(result, "next") else result
+
+
+def _call_linked_list_cycle(fn, args):
+    values, pos = args
+    return fn(build_list(values, pos))
+
+
+def _call_tree(fn, args):
+    result = fn(*[build_tree(a) if isinstance(a, list) else a for a in args])
+    return tree_values(result) if result is None or hasattr(result, "left") else result
+
+
+def _call_design(cls, args):
+    operations, operation_args = args
+    instance = cls(*operation_args[0])
+    return [None] + [getattr(instance, op)(*op_args) for op, op_args in zip(operations[1:], operation_args[1:])]
+
+
+ADAPTERS = {
+    "plain": _call_plain,
+    "inplace": _call_inplace,
+    "linked_list": _call_linked_list,
+    "linked_list_cycle": _call_linked_list_cycle,
+    "tree": _call_tree,
+    "design": _call_design,
+}
+
+COMPARATORS = {
+    "exact": lambda actual, expected: actual == expected,
+    "unordered": lambda actual, expected: sorted(actual) == sorted(expected),
+    "unordered_groups": lambda actual, expected: (
+        sorted(sorted(group) for group in actual) == sorted(sorted(group) for group in expected)
+    ),
+}
+
+
+def _case_value(case, key):
+    # Large hidden inputs are shipped as expressions and built where they are used
+    return eval(case[key + "_expr"], {"__builtins__": builtins}) if key + "_expr" in case else case[key]
+
+
+class Opaque:
+    """Stand-in for a returned value that has no plain-data form; equal to nothing."""
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return self.text
+
+
+def encode_value(value):
+    """Plain data to JSON without losing Python types: lists stay lists, everything else is tagged."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if type(value) is list:
+        return [encode_value(item) for item in value]
+    if type(value) is tuple:
+        return {"t": [encode_value(item) for item in value]}
+    if type(value) in (set, frozenset):
+        return {"s": [encode_value(item) for item in value]}
+    if type(value) is dict:
+        return {"d": [[encode_value(k), encode_value(v)] for k, v in value.items()]}
+    return {"r": repr(value)[:200]}
+
+
+def decode_value(data):
+    if isinstance(data, list):
+        return [decode_value(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    if "t" in data:
+        return tuple(decode_value(item) for item in data["t"])
+    if "s" in data:
+        return frozenset(decode_value(item) for item in data["s"])
+    if "d" in data:
+        return {decode_value(k): decode_value(v) for k, v in data["d"]}
+    return Opaque(str(data.get("r")))
+
+
+# ---- complexity estimation ----
+
+# Candidate growth models, simplest first; ties go to the simpler model
+COMPLEXITY_CLASSES = (
+    ("O(1)", lambda n: 1.0),
+    ("O(log n)", lambda n: math.log2(n)),
+    ("O(n)", lambda n: float(n)),
+    ("O(n log n)", lambda n: n * math.log2(n)),
+    ("O(n^2)", lambda n: float(n) ** 2),
+    ("O(n^3)", lambda n: float(n) ** 3),
+)
+COMPLEXITY_RANK = {name: rank for rank, (name, _) in enumerate(COMPLEXITY_CLASSES)}
+DEFAULT_SIZES = (1000, 2000, 4000, 8000, 16000, 32000)
+MIN_SAMPLE_MS = 20  # runs faster than this are repeated and the fastest counts
+MEASURE_ROUNDS = 3
+CPU_RESOLUTION_MS = 0.25  # differences below this are fork noise, not growth
+
+
+def fit_complexity(samples):
+    """Pick the growth model whose best-fit constant gives the smallest relative error."""
+    best_name, best_error = None, None
+    for name, model in COMPLEXITY_CLASSES:
+        f = [model(n) for n, _ in samples]
+        t = [ms for _, ms in samples]
+        # Least squares on relative error: minimise sum(((c*f - t) / t)^2)
+        c = sum(fi / ti for fi, ti in zip(f, t)) / sum((fi / ti) ** 2 for fi, ti in zip(f, t))
+        error = sum((c * fi / ti - 1) ** 2 for fi, ti in zip(f, t))
+        if best_error is None or error < best_error * 0.9:
+            best_name, best_error = name, error
+    return best_name
+
+
+def judge_complexity(perf, times):
+    """Infer the growth class from one time in ms per size and check it against the budget."""
+    sizes = perf.get("sizes", DEFAULT_SIZES)
+    try:
+        samples = [(n, max(float(ms), 1e-4)) for n, ms in zip(sizes, times)]
+    except (TypeError, ValueError):
+        samples = []
+    if len(samples) < 3:
+        return {"inferred": None, "budget": perf["budget"], "within_budget": False,
+                "samples": samples, "error": "Too slow to measure growth"}
+    inferred = fit_complexity(samples)
+    return {
+        "inferred": inferred,
+        "budget": perf["budget"],
+        "within_budget": COMPLEXITY_RANK[inferred] <= COMPLEXITY_RANK[perf["budget"]],
+        "samples": [(n, round(ms, 4)) for n, ms in samples],
+    }
+
+
+def _entry(namespace, spec):
+    entry = namespace.get(spec["entry"])
+    if not callable(entry):
+        return None, {"status": "error", "error": f"Define `{spec['entry']}` to be graded."}
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    return entry, None
+
+
+def run_cases(namespace, spec, emit, timer):
+    """Run every case of `spec` against the already-executed submission in this one process.
+
+    Only raw outputs and display-only timings are emitted, one record per case as it finishes. The
+    expected answers never reach this process; judge_cases() compares in the parent.
+    """
+    entry, failure = _entry(namespace, spec)
+    if failure:
+        return failure
+    call = ADAPTERS[spec.get("adapter", "plain")]
+    for index, case in enumerate(spec["cases"]):
+        args = _case_value(case, "args")
+        shown_input = None if case.get("hidden") else repr(args)[:200]
+        actual, error = None, None
+        started = timer()
+        try:
+            actual = call(entry, list(args))
+        except BaseException as e:  # noqa: BLE001
+            error = _describe_error(e)[1]
+        record = {"case": index, "time_ms": round((timer() - started) * 1000, 2), "error": error}
+        try:
+            record["actual"] = encode_value(actual)
+        except RecursionError:
+            record["actual"] = {"r": "<too deeply nested>"}
+        if shown_input is not None:
+            record.update({"input": shown_input, "shown": repr(actual)[:200]})
+        emit(record)
+    return {}
+
+
+def run_measurement(namespace, spec, size, baseline):
+    """Call the entry once on the generated input of `size` and report its output, not its time.
+
+    A baseline run only builds the input, so the worker can subtract that cost.
+    """
+    args = list(eval(spec["performance"]["args_expr"], {"__builtins__": builtins})(size))
+    if baseline:
+        return {}
+    entry, failure = _entry(namespace, spec)
+    if failure:
+        return failure
+    try:
+        actual = ADAPTERS[spec.get("adapter", "plain")](entry, args)
+    except BaseException as e:  # noqa: BLE001
+        status, error = _describe_error(e)
+        return {"status": status, "error": error}
+    try:
+        return {"actual": encode_value(actual)}
+    except RecursionError:
+        return {"actual": {"r": "<too deeply nested>"}}
+
+
+def _text(value, limit):
+    return None if value is None else str(value)[:limit]
+
+
+def judge_cases(spec, answers, records):
+    """Compare the outputs a run reported against the answers withheld from it."""
+    compare = COMPARATORS[spec.get("compare", "exact")]
+    reports = []
+    for index, case in enumerate(spec["cases"]):
+        record = records.get(index)
+        if record is None:
+            break  # the run ended before reaching this case
+        hidden = case.get("hidden", False)
+        expected = _case_value(answers[index], "expected")
+        error = _text(record.get("error"), 2000)
+        try:
+            actual = decode_value(record.get("actual"))
+            passed = error is None and bool(compare(actual, expected))
+        except Exception:  # noqa: BLE001 - a wrongly shaped answer simply fails
+            passed = False
+        time_ms = record.get("time_ms")
+        report = {"case": index, "hidden": hidden, "passed": passed,
+                  "time_ms": time_ms if isinstance(time_ms, (int, float)) else None, "error": error}
+        if not hidden:
+            report.update({"input": _text(record.get("input"), 200), "expected": repr(expected)[:200],
+                           "actual": _text(record.get("shown"), 200)})
+        reports.append(report)
+    return reports
+
+
+def withhold_answers(spec):
+    """Remove the expected answers from `spec` so a forked run never has them in memory."""
+    return {
+        "cases": [
+            {key: case.pop(key) for key in ("expected", "expected_expr") if key in case}
+            for case in spec["cases"]
+        ],
+        "performance": spec.get("performance", {}).pop("expected_expr", None),
+    }
+
+
+def _child(job, result_fd, protocol_fds, withheld):
+    # Scrub this copy of the parent's memory before anything of the submission runs
+    withheld.clear()
+    for fd in protocol_fds:
+        os.close(fd)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    def emit(record):
+        # One JSON line per record, so finished cases survive a later timeout
+        view = memoryview((json.dumps(record) + "\n").encode())
+        while view:
+            view = view[os.write(result_fd, view):]
+
+    output = BoundedOutput(job["output_limit"])
+    try:
+        _apply_limits(job)
+        sys.stdin = io.StringIO(job.get("stdin") or "")
+        sys.stdout = sys.stderr = output
+        # Not importable by the submission as `__main__`; the hook has already captured its policy
+        _install_audit_hook()
+        del sys.modules["__main__"]
+        result = execute(job, output, emit)
+    except BaseException as e:  # noqa: BLE001
+        result = {"status": "error", "output": output.getvalue(), "error": f"Sandbox setup failed: {e}", "time_ms": 0}
+    emit(result)
+    os._exit(0)
+
+
+RESULT_STATUSES = frozenset({"ok", "error", "output_limit", "memory_limit"})
+MAX_RESULT_BYTES = 64 * 1024 * 1024
+
+
+def _fork_run(job, protocol_fds, withheld, timeout):
+    """Run `job` in a fresh child for at most `timeout` seconds.
+
+    The child writes its records to a pipe that stays open while the submission runs, so
+    nothing it reports is trusted: records only carry raw outputs, and the final record
+    is reduced to known fields. Returns (result, case records by index, the child's rusage).
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        _child(job, write_fd, protocol_fds, withheld)
+    os.close(write_fd)
+
+    # Drain the result pipe while waiting so large output never blocks the child
+    deadline = time.monotonic() + timeout
+    chunks, size, timed_out, flooded = [], 0, False, False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            os.kill(pid, signal.SIGKILL)
+            break
+        ready, _, _ = select.select([read_fd], [], [], remaining)
+        if ready:
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_RESULT_BYTES:
+                flooded = True
+                os.kill(pid, signal.SIGKILL)
+                break
+            chunks.append(chunk)
+    os.close(read_fd)
+    _, wait_status, rusage = os.wait4(pid, 0)
+
+    records = []
+    for line in b"".join(chunks).splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break  # truncated by a kill
+        if isinstance(record, dict):
+            records.append(record)
+    final = records.pop() if records and "case" not in records[-1] else None
+    # The worker's own record for a case is written after the call returns, so it comes last
+    cases = {record["case"]: record for record in records if isinstance(record.get("case"), int)}
+
+    if timed_out or (os.WIFSIGNALED(wait_status) and os.WTERMSIG(wait_status) == signal.SIGXCPU):
+        result = {"status": "timeout", "output": "", "error": f"Time limit exceeded ({job['timeout']}s)",
+                  "time_ms": round(job["timeout"] * 1000, 2)}
+    elif flooded:
+        result = {"status": "output_limit", "output": "", "error": "Output limit exceeded", "time_ms": 0}
+    elif final is None:
+        signum = os.WTERMSIG(wait_status) if os.WIFSIGNALED(wait_status) else None
+        detail = "Memory limit exceeded" if signum in (signal.SIGKILL, signal.SIGSEGV) else "Process crashed"
+        result = {"status": "crashed", "output": "", "error": detail, "time_ms": 0}
+    else:
+        time_ms = final.get("time_ms")
+        result = {
+            "status": final.get("status") if final.get("status") in RESULT_STATUSES else "error",
+            "output": _text(final.get("output"), job["output_limit"]) or "",
+            "error": _text(final.get("error"), 10000),
+            "time_ms": time_ms if isinstance(time_ms, (int, float)) else 0,
+        }
+        if "actual" in final:
+            result["actual"] = final["actual"]
+    return result, cases, rusage
+
+
+def _cpu_ms(rusage):
+    return (rusage.ru_utime + rusage.ru_stime) * 1000
+
+
+def measure_complexity(job, protocol_fds, answers, deadline):
+    """Time the submission on growing inputs; returns (complexity, failed run result, maxrss).
+
+    Every call runs in a fork of its own and is timed by the CPU time the kernel charged
+    that fork, less a baseline fork that only builds the input, so no time the run could
+    report about itself is used. Each call's output is checked against `expected_expr`,
+    so a run cannot look fast by exiting early or skipping the work. The answers are only
+    evaluated after a fork has finished, so no forked run holds them.
+    """
+    spec = job["tests"]
+    perf = spec["performance"]
+    compare = COMPARATORS[spec.get("compare", "exact")]
+    max_ms = perf.get("max_ms_per_size", 500)
+    times, memory_kb = [], 0
+
+    def fastest(size, baseline):
+        best = None
+        for _ in range(MEASURE_ROUNDS):
+            run = {**job, "mode": "measure", "size": size}
+            if baseline:
+                run.update(code="", baseline=True)
+            result, _, rusage = _fork_run(run, protocol_fds, answers, deadline - time.monotonic())
+            nonlocal memory_kb
+            memory_kb = max(memory_kb, rusage.ru_maxrss)
+            if result["status"] != "ok":
+                return None, result
+            if not baseline:
+                expected = eval(answers["performance"], {"__builtins__": builtins})(size)
+                try:
+                    correct = bool(compare(decode_value(result.get("actual")), expected))
+                except Exception:  # noqa: BLE001 - a wrongly shaped answer simply fails
+                    correct = False
+                del expected
+                if not correct:
+                    return None, {"status": "ok", "error": f"Wrong answer on the generated input of size {size}"}
+            best = _cpu_ms(rusage) if best is None else min(best, _cpu_ms(rusage))
+            if best >= MIN_SAMPLE_MS:
+                break  # long enough that fork noise does not matter
+        return best, None
+
+    for size in perf.get("sizes", DEFAULT_SIZES):
+        baseline, failure = fastest(size, True)
+        if failure is None:
+            spent, failure = fastest(size, False)
+        if failure is not None and failure["status"] != "ok":
+            return None, failure, memory_kb
+        if failure is not None:
+            return {"inferred": None, "budget": perf["budget"], "within_budget": False,
+                    "error": failure["error"]}, None, memory_kb
+        times.append(max(spent - baseline, CPU_RESOLUTION_MS))
+        if times[-1] > max_ms:
+            break  # growth is already evident; larger sizes would only burn the time limit
+    return judge_complexity(perf, times), None, memory_kb
+
+
+def run_job(job, protocol_fds):
+    """Execute one job; gradings are judged here, in a process the submission never runs in."""
+    if job.get("mode") != "grade":
+        result, _, rusage = _fork_run(job, protocol_fds, {}, job["timeout"] + 0.5)
+        result["memory_kb"] = rusage.ru_maxrss
+        return result
+
+    spec = job["tests"]
+    answers = withhold_answers(spec)
+    deadline = time.monotonic() + job["timeout"] + 0.5
+    result, records, rusage = _fork_run(job, protocol_fds, answers, deadline - time.monotonic())
+    memory_kb = rusage.ru_maxrss
+    cases = judge_cases(spec, answers["cases"], records) if result["status"] == "ok" else []
+    total = len(spec["cases"])
+    passed_cases = sum(1 for case in cases if case["passed"])
+    if passed_cases == total and "performance" in spec:
+        # Only correct solutions are timed, and only by this process
+        complexity, failed, measure_kb = measure_complexity(job, protocol_fds, answers, deadline)
+        memory_kb = max(memory_kb, measure_kb)
+        if failed:
+            result.update({key: failed[key] for key in ("status", "error")})
+        else:
+            result["complexity"] = complexity
+    result.update({
+        "cases": cases,
+        "passed_cases": passed_cases,
+        "total_cases": total,
+        "passed": (
+            result["status"] == "ok" and passed_cases == total
+            and result.get("complexity", {}).get("within_budget", True)
+        ),
+        "memory_kb": memory_kb,
+    })
+    return result
+
+
+def main():
+    # The server passes a minimal environment; runs start from an empty one
+    os.environ.clear()
+    _isolate_network()
+    # Keep the protocol on private descriptors; children get /dev/null on 0-2
+    protocol_in = os.dup(0)
+    protocol_out = os.dup(1)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    reader = os.fdopen(protocol_in, "r", encoding="utf-8")
+    writer = os.fdopen(protocol_out, "w", encoding="utf-8")
+    for line in reader:
+        try:
+            job = json.loads(line)
+            del line  # the raw job text includes the answers a forked run must not see
+            result = run_job(job, (protocol_in, protocol_out))
+        except Exception as e:  # noqa: BLE001 - report and keep the worker alive
+            result = {"status": "error", "output": "", "error": f"Sandbox failure: {e}", "time_ms": 0, "memory_kb": 0}
+        writer.write(json.dumps(result) + "\n")
+        writer.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,37 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Form, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse, JSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.formparsers import MultiPartParser
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 import os
+import sys
 import logging
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import hashlib
+from functools import lru_cache, partial
+from collections import defaultdict, deque, OrderedDict
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, NamedTuple, Tuple, AsyncIterator, BinaryIO
+from types import MappingProxyType
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
 import re
-import tempfile
+import io
+import html
+import copy
+import weakref
+import time
+import ast
+import numpy as np
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -27,6 +45,70 @@ db = client[os.environ['DB_NAME']]
 JWT_SECRET = os.environ.get('JWT_SECRET', 'default-secret-key')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 72
+# When enabled, tokens carry signed role/level/points claims that routes can trust without a DB read
+STATELESS_TOKENS = os.environ.get('STATELESS_TOKENS', 'false').lower() == 'true'
+TOKEN_CLAIMS_VERSION = 1
+
+# User cache config
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '5'))
+USER_CACHE_MAX_USERS = int(os.environ.get('USER_CACHE_MAX_USERS', '10000'))
+
+# Migration config
+MIGRATION_LEASE_SECONDS = float(os.environ.get('MIGRATION_LEASE_SECONDS', '600'))
+
+# Password hashing config
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', '256'))
+
+# Code sandbox config
+SANDBOX_WORKERS = int(os.environ.get('SANDBOX_WORKERS', str(os.cpu_count() or 2)))
+SANDBOX_TIMEOUT_SECONDS = float(os.environ.get('SANDBOX_TIMEOUT_SECONDS', '5'))
+SANDBOX_GRADE_TIMEOUT_SECONDS = float(os.environ.get('SANDBOX_GRADE_TIMEOUT_SECONDS', '10'))
+SANDBOX_MEMORY_MB = int(os.environ.get('SANDBOX_MEMORY_MB', '256'))
+SANDBOX_OUTPUT_LIMIT = int(os.environ.get('SANDBOX_OUTPUT_LIMIT', '65536'))
+GRADE_CACHE_SIZE = int(os.environ.get('GRADE_CACHE_SIZE', '2048'))
+GRADE_CACHE_TTL_SECONDS = float(os.environ.get('GRADE_CACHE_TTL_SECONDS', '3600'))
+
+# Execution job queue config
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', str(SANDBOX_WORKERS)))
+JOB_QUEUE_MAX_SUBMIT = int(os.environ.get('JOB_QUEUE_MAX_SUBMIT', '500'))
+JOB_QUEUE_MAX_RUN = int(os.environ.get('JOB_QUEUE_MAX_RUN', '200'))
+JOB_RESULT_TTL_SECONDS = float(os.environ.get('JOB_RESULT_TTL_SECONDS', '600'))
+
+# LLM provider config ("emergent" calls the hosted models, "fake" is a local deterministic stand-in)
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'emergent')
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '60'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+LLM_RETRY_BACKOFF_SECONDS = float(os.environ.get('LLM_RETRY_BACKOFF_SECONDS', '0.5'))
+LLM_FAKE_LATENCY_MS = float(os.environ.get('LLM_FAKE_LATENCY_MS', '300'))
+LLM_FAKE_TOKEN_DELAY_MS = float(os.environ.get('LLM_FAKE_TOKEN_DELAY_MS', '15'))
+LLM_CACHE_SIZE = int(os.environ.get('LLM_CACHE_SIZE', '5000'))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get('LLM_CACHE_TTL_SECONDS', '86400'))
+LLM_CACHE_SIMILARITY = float(os.environ.get('LLM_CACHE_SIMILARITY', '0.92'))
+LLM_CACHE_DISABLED_ROUTES = set(filter(None, os.environ.get('LLM_CACHE_DISABLED_ROUTES', '').split(',')))
+
+# BRO mentor config
+BRO_MEMORY_TURNS = int(os.environ.get('BRO_MEMORY_TURNS', '6'))
+# Older turns are summarized this many at a time, so long chats pay for one summary call per batch
+BRO_MEMORY_FOLD_BATCH = int(os.environ.get('BRO_MEMORY_FOLD_BATCH', str(BRO_MEMORY_TURNS)))
+BRO_MEMORY_TOKEN_BUDGET = int(os.environ.get('BRO_MEMORY_TOKEN_BUDGET', '1500'))
+BRO_DIGEST_MAX_TOKENS = int(os.environ.get('BRO_DIGEST_MAX_TOKENS', '300'))
+# Whole voice request bodies are capped at Starlette's multipart spool size (1 MiB), so the audio
+# part always stays in memory; the audio limit leaves room for boundaries, headers and form fields
+VOICE_MAX_BODY_BYTES = MultiPartParser.max_file_size
+VOICE_FORM_OVERHEAD_BYTES = 16 * 1024
+VOICE_MAX_BYTES = min(int(os.environ.get('VOICE_MAX_BYTES', str(VOICE_MAX_BODY_BYTES))),
+                      VOICE_MAX_BODY_BYTES - VOICE_FORM_OVERHEAD_BYTES)
+
+# Resume config
+RESUME_FLUSH_DELAY_SECONDS = float(os.environ.get('RESUME_FLUSH_DELAY_SECONDS', '2'))
+RESUME_FLUSH_MAX_DELAY_SECONDS = float(os.environ.get('RESUME_FLUSH_MAX_DELAY_SECONDS', '10'))
+RESUME_FLUSH_MAX_RETRIES = int(os.environ.get('RESUME_FLUSH_MAX_RETRIES', '3'))
+RESUME_ANALYSIS_CACHE_SIZE = int(os.environ.get('RESUME_ANALYSIS_CACHE_SIZE', '20000'))
+RESUME_RENDER_CACHE_DIR = Path(os.environ.get('RESUME_RENDER_CACHE_DIR', str(ROOT_DIR / '.render_cache')))
+RESUME_RENDER_CACHE_MAX_BYTES = int(os.environ.get('RESUME_RENDER_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+RESUME_ANALYSIS_CACHE_TTL_SECONDS = float(os.environ.get('RESUME_ANALYSIS_CACHE_TTL_SECONDS', str(7 * 86400)))
 
 # Create the main app
 app = FastAPI()
@@ -81,6 +163,7 @@ class ChatMessage(BaseModel):
 class CodeRunRequest(BaseModel):
     code: str
     task_id: Optional[str] = None
+    measure_complexity: bool = False
 
 class ResumeCreate(BaseModel):
     company: str
@@ -90,6 +173,16 @@ class ResumeCreate(BaseModel):
 class ResumeUpdate(BaseModel):
     content: Dict[str, Any]
     template: Optional[str] = None
+    revision: Optional[int] = None  # when set, the update only applies to this revision
+
+class ResumePatch(BaseModel):
+    content: Dict[str, Any] = {}  # top-level sections to replace; null removes a section
+    template: Optional[str] = None
+    revision: Optional[int] = None
+
+class ResumeDelta(BaseModel):
+    revision: int
+    ops: List[Dict[str, Any]] = Field(..., max_length=200)  # RFC 6902 operations against the resume content
 
 class LinkedInDraftRequest(BaseModel):
     topic: str
@@ -105,30 +198,158 @@ class StreakUpdate(BaseModel):
 # ============ AUTH HELPERS ============
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
 
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode(), hashed.encode())
 
-def create_token(user_id: str, email: str) -> str:
+def password_needs_rehash(hashed: str) -> bool:
+    # bcrypt hashes look like $2b$<rounds>$<salt+digest>
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated thread pool so it never blocks the event loop."""
+    
+    def __init__(self, workers: int, max_pending: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+    
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many sign-ins right now. Please retry in a moment.")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+    
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+    
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(verify_password, password, hashed)
+    
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
+
+# Fields the stateless fast path may answer from token claims alone
+TOKEN_CLAIM_FIELDS = frozenset({"id", "role", "level"})
+TOKEN_VERSION_FIELDS = frozenset({"id", "token_version"})
+# Role that may use operational endpoints such as /metrics; only ever checked against the database
+ADMIN_ROLE = "admin"
+
+def create_token(user_id: str, email: str, user: Optional[dict] = None) -> str:
+    """Sign a session token; `user` supplies token_version and, in stateless mode, the role/level claims.
+    
+    Any write that changes a claimed field must bump token_version, or older tokens keep the stale claim.
+    """
+    user = user or {}
     payload = {
         "user_id": user_id,
         "email": email,
+        "tv": user.get("token_version", 0),
         "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
     }
+    if STATELESS_TOKENS and user:
+        payload["claims"] = {
+            "v": TOKEN_CLAIMS_VERSION,
+            "role": user.get("role"),
+            "level": user.get("level", "Beginner"),
+        }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        user = await db.users.find_one({"id": payload["user_id"]}, {"_id": 0})
+# user_id -> {projected field set: (expires_at, user doc)}
+_user_cache: Dict[str, Dict[Optional[frozenset], tuple]] = {}
+
+def invalidate_user_cache(user_id: str) -> None:
+    """Drop every cached projection of a user. Call after any write to the user document."""
+    _user_cache.pop(user_id, None)
+
+def _prune_user_cache(now: float) -> None:
+    for user_id in [uid for uid, entries in _user_cache.items() if all(exp <= now for exp, _ in entries.values())]:
+        del _user_cache[user_id]
+    if len(_user_cache) >= USER_CACHE_MAX_USERS:
+        _user_cache.clear()
+
+async def load_user(user_id: str, fields: Optional[frozenset] = None) -> Optional[dict]:
+    """Load a user with a projection on `fields` (all fields except password_hash when None), via the TTL cache."""
+    now = time.monotonic()
+    cached = _user_cache.get(user_id, {}).get(fields)
+    if cached and cached[0] > now:
+        return cached[1]
+    
+    if fields is None:
+        projection = {"_id": 0, "password_hash": 0}
+    else:
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+    user = await db.users.find_one({"id": user_id}, projection)
+    if user and USER_CACHE_TTL_SECONDS > 0:
+        if user_id not in _user_cache and len(_user_cache) >= USER_CACHE_MAX_USERS:
+            _prune_user_cache(now)
+        _user_cache.setdefault(user_id, {})[fields] = (now + USER_CACHE_TTL_SECONDS, user)
+    return user
+
+def current_user(*fields: str):
+    """Build an auth dependency that loads only `fields` (plus id) of the current user."""
+    field_set = frozenset(fields) | TOKEN_VERSION_FIELDS if fields else None
+    claims_only = bool(fields) and frozenset(fields) <= TOKEN_CLAIM_FIELDS
+    
+    async def dependency(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        try:
+            payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Token expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        
+        claims = payload.get("claims")
+        if claims_only and STATELESS_TOKENS and claims and claims.get("v") == TOKEN_CLAIMS_VERSION:
+            # Fast path: only the (cached) token_version is read, to honour revocation
+            user = await load_user(payload["user_id"], TOKEN_VERSION_FIELDS)
+            if user:
+                user = {"id": user["id"], "token_version": user.get("token_version", 0),
+                        "role": claims.get("role"), "level": claims.get("level")}
+        else:
+            user = await load_user(payload["user_id"], field_set)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
+        if user.get("token_version", 0) != payload.get("tv", 0):
+            raise HTTPException(status_code=401, detail="Token revoked")
         return user
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    return dependency
+
+async def require_admin(user: dict = Depends(current_user("id"))) -> dict:
+    """Auth dependency for operational routes.
+    
+    The role is read from the database on every call, never from token claims or the user cache,
+    so granting or revoking admin takes effect immediately.
+    """
+    stored = await db.users.find_one({"id": user["id"]}, {"_id": 0, "role": 1})
+    if not stored or stored.get("role") != ADMIN_ROLE:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
 
 # ============ DSA TRACK DATA ============
 
@@ -1137,6 +1358,391 @@ X_train, X_test, y_train, y_test = train_test_split(
     }
 }
 
+# ============ TASK TEST SUITES ============
+
+# Kept apart from the track data so hidden cases are never sent to clients.
+# Cases give `args`/`expected` as JSON, or `args_expr`/`expected_expr` evaluated by the
+# sandbox worker for large hidden inputs. `performance` generates inputs of growing size
+# with `args_expr`; `expected_expr` gives their answers, so timed runs have to be correct too.
+# Bump `version` whenever a suite changes.
+TASK_TESTS = {
+    "arr-001": {
+        "version": 2, "entry": "two_sum", "compare": "unordered",
+        "cases": [
+            {"args": [[2, 7, 11, 15], 9], "expected": [0, 1]},
+            {"args": [[3, 2, 4], 6], "expected": [1, 2]},
+            {"args": [[3, 3], 6], "expected": [0, 1]},
+            {"args_expr": "(list(range(1, 100001)), 199999)", "expected": [99998, 99999], "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: (list(range(1, n + 1)), 2 * n - 1)",
+                        "expected_expr": "lambda n: [n - 2, n - 1]"}
+    },
+    "arr-002": {
+        "version": 2, "entry": "max_subarray",
+        "cases": [
+            {"args": [[-2, 1, -3, 4, -1, 2, 1, -5, 4]], "expected": 6},
+            {"args": [[1]], "expected": 1},
+            {"args": [[5, 4, -1, 7, 8]], "expected": 23},
+            {"args_expr": "([-1] * 100000,)", "expected": -1, "hidden": True},
+            {"args_expr": "([-3] * 50000 + [2] * 50000,)", "expected": 100000, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ([-1, 2] * (n // 2),)",
+                        "expected_expr": "lambda n: n // 2 + 1"}
+    },
+    "arr-003": {
+        "version": 2, "entry": "contains_duplicate",
+        "cases": [
+            {"args": [[1, 2, 3, 1]], "expected": True},
+            {"args": [[1, 2, 3, 4]], "expected": False},
+            {"args_expr": "(list(range(100000)),)", "expected": False, "hidden": True},
+            {"args_expr": "(list(range(100000)) + [99999],)", "expected": True, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: (list(range(n)),)",
+                        "expected_expr": "lambda n: False"}
+    },
+    "arr-004": {
+        "version": 2, "entry": "product_except_self",
+        "cases": [
+            {"args": [[1, 2, 3, 4]], "expected": [24, 12, 8, 6]},
+            {"args": [[-1, 1, 0, -3, 3]], "expected": [0, 0, 9, 0, 0]},
+            {"args_expr": "([2] + [1] * 99999,)", "expected_expr": "[1] + [2] * 99999", "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ([1] * n,)",
+                        "expected_expr": "lambda n: [1] * n"}
+    },
+    "arr-005": {
+        "version": 2, "entry": "rotate", "adapter": "inplace",
+        "cases": [
+            {"args": [[1, 2, 3, 4, 5, 6, 7], 3], "expected": [5, 6, 7, 1, 2, 3, 4]},
+            {"args": [[-1, -100, 3, 99], 2], "expected": [3, 99, -1, -100]},
+            {"args": [[1, 2], 3], "expected": [2, 1]},
+            {"args_expr": "(list(range(100000)), 3)", "expected_expr": "list(range(99997, 100000)) + list(range(99997))", "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: (list(range(n)), n // 2)",
+                        "expected_expr": "lambda n: list(range(n - n // 2, n)) + list(range(n - n // 2))"}
+    },
+    "str-001": {
+        "version": 2, "entry": "is_palindrome",
+        "cases": [
+            {"args": ["A man, a plan, a canal: Panama"], "expected": True},
+            {"args": ["race a car"], "expected": False},
+            {"args": [" "], "expected": True},
+            {"args_expr": "('ab' * 100000 + 'ba' * 100000,)", "expected": True, "hidden": True},
+            {"args_expr": "('a, ' * 100000 + 'b',)", "expected": False, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ('ab' * n + 'ba' * n,)",
+                        "expected_expr": "lambda n: True"}
+    },
+    "str-002": {
+        "version": 2, "entry": "is_anagram",
+        "cases": [
+            {"args": ["anagram", "nagaram"], "expected": True},
+            {"args": ["rat", "car"], "expected": False},
+            {"args_expr": "('abc' * 100000, 'cba' * 100000)", "expected": True, "hidden": True},
+            {"args_expr": "('a' * 100000, 'a' * 99999 + 'b')", "expected": False, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ('abc' * n, 'cba' * n)",
+                        "expected_expr": "lambda n: True"}
+    },
+    "str-003": {
+        "version": 2, "entry": "length_of_longest_substring",
+        "cases": [
+            {"args": ["abcabcbb"], "expected": 3},
+            {"args": ["bbbbb"], "expected": 1},
+            {"args": ["pwwkew"], "expected": 3},
+            {"args": [""], "expected": 0},
+            {"args_expr": "(''.join(chr(97 + i % 26) for i in range(100000)),)", "expected": 26, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: (''.join(chr(0x4e00 + i) for i in range(n)),)",
+                        "expected_expr": "lambda n: n"}
+    },
+    "str-004": {
+        "version": 1, "entry": "group_anagrams", "compare": "unordered_groups",
+        "cases": [
+            {"args": [["eat", "tea", "tan", "ate", "nat", "bat"]], "expected": [["bat"], ["nat", "tan"], ["ate", "eat", "tea"]]},
+            {"args": [[""]], "expected": [[""]]},
+            {"args_expr": "(['abc', 'bca', 'cab', 'xyz'] * 5000,)", "expected_expr": "[['abc', 'bca', 'cab'] * 5000, ['xyz'] * 5000]", "hidden": True},
+        ]
+    },
+    "ll-001": {
+        "version": 1, "entry": "reverse_list", "adapter": "linked_list",
+        "cases": [
+            {"args": [[1, 2, 3, 4, 5]], "expected": [5, 4, 3, 2, 1]},
+            {"args": [[]], "expected": []},
+            {"args_expr": "(list(range(5000)),)", "expected_expr": "list(range(4999, -1, -1))", "hidden": True},
+        ]
+    },
+    "ll-002": {
+        "version": 2, "entry": "has_cycle", "adapter": "linked_list_cycle",
+        "cases": [
+            {"args": [[3, 2, 0, -4], 1], "expected": True},
+            {"args": [[1], -1], "expected": False},
+            {"args_expr": "(list(range(100000)), 0)", "expected": True, "hidden": True},
+            {"args_expr": "(list(range(100000)), -1)", "expected": False, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: (list(range(n)), 0)",
+                        "expected_expr": "lambda n: True"}
+    },
+    "ll-003": {
+        "version": 1, "entry": "merge_two_lists", "adapter": "linked_list",
+        "cases": [
+            {"args": [[1, 2, 4], [1, 3, 4]], "expected": [1, 1, 2, 3, 4, 4]},
+            {"args": [[], [0]], "expected": [0]},
+            {"args_expr": "(list(range(0, 10000, 2)), list(range(1, 10000, 2)))", "expected_expr": "list(range(10000))", "hidden": True},
+        ]
+    },
+    "sq-001": {
+        "version": 2, "entry": "is_valid",
+        "cases": [
+            {"args": ["()[]{}"], "expected": True},
+            {"args": ["(]"], "expected": False},
+            {"args": ["([)]"], "expected": False},
+            {"args_expr": "('([{}])' * 30000,)", "expected": True, "hidden": True},
+            {"args_expr": "('(' * 100000,)", "expected": False, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ('([{}])' * n,)",
+                        "expected_expr": "lambda n: True"}
+    },
+    "sq-002": {
+        "version": 1, "entry": "MinStack", "adapter": "design",
+        "cases": [
+            {
+                "args": [["MinStack", "push", "push", "push", "getMin", "pop", "top", "getMin"], [[], [-2], [0], [-3], [], [], [], []]],
+                "expected": [None, None, None, None, -3, None, 0, -2]
+            },
+            {
+                "args_expr": "(['MinStack'] + ['push'] * 50000 + ['getMin'], [[]] + [[i] for i in range(50000, 0, -1)] + [[]])",
+                "expected_expr": "[None] * 50001 + [1]",
+                "hidden": True
+            },
+        ]
+    },
+    "tree-001": {
+        "version": 1, "entry": "max_depth", "adapter": "tree",
+        "cases": [
+            {"args": [[3, 9, 20, None, None, 15, 7]], "expected": 3},
+            {"args": [[1, None, 2]], "expected": 2},
+            {"args": [[]], "expected": 0},
+            {"args_expr": "(list(range(2 ** 14 - 1)),)", "expected": 14, "hidden": True},
+        ]
+    },
+    "tree-002": {
+        "version": 1, "entry": "invert_tree", "adapter": "tree",
+        "cases": [
+            {"args": [[4, 2, 7, 1, 3, 6, 9]], "expected": [4, 7, 2, 9, 6, 3, 1]},
+            {"args": [[2, 1, 3]], "expected": [2, 3, 1]},
+            {
+                "args_expr": "(list(range(2 ** 12 - 1)),)",
+                "expected_expr": "[v for d in range(12) for v in reversed(range(2 ** d - 1, 2 ** (d + 1) - 1))]",
+                "hidden": True
+            },
+        ]
+    },
+    "tree-003": {
+        "version": 1, "entry": "is_valid_bst", "adapter": "tree",
+        "cases": [
+            {"args": [[2, 1, 3]], "expected": True},
+            {"args": [[5, 1, 4, None, None, 3, 6]], "expected": False},
+            {"args": [[5, 4, 6, None, None, 3, 7]], "expected": False},
+            {"args_expr": "([v for i in range(2000) for v in (None, i)][1:],)", "expected": True, "hidden": True},
+        ]
+    },
+    "dp-001": {
+        "version": 1, "entry": "climb_stairs",
+        "cases": [
+            {"args": [2], "expected": 2},
+            {"args": [3], "expected": 3},
+            {"args": [5], "expected": 8},
+            {"args": [70], "expected": 308061521170129, "hidden": True},
+        ]
+    },
+    "dp-002": {
+        "version": 2, "entry": "rob",
+        "cases": [
+            {"args": [[1, 2, 3, 1]], "expected": 4},
+            {"args": [[2, 7, 9, 3, 1]], "expected": 12},
+            {"args_expr": "([1] * 100000,)", "expected": 50000, "hidden": True},
+            {"args_expr": "([2, 1] * 50000,)", "expected": 100000, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ([i % 2 for i in range(n)],)",
+                        "expected_expr": "lambda n: n // 2"}
+    },
+    "dp-003": {
+        "version": 2, "entry": "coin_change",
+        "cases": [
+            {"args": [[1, 2, 5], 11], "expected": 3},
+            {"args": [[2], 3], "expected": -1},
+            {"args": [[1], 0], "expected": 0},
+            {"args": [[1, 5, 10, 25], 10000], "expected": 400, "hidden": True},
+            {"args": [[3, 7], 10001], "expected": 1431, "hidden": True},
+        ],
+        "performance": {"budget": "O(n log n)", "args_expr": "lambda n: ([1, 5, 10, 25], n)",
+                        "expected_expr": "lambda n: n // 25 + n % 25 // 10 + n % 25 % 10 // 5 + n % 5"}
+    },
+}
+
+# ============ CATALOG INDEX ============
+
+SKILL_DOMAINS = {
+    "dsa": DSA_TRACKS,
+    "analytics": DATA_ANALYTICS_TRACKS,
+    "datascience": DATA_SCIENCE_TRACKS,
+    "ml": ML_TRACKS,
+}
+
+class CatalogEntry(NamedTuple):
+    domain: str
+    track_id: str
+    task: Dict[str, Any]
+
+def _build_catalog_index():
+    """Index every task once at import so lookups never scan the track data."""
+    task_index: Dict[str, CatalogEntry] = {}
+    tracks_by_id: Dict[str, Dict[str, Any]] = {}
+    track_tasks: Dict[str, Tuple[Dict[str, Any], ...]] = {}
+    domain_totals: Dict[str, int] = {}
+    for domain, tracks in SKILL_DOMAINS.items():
+        domain_totals[domain] = 0
+        for track_id, track in tracks.items():
+            if track_id in track_tasks:
+                raise RuntimeError(f"Duplicate track id in catalog: {track_id}")
+            tracks_by_id[track_id] = track
+            track_tasks[track_id] = tuple(track["tasks"])
+            domain_totals[domain] += len(track["tasks"])
+            for task in track["tasks"]:
+                if task["id"] in task_index:
+                    raise RuntimeError(f"Duplicate task id in catalog: {task['id']}")
+                task_index[task["id"]] = CatalogEntry(domain, track_id, task)
+    return (MappingProxyType(task_index), MappingProxyType(tracks_by_id),
+            MappingProxyType(track_tasks), MappingProxyType(domain_totals))
+
+TASK_INDEX, TRACKS_BY_ID, TRACK_TASKS, DOMAIN_TOTALS = _build_catalog_index()
+
+for _task_id in TASK_TESTS:
+    if _task_id not in TASK_INDEX:
+        raise RuntimeError(f"Test suite for unknown task: {_task_id}")
+TASK_FIELDS = frozenset(field for entry in TASK_INDEX.values() for field in entry.task)
+TASK_SUMMARY_FIELDS = ("id", "title", "type", "difficulty", "points")
+
+# Static per-track listing metadata, ordered, per domain
+DOMAIN_TRACK_LISTS = MappingProxyType({
+    domain: tuple(sorted(
+        ({
+            "id": track_id,
+            "name": track["name"],
+            "description": track["description"],
+            "order": track.get("order", 0),
+            "total_tasks": len(track["tasks"]),
+        } for track_id, track in tracks.items()),
+        key=lambda meta: meta["order"],
+    ))
+    for domain, tracks in SKILL_DOMAINS.items()
+})
+
+def count_completed_by_domain(progress: Dict[str, Any]) -> Dict[str, int]:
+    counts = dict.fromkeys(SKILL_DOMAINS, 0)
+    for task_id, task_progress in progress.items():
+        entry = TASK_INDEX.get(task_id)
+        if entry and task_progress.get("completed"):
+            counts[entry.domain] += 1
+    return counts
+
+def count_completed_by_track(progress: Dict[str, Any]) -> Dict[str, int]:
+    counts = dict.fromkeys(TRACKS_BY_ID, 0)
+    for task_id, task_progress in progress.items():
+        entry = TASK_INDEX.get(task_id)
+        if entry and task_progress.get("completed"):
+            counts[entry.track_id] += 1
+    return counts
+
+# ============ ENCODED CATALOG RESPONSES ============
+
+def encode_json(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+class EncodedTrack(NamedTuple):
+    head: bytes  # '{"id":..,"total_tasks":N,"completed_tasks":'
+    tasks: Tuple[Tuple[str, bytes], ...]  # (task_id, task JSON without its closing brace)
+    digest: str
+
+@lru_cache(maxsize=512)
+def encode_track(track_id: str, fields: Optional[Tuple[str, ...]] = None) -> EncodedTrack:
+    """Encode the static part of a track (optionally only `fields` of each task) once per field set."""
+    track = TRACKS_BY_ID[track_id]
+    head = encode_json({
+        "id": track_id,
+        "name": track["name"],
+        "description": track["description"],
+        "total_tasks": len(track["tasks"]),
+    })[:-1] + b',"completed_tasks":'
+    tasks = tuple(
+        (task["id"], encode_json(task if fields is None else {k: v for k, v in task.items() if k in fields})[:-1])
+        for task in track["tasks"]
+    )
+    digest = hashlib.sha256(head + b"".join(body for _, body in tasks)).hexdigest()[:16]
+    return EncodedTrack(head, tasks, digest)
+
+# Warm the full and summary encodings at startup
+for _track_id in TRACKS_BY_ID:
+    encode_track(_track_id)
+    encode_track(_track_id, TASK_SUMMARY_FIELDS)
+
+ENCODED_TASKS = MappingProxyType({
+    task_id: (body, track.digest)
+    for track in map(encode_track, TRACKS_BY_ID) for task_id, body in track.tasks
+})
+
+def resolve_task_fields(view: str, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Map the `view`/`fields` query params to the task field set to encode (None means every field)."""
+    if fields:
+        requested = {field.strip() for field in fields.split(",") if field.strip()} | {"id"}
+        unknown = requested - TASK_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown task fields: {sorted(unknown)}")
+        return tuple(sorted(requested))
+    if view == "summary":
+        return TASK_SUMMARY_FIELDS
+    if view == "full":
+        return None
+    raise HTTPException(status_code=400, detail="Invalid view. Choose from: ['full', 'summary']")
+
+def _progress_overlay(task_progress: Dict[str, Any]) -> bytes:
+    completed = b"true" if task_progress.get("completed", False) else b"false"
+    return b',"completed":' + completed + b',"attempts":' + str(task_progress.get("attempts", 0)).encode() + b"}"
+
+def _make_etag(digest: str, overlay: bytes) -> str:
+    return f'"{digest}-{hashlib.blake2b(overlay, digest_size=8).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(",")))
+
+def etag_response(request: Request, body: bytes, etag: str, media_type: str = "application/json",
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a pre-encoded body with a strong ETag, answering 304 when If-None-Match already has it."""
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+def encoded_track_response(request: Request, track_id: str, progress: Dict[str, Any],
+                           fields: Optional[Tuple[str, ...]] = None) -> Response:
+    track = encode_track(track_id, fields)
+    overlays = [_progress_overlay(progress.get(task_id, {})) for task_id, _ in track.tasks]
+    completed = sum(1 for task_id, _ in track.tasks if progress.get(task_id, {}).get("completed", False))
+    overlay = str(completed).encode() + b"".join(overlays)
+    body = b"".join([
+        track.head, str(completed).encode(), b',"tasks":[',
+        b",".join(task_body + task_overlay for (_, task_body), task_overlay in zip(track.tasks, overlays)),
+        b"]}",
+    ])
+    return etag_response(request, body, _make_etag(track.digest, overlay))
+
+def encoded_task_response(request: Request, task_id: str, progress: Dict[str, Any]) -> Response:
+    task_body, digest = ENCODED_TASKS[task_id]
+    overlay = _progress_overlay(progress.get(task_id, {}))
+    return etag_response(request, task_body + overlay, _make_etag(digest, overlay))
+
 # ============ JOB TRENDS DATA ============
 
 JOB_TRENDS = [
@@ -1235,7 +1841,7 @@ async def register(user: UserCreate):
         "id": user_id,
         "email": user.email.lower(),
         "name": user.name,
-        "password_hash": hash_password(user.password),
+        "password_hash": await password_hasher.hash(user.password),
         "role": None,
         "points": 0,
         "level": "Beginner",
@@ -1243,11 +1849,11 @@ async def register(user: UserCreate):
         "progress": {},
         "weekly_activity": {"dsa": 0, "github": 0, "linkedin": 0},
         "streak": {"current": 0, "longest": 0, "last_activity": None},
-        "resumes": []
+        "token_version": 0
     }
     
     await db.users.insert_one(user_doc)
-    token = create_token(user_id, user.email)
+    token = create_token(user_id, user_doc["email"], user_doc)
     
     return {
         "token": token,
@@ -1256,11 +1862,19 @@ async def register(user: UserCreate):
 
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email.lower()}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    user = await db.users.find_one(
+        {"email": credentials.email.lower()},
+        {"_id": 0, "id": 1, "email": 1, "name": 1, "role": 1, "points": 1, "level": 1, "token_version": 1, "password_hash": 1}
+    )
+    if not user or not await password_hasher.verify(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    token = create_token(user["id"], user["email"])
+    # Transparently upgrade hashes made with a different work factor
+    if password_needs_rehash(user["password_hash"]):
+        new_hash = await password_hasher.hash(credentials.password)
+        await db.users.update_one({"id": user["id"]}, {"$set": {"password_hash": new_hash}})
+    
+    token = create_token(user["id"], user["email"], user)
     return {
         "token": token,
         "user": {"id": user["id"], "email": user["email"], "name": user["name"], "role": user.get("role"), "points": user.get("points", 0), "level": user.get("level", "Beginner")}
@@ -1269,7 +1883,7 @@ async def login(credentials: UserLogin):
 # ============ USER ROUTES ============
 
 @api_router.get("/users/profile")
-async def get_profile(user: dict = Depends(get_current_user)):
+async def get_profile(user: dict = Depends(current_user("email", "name", "role", "points", "level", "progress", "weekly_activity", "streak"))):
     return {
         "id": user["id"],
         "email": user["email"],
@@ -1280,20 +1894,36 @@ async def get_profile(user: dict = Depends(get_current_user)):
         "progress": user.get("progress", {}),
         "weekly_activity": user.get("weekly_activity", {}),
         "streak": user.get("streak", {"current": 0, "longest": 0}),
-        "resumes": user.get("resumes", [])
+        "resumes": await find_user_resumes(user["id"])
     }
 
 @api_router.put("/users/role")
-async def update_role(role_data: RoleUpdate, user: dict = Depends(get_current_user)):
+async def update_role(role_data: RoleUpdate, user: dict = Depends(current_user("id"))):
     valid_roles = ["SDE", "Data Analyst", "Data Scientist", "ML Engineer"]
     if role_data.role not in valid_roles:
         raise HTTPException(status_code=400, detail=f"Invalid role. Choose from: {valid_roles}")
     
-    await db.users.update_one({"id": user["id"]}, {"$set": {"role": role_data.role}})
-    return {"message": "Role updated", "role": role_data.role}
+    update = {"$set": {"role": role_data.role}}
+    if STATELESS_TOKENS:
+        # Bump token_version so tokens still claiming the old role stop being accepted
+        update["$inc"] = {"token_version": 1}
+    updated = await db.users.find_one_and_update(
+        {"id": user["id"]},
+        update,
+        projection={"_id": 0, "id": 1, "email": 1, "role": 1, "level": 1, "points": 1, "token_version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_user_cache(user["id"])
+    return {"message": "Role updated", "role": role_data.role, "token": create_token(updated["id"], updated["email"], updated)}
+
+@api_router.post("/auth/logout-all")
+async def logout_all_sessions(user: dict = Depends(current_user("id"))):
+    await db.users.update_one({"id": user["id"]}, {"$inc": {"token_version": 1}})
+    invalidate_user_cache(user["id"])
+    return {"message": "All sessions signed out"}
 
 @api_router.post("/users/streak")
-async def update_streak(streak_data: StreakUpdate, user: dict = Depends(get_current_user)):
+async def update_streak(streak_data: StreakUpdate, user: dict = Depends(current_user("streak"))):
     current_streak = user.get("streak", {"current": 0, "longest": 0, "last_activity": None})
     last_activity = current_streak.get("last_activity")
     today = datetime.now(timezone.utc).date().isoformat()
@@ -1318,189 +1948,530 @@ async def update_streak(streak_data: StreakUpdate, user: dict = Depends(get_curr
         {"id": user["id"]},
         {"$set": {"streak": new_streak}, "$inc": {activity_key: 1}}
     )
+    invalidate_user_cache(user["id"])
     
     return {"message": "Streak updated!", "streak": new_streak}
 
 # ============ SKILLS ROUTES ============
 
-@api_router.get("/skills/dsa")
-async def get_dsa_tracks(user: dict = Depends(get_current_user)):
-    tracks = []
-    for key, track in DSA_TRACKS.items():
-        user_progress = user.get("progress", {})
-        completed = sum(1 for t in track["tasks"] if user_progress.get(t["id"], {}).get("completed", False))
-        tracks.append({
-            "id": key,
-            "name": track["name"],
-            "description": track["description"],
-            "order": track["order"],
-            "total_tasks": len(track["tasks"]),
-            "completed_tasks": completed
-        })
-    return {"tracks": sorted(tracks, key=lambda x: x["order"])}
-
-@api_router.get("/skills/dsa/{track_id}")
-async def get_dsa_track(track_id: str, user: dict = Depends(get_current_user)):
-    if track_id not in DSA_TRACKS:
+def get_domain_tracks(domain: str) -> Dict[str, Any]:
+    if domain not in SKILL_DOMAINS:
+        raise HTTPException(status_code=404, detail="Domain not found")
+    return SKILL_DOMAINS[domain]
+
+@api_router.get("/skills/{domain}")
+async def get_tracks(domain: str, user: dict = Depends(current_user("progress"))):
+    get_domain_tracks(domain)
+    completed = count_completed_by_track(user.get("progress", {}))
+    return {"tracks": [{**meta, "completed_tasks": completed[meta["id"]]} for meta in DOMAIN_TRACK_LISTS[domain]]}
+
+@api_router.get("/skills/{domain}/{track_id}")
+async def get_track(domain: str, track_id: str, request: Request, view: str = "full", fields: Optional[str] = None,
+                    user: dict = Depends(current_user("progress"))):
+    if track_id not in get_domain_tracks(domain):
         raise HTTPException(status_code=404, detail="Track not found")
     
-    track = DSA_TRACKS[track_id]
-    user_progress = user.get("progress", {})
-    
-    tasks_with_progress = []
-    for task in track["tasks"]:
-        task_copy = task.copy()
-        task_copy["completed"] = user_progress.get(task["id"], {}).get("completed", False)
-        task_copy["attempts"] = user_progress.get(task["id"], {}).get("attempts", 0)
-        tasks_with_progress.append(task_copy)
-    
-    return {
-        "id": track_id,
-        "name": track["name"],
-        "description": track["description"],
-        "total_tasks": len(track["tasks"]),
-        "completed_tasks": sum(1 for t in tasks_with_progress if t["completed"]),
-        "tasks": tasks_with_progress
-    }
+    task_fields = resolve_task_fields(view, fields)
+    return encoded_track_response(request, track_id, user.get("progress", {}), task_fields)
 
-@api_router.get("/skills/dsa/{track_id}/{task_id}")
-async def get_dsa_task(track_id: str, task_id: str, user: dict = Depends(get_current_user)):
-    if track_id not in DSA_TRACKS:
+@api_router.get("/skills/{domain}/{track_id}/{task_id}")
+async def get_task(domain: str, track_id: str, task_id: str, request: Request, user: dict = Depends(current_user("progress"))):
+    if track_id not in get_domain_tracks(domain):
         raise HTTPException(status_code=404, detail="Track not found")
     
-    task = next((t for t in DSA_TRACKS[track_id]["tasks"] if t["id"] == task_id), None)
-    if not task:
+    entry = TASK_INDEX.get(task_id)
+    if not entry or entry.track_id != track_id:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    user_progress = user.get("progress", {}).get(task_id, {})
-    task_copy = task.copy()
-    task_copy["completed"] = user_progress.get("completed", False)
-    task_copy["attempts"] = user_progress.get("attempts", 0)
-    
-    return task_copy
-
-@api_router.get("/skills/analytics")
-async def get_analytics_tracks(user: dict = Depends(get_current_user)):
-    tracks = []
-    for key, track in DATA_ANALYTICS_TRACKS.items():
-        user_progress = user.get("progress", {})
-        completed = sum(1 for t in track["tasks"] if user_progress.get(t["id"], {}).get("completed", False))
-        tracks.append({
-            "id": key,
-            "name": track["name"],
-            "description": track["description"],
-            "total_tasks": len(track["tasks"]),
-            "completed_tasks": completed
-        })
-    return {"tracks": tracks}
-
-@api_router.get("/skills/analytics/{track_id}")
-async def get_analytics_track(track_id: str, user: dict = Depends(get_current_user)):
-    if track_id not in DATA_ANALYTICS_TRACKS:
-        raise HTTPException(status_code=404, detail="Track not found")
-    
-    track = DATA_ANALYTICS_TRACKS[track_id]
-    user_progress = user.get("progress", {})
-    
-    tasks = []
-    for task in track["tasks"]:
-        task_copy = task.copy()
-        task_copy["completed"] = user_progress.get(task["id"], {}).get("completed", False)
-        tasks.append(task_copy)
-    
-    return {"id": track_id, "name": track["name"], "tasks": tasks}
-
-@api_router.get("/skills/datascience")
-async def get_datascience_tracks(user: dict = Depends(get_current_user)):
-    tracks = []
-    for key, track in DATA_SCIENCE_TRACKS.items():
-        user_progress = user.get("progress", {})
-        completed = sum(1 for t in track["tasks"] if user_progress.get(t["id"], {}).get("completed", False))
-        tracks.append({
-            "id": key,
-            "name": track["name"],
-            "description": track["description"],
-            "total_tasks": len(track["tasks"]),
-            "completed_tasks": completed
-        })
-    return {"tracks": tracks}
-
-@api_router.get("/skills/ml")
-async def get_ml_tracks(user: dict = Depends(get_current_user)):
-    tracks = []
-    for key, track in ML_TRACKS.items():
-        user_progress = user.get("progress", {})
-        completed = sum(1 for t in track["tasks"] if user_progress.get(t["id"], {}).get("completed", False))
-        tracks.append({
-            "id": key,
-            "name": track["name"],
-            "description": track["description"],
-            "total_tasks": len(track["tasks"]),
-            "completed_tasks": completed
-        })
-    return {"tracks": tracks}
+    return encoded_task_response(request, task_id, user.get("progress", {}))
 
 # ============ TASK SUBMISSION ============
 
+# (minimum points, level), highest first
+LEVEL_THRESHOLDS = [(200, "Advanced"), (100, "Intermediate")]
+DEFAULT_LEVEL = "Beginner"
+
+LEVEL_EXPR = {"$switch": {
+    "branches": [{"case": {"$gte": ["$points", threshold]}, "then": level} for threshold, level in LEVEL_THRESHOLDS],
+    "default": DEFAULT_LEVEL,
+}}
+# Tokens carry a level claim, so a level change revokes them; the submitting client gets a fresh one
+LEVEL_TOKEN_VERSION = {"token_version": {"$add": [
+    {"$ifNull": ["$token_version", 0]},
+    {"$cond": [{"$eq": [LEVEL_EXPR, {"$ifNull": ["$level", DEFAULT_LEVEL]}]}, 0, 1]},
+]}}
+
 @api_router.post("/tasks/{task_id}/submit")
-async def submit_task(task_id: str, submission: TaskSubmission, user: dict = Depends(get_current_user)):
-    # Find task in all tracks
-    task = None
-    for track_data in [DSA_TRACKS, DATA_ANALYTICS_TRACKS, DATA_SCIENCE_TRACKS, ML_TRACKS]:
-        for track in track_data.values():
-            task = next((t for t in track["tasks"] if t["id"] == task_id), None)
-            if task:
-                break
-        if task:
-            break
-    
-    if not task:
+async def submit_task(task_id: str, submission: TaskSubmission, user: dict = Depends(current_user("id"))):
+    if task_id not in TASK_INDEX:
         raise HTTPException(status_code=404, detail="Task not found")
-    
+    job = job_queue.enqueue(JOB_LANE_SUBMIT, user["id"], partial(process_submission, user["id"], task_id, submission))
+    return await job.outcome()
+
+async def process_submission(user_id: str, task_id: str, submission: TaskSubmission) -> Dict[str, Any]:
+    """Grade and record a submission; runs on a job queue worker."""
+    task = TASK_INDEX[task_id].task
     progress_key = f"progress.{task_id}"
-    current_progress = user.get("progress", {}).get(task_id, {"attempts": 0, "completed": False})
+    projection = {"_id": 0, "id": 1, "email": 1, "role": 1, "points": 1, "level": 1, "token_version": 1, f"{progress_key}.attempts": 1}
     
-    new_progress = {
-        "attempts": current_progress.get("attempts", 0) + 1,
-        "completed": True,
-        "last_submission": datetime.now(timezone.utc).isoformat(),
-        "code": submission.code
+    # Coding tasks with a test suite only count once every case passes
+    grading = None
+    if task_id in TASK_TESTS:
+        grading = await grade_submission(submission.code, task_id)
+    submitted_at = datetime.now(timezone.utc).isoformat()
+    
+    if grading and not grading["passed"]:
+        points_earned = 0
+        updated = await db.users.find_one_and_update(
+            {"id": user_id},
+            {"$set": {f"{progress_key}.last_submission": submitted_at}, "$inc": {f"{progress_key}.attempts": 1}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
+        )
+    else:
+        points_earned, updated = await record_completion(user_id, task_id, task.get("points", 10), submitted_at, projection)
+    
+    await db.submissions.insert_one({
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "task_id": task_id,
+        "attempt": (updated or {}).get("progress", {}).get(task_id, {}).get("attempts", 1),
+        "code": submission.code,
+        "explanation": submission.explanation,
+        "passed": grading["passed"] if grading else None,
+        "passed_cases": grading["passed_cases"] if grading else None,
+        "submitted_at": submitted_at
+    })
+    invalidate_user_cache(user_id)
+    
+    complexity = grading and grading["complexity"]
+    if grading and not grading["passed"] and complexity and not complexity["within_budget"]:
+        message = (f"All test cases passed, but your solution looks {complexity['inferred'] or 'too slow'}; "
+                   f"aim for {complexity['budget']} or better.")
+    elif grading and not grading["passed"]:
+        message = grading["error"] or f"{grading['passed_cases']}/{grading['total_cases']} test cases passed. Keep going!"
+    else:
+        message = "Great work!" if points_earned > 0 else "Submission recorded."
+    result = {
+        "success": not grading or grading["passed"],
+        "points_earned": points_earned,
+        "points": (updated or {}).get("points", 0),
+        "level": (updated or {}).get("level", DEFAULT_LEVEL),
+        "message": message,
+        "grading": grading
     }
+    if STATELESS_TOKENS and points_earned and updated:
+        # Reissue so the level claim and token_version follow the update
+        result["token"] = create_token(updated["id"], updated["email"], updated)
+    return result
+
+async def record_completion(user_id: str, task_id: str, points: int, submitted_at: str, projection: Dict[str, Any]):
+    """Mark a task completed; returns (points_earned, updated user projection)."""
+    progress_key = f"progress.{task_id}"
+    points_earned = points
     
-    points_earned = 0
-    if not current_progress.get("completed"):
-        points_earned = task.get("points", 10)
-        await db.users.update_one(
-            {"id": user["id"]},
-            {"$set": {progress_key: new_progress}, "$inc": {"points": points_earned}}
+    # First completion: award points, bump attempts and derive the level in one atomic update.
+    # The completed != true filter makes concurrent submissions award points at most once.
+    # Only the compact per-task summary lives on the user; the code goes to `submissions`.
+    updated = await db.users.find_one_and_update(
+        {"id": user_id, f"{progress_key}.completed": {"$ne": True}},
+        [
+            {"$set": {
+                "points": {"$add": [{"$ifNull": ["$points", 0]}, points_earned]},
+                progress_key: {
+                    "attempts": {"$add": [{"$ifNull": [f"${progress_key}.attempts", 0]}, 1]},
+                    "completed": True,
+                    "last_submission": submitted_at,
+                },
+            }},
+            {"$set": {"level": LEVEL_EXPR, **(LEVEL_TOKEN_VERSION if STATELESS_TOKENS else {})}},
+        ],
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is None:
+        points_earned = 0
+        updated = await db.users.find_one_and_update(
+            {"id": user_id},
+            {"$set": {f"{progress_key}.last_submission": submitted_at}, "$inc": {f"{progress_key}.attempts": 1}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
         )
+    return points_earned, updated
+
+@api_router.get("/tasks/{task_id}/submissions")
+async def get_task_submissions(task_id: str, user: dict = Depends(current_user("id"))):
+    if task_id not in TASK_INDEX:
+        raise HTTPException(status_code=404, detail="Task not found")
+    submissions = await db.submissions.find(
+        {"user_id": user["id"], "task_id": task_id}, {"_id": 0}
+    ).sort("attempt", -1).limit(20).to_list(20)
+    return {"submissions": submissions}
+
+async def migrate_progress_code_to_submissions() -> int:
+    """Move `progress.<task_id>.code` out of user documents into the submissions collection."""
+    moved = 0
+    async for doc in db.users.find({"progress": {"$exists": True, "$ne": {}}}, {"_id": 0, "id": 1, "progress": 1}):
+        legacy = {task_id: p for task_id, p in (doc.get("progress") or {}).items() if isinstance(p, dict) and "code" in p}
+        if not legacy:
+            continue
+        # Upsert on (user, task, attempt) so a re-run after a partial failure never duplicates
+        await db.submissions.bulk_write([
+            UpdateOne(
+                {"user_id": doc["id"], "task_id": task_id, "attempt": p.get("attempts", 1)},
+                {"$setOnInsert": {
+                    "id": str(uuid.uuid4()),
+                    "code": p["code"],
+                    "explanation": None,
+                    "submitted_at": p.get("last_submission")
+                }},
+                upsert=True
+            )
+            for task_id, p in legacy.items()
+        ])
+        await db.users.update_one({"id": doc["id"]}, {"$unset": {f"progress.{task_id}.code": "" for task_id in legacy}})
+        moved += len(legacy)
+    return moved
+
+# ============ LLM PROVIDERS ============
+
+# Model per route as (provider, model); override with LLM_MODEL_<ROUTE>=provider/model
+LLM_MODELS = {
+    "bro_chat": ("openai", "gpt-5.2"),
+    "bro_voice": ("openai", "gpt-5.2"),
+    "resume_analysis": ("openai", "gpt-5.2"),
+    "linkedin_post": ("openai", "gpt-5.2"),
+    "github_draft": ("openai", "gpt-5.2"),
+    "bro_memory": ("openai", "gpt-5.2"),
+    "transcription": ("openai", "whisper-1"),
+}
+
+# Routes whose replies may be shared between users: "exact" matches the normalized query,
+# "semantic" also accepts the nearest cached query above LLM_CACHE_SIMILARITY
+LLM_CACHE_POLICY = {
+    "bro_chat": "semantic",
+    "linkedin_post": "exact",
+    "github_draft": "exact",
+}
+LLM_CACHE_EMBED_DIM = 512
+
+class LLMCacheKey(NamedTuple):
+    scope: str  # persona, level and anything else that must match exactly
+    query: str  # the part of the prompt compared exactly or by similarity
+    private: Tuple[str, ...] = ()  # replies mentioning any of these are never shared
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split()).rstrip("?!. ")
+
+def embed_query(text: str) -> np.ndarray:
+    """Signed feature-hashing of word unigrams and bigrams, L2-normalized; cheap and fully local."""
+    tokens = re.findall(r"[a-z0-9+#]+", text)
+    vector = np.zeros(LLM_CACHE_EMBED_DIM, dtype=np.float32)
+    for gram in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = int.from_bytes(hashlib.blake2b(gram.encode(), digest_size=8).digest(), "little")
+        vector[h % LLM_CACHE_EMBED_DIM] += 1.0 if h >> 63 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class EmbeddingIndex:
+    """Query embeddings of one (route, scope) as rows of a single matrix, searched with one matmul.
+    
+    Removed rows are zeroed and reused, so a lookup never rebuilds the matrix.
+    """
+    
+    def __init__(self, dim: int, capacity: int = 64):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.queries: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self._free: List[int] = []
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def add(self, query: str, vector: np.ndarray) -> None:
+        row = self.rows.get(query)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self.queries[row] = query
+            else:
+                row = len(self.queries)
+                if row == len(self.matrix):
+                    self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+                self.queries.append(query)
+            self.rows[query] = row
+        self.matrix[row] = vector
+    
+    def remove(self, query: str) -> None:
+        row = self.rows.pop(query, None)
+        if row is not None:
+            self.matrix[row] = 0.0
+            self.queries[row] = None
+            self._free.append(row)
+    
+    def nearest(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        scores = self.matrix[:len(self.queries)] @ vector
+        best = int(np.argmax(scores))
+        return self.queries[best], float(scores[best])
+
+class LLMResponseCache:
+    """LRU/TTL cache of model replies, with optional nearest-neighbour lookup per (route, scope)."""
+    
+    def __init__(self, policy: Dict[str, str], max_size: int, ttl: float, similarity: float):
+        self.policy = {route: mode for route, mode in policy.items() if route not in LLM_CACHE_DISABLED_ROUTES}
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity = similarity
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+        self._indexes: Dict[Tuple[str, str], EmbeddingIndex] = {}
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.private_skips = 0
+    
+    def enabled(self, route: str) -> bool:
+        return route in self.policy
+    
+    def _drop(self, key: Tuple[str, str, str]) -> None:
+        del self._entries[key]
+        index = self._indexes.get(key[:2])
+        if index is not None:
+            index.remove(key[2])
+            if not index:
+                del self._indexes[key[:2]]
+    
+    def _lookup(self, key: Tuple[str, str, str]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, reply = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._drop(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return reply
+    
+    def get(self, route: str, cache_key: LLMCacheKey) -> Optional[str]:
+        query = normalize_query(cache_key.query)
+        reply = self._lookup((route, cache_key.scope, query))
+        if reply is None and self.policy[route] == "semantic":
+            index = self._indexes.get((route, cache_key.scope))
+            if index:
+                nearest, score = index.nearest(embed_query(query))
+                if nearest is not None and score >= self.similarity:
+                    reply = self._lookup((route, cache_key.scope, nearest))
+                    self.semantic_hits += reply is not None
+        if reply is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return reply
+    
+    def put(self, route: str, cache_key: LLMCacheKey, reply: str) -> None:
+        lowered = reply.lower()
+        if any(term and term.lower() in lowered for term in cache_key.private):
+            self.private_skips += 1
+            return
+        query = normalize_query(cache_key.query)
+        key = (route, cache_key.scope, query)
+        self._entries[key] = (time.monotonic(), reply)
+        self._entries.move_to_end(key)
+        if self.policy[route] == "semantic":
+            index = self._indexes.get(key[:2])
+            if index is None:
+                index = self._indexes[key[:2]] = EmbeddingIndex(LLM_CACHE_EMBED_DIM)
+            index.add(query, embed_query(query))
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "routes": self.policy,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "private_skips": self.private_skips,
+        }
+
+class EmergentLLMProvider:
+    """Hosted models through emergentintegrations; the speech client is built once and reused."""
+    name = "emergent"
+    
+    def __init__(self, api_key: str):
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        from emergentintegrations.llm.openai import OpenAISpeechToText
         
-        # Update level
-        updated_user = await db.users.find_one({"id": user["id"]}, {"_id": 0, "points": 1})
-        total_points = updated_user.get("points", 0)
-        new_level = "Beginner"
-        if total_points >= 200:
-            new_level = "Advanced"
-        elif total_points >= 100:
-            new_level = "Intermediate"
-        
-        await db.users.update_one({"id": user["id"]}, {"$set": {"level": new_level}})
-    else:
-        await db.users.update_one({"id": user["id"]}, {"$set": {progress_key: new_progress}})
+        self.api_key = api_key
+        self._chat_cls = LlmChat
+        self._message_cls = UserMessage
+        self._stt = OpenAISpeechToText(api_key=api_key)
+    
+    async def complete(self, model: Tuple[str, str], session_id: str, system: str, text: str) -> str:
+        chat = self._chat_cls(api_key=self.api_key, session_id=session_id, system_message=system)
+        chat.with_model(*model)
+        return await chat.send_message(self._message_cls(text=text))
     
-    return {"success": True, "points_earned": points_earned, "message": "Great work!" if points_earned > 0 else "Submission recorded."}
+    async def stream(self, model: Tuple[str, str], session_id: str, system: str, text: str) -> AsyncIterator[str]:
+        # The client library only returns whole messages
+        yield await self.complete(model, session_id, system, text)
+    
+    async def transcribe(self, model: Tuple[str, str], audio_file: BinaryIO) -> str:
+        transcription = await self._stt.transcribe(file=audio_file, model=model[1], response_format="json", language="en")
+        return transcription.text
 
-# ============ BRO MENTOR ROUTES ============
+class FakeLLMProvider:
+    """Offline stand-in for load tests and CI: replies are a pure function of the request, after a fixed delay."""
+    name = "fake"
+    
+    def __init__(self, latency_ms: float, token_delay_ms: float):
+        self.latency = latency_ms / 1000
+        self.token_delay = token_delay_ms / 1000
+    
+    def _reply(self, model: Tuple[str, str], system: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model}|{system}|{text}".encode()).hexdigest()[:8]
+        return f"[{model[1]} {digest}] " + " ".join(text.split()[:60])
+    
+    async def complete(self, model: Tuple[str, str], session_id: str, system: str, text: str) -> str:
+        await asyncio.sleep(self.latency)
+        return self._reply(model, system, text)
+    
+    async def stream(self, model: Tuple[str, str], session_id: str, system: str, text: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for token in re.findall(r"\S+\s*", self._reply(model, system, text)):
+            await asyncio.sleep(self.token_delay)
+            yield token
+    
+    async def transcribe(self, model: Tuple[str, str], audio_file: BinaryIO) -> str:
+        audio = audio_file.read()
+        await asyncio.sleep(self.latency)
+        return f"Transcript {hashlib.sha256(audio).hexdigest()[:8]} of {len(audio)} bytes"
 
-@api_router.post("/bro/chat")
-async def chat_with_bro(message: ChatMessage, user: dict = Depends(get_current_user)):
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
+class LLMClient:
+    """Single entry point for model calls: per-route models, timeouts, retries and call counters."""
+    
+    def __init__(self, provider: str, models: Dict[str, Tuple[str, str]], timeout: float, retries: int,
+                 cache: LLMResponseCache):
+        self.provider_name = provider
+        self.cache = cache
+        self.models = {}
+        for route, model in models.items():
+            override = os.environ.get(f"LLM_MODEL_{route.upper()}")
+            self.models[route] = tuple(override.split("/", 1)) if override else model
+        self.timeout = timeout
+        self.retries = retries
+        self.provider = None
+        self.calls = dict.fromkeys(models, 0)
+        self.failures = dict.fromkeys(models, 0)
+        self.retried = 0
     
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="LLM API key not configured")
+    def start(self) -> None:
+        if self.provider_name == "fake":
+            self.provider = FakeLLMProvider(LLM_FAKE_LATENCY_MS, LLM_FAKE_TOKEN_DELAY_MS)
+        elif os.environ.get('EMERGENT_LLM_KEY'):
+            self.provider = EmergentLLMProvider(os.environ['EMERGENT_LLM_KEY'])
+        else:
+            logger.warning("EMERGENT_LLM_KEY is not set; LLM routes are disabled")
+    
+    def ensure_ready(self) -> None:
+        if self.provider is None:
+            raise HTTPException(status_code=500, detail="LLM API key not configured")
+    
+    def _cached(self, route: str, cache_key: Optional[LLMCacheKey]) -> Optional[str]:
+        if cache_key is None or not self.cache.enabled(route):
+            return None
+        return self.cache.get(route, cache_key)
+    
+    def _store(self, route: str, cache_key: Optional[LLMCacheKey], reply: str) -> None:
+        if cache_key is not None and self.cache.enabled(route):
+            self.cache.put(route, cache_key, reply)
+    
+    async def complete(self, route: str, session_id: str, system: str, text: str,
+                       cache_key: Optional[LLMCacheKey] = None) -> str:
+        """Return the model reply; with `cache_key`, routes that opt into caching may answer from a shared reply."""
+        self.ensure_ready()
+        cached = self._cached(route, cache_key)
+        if cached is not None:
+            return cached
+        self.calls[route] += 1
+        for attempt in range(self.retries + 1):
+            try:
+                reply = await asyncio.wait_for(
+                    self.provider.complete(self.models[route], session_id, system, text), self.timeout
+                )
+                self._store(route, cache_key, reply)
+                return reply
+            except Exception as e:
+                if attempt == self.retries:
+                    self.failures[route] += 1
+                    raise
+                logger.warning(f"LLM call for {route} failed ({e!r}); retrying")
+                self.retried += 1
+                await asyncio.sleep(LLM_RETRY_BACKOFF_SECONDS * 2 ** attempt)
+    
+    async def stream(self, route: str, session_id: str, system: str, text: str,
+                     cache_key: Optional[LLMCacheKey] = None) -> AsyncIterator[str]:
+        """Yield reply text as the provider produces it; the timeout applies to each chunk, and a started stream is never retried."""
+        self.ensure_ready()
+        cached = self._cached(route, cache_key)
+        if cached is not None:
+            yield cached
+            return
+        self.calls[route] += 1
+        chunks = self.provider.stream(self.models[route], session_id, system, text)
+        parts = []
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    break
+                parts.append(chunk)
+                yield chunk
+            self._store(route, cache_key, "".join(parts))
+        except Exception:
+            self.failures[route] += 1
+            raise
+        finally:
+            await chunks.aclose()
     
-    system_prompt = f"""You are BRO, an open-source AI mentor for college students preparing for tech placements.
+    async def transcribe(self, audio_file: BinaryIO) -> str:
+        self.ensure_ready()
+        self.calls["transcription"] += 1
+        try:
+            return await asyncio.wait_for(self.provider.transcribe(self.models["transcription"], audio_file), self.timeout)
+        except Exception:
+            self.failures["transcription"] += 1
+            raise
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider_name,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retried,
+            "cache": self.cache.metrics(),
+        }
+
+llm = LLMClient(
+    LLM_PROVIDER, LLM_MODELS, LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES,
+    LLMResponseCache(LLM_CACHE_POLICY, LLM_CACHE_SIZE, LLM_CACHE_TTL_SECONDS, LLM_CACHE_SIMILARITY)
+)
+
+# ============ BRO MENTOR ROUTES ============
+
+BRO_STREAM_KEEPALIVE_SECONDS = 10
+
+def bro_system_prompt(user: dict) -> str:
+    return f"""You are BRO, an open-source AI mentor for college students preparing for tech placements.
 
 Your personality:
 - Friendly and supportive like a senior engineer friend
@@ -1523,73 +2494,248 @@ Rules:
 You help with: DSA, Data Analytics, Data Science, ML, Resume Building, Interview Prep.
 Current user: {user.get("name", "Student")} (Level: {user.get("level", "Beginner")}, Role: {user.get("role", "Not Set")})"""
 
+def bro_cache_key(user: dict, message: ChatMessage) -> LLMCacheKey:
+    # The prompt greets the student by name, so a reply that uses it stays private
+    scope = f"{user.get('level', 'Beginner')}|{user.get('role', 'Not Set')}|{message.context}"
+    return LLMCacheKey(scope, message.message, (user.get("name", ""),))
+
+def bro_session_id(user: dict) -> str:
+    return f"bro-{user['id']}-{datetime.now(timezone.utc).strftime('%Y%m%d')}"
+
+async def save_bro_exchange(user_id: str, session_id: str, message: ChatMessage, response: str) -> Dict[str, Any]:
+    chat_doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "session_id": session_id,
+        "message": message.message,
+        "response": response,
+        "context": message.context,
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+    await db.chat_history.insert_one(chat_doc)
+    return chat_doc
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English prose; close enough for budgeting
+    return len(text) // 4 + 1
+
+def format_turn(turn: Dict[str, Any]) -> str:
+    return f"Student: {turn['message']}\nBRO: {turn['response']}"
+
+async def load_bro_memory(user_id: str, session_id: str) -> str:
+    """Rolling digest plus the turns not folded into it yet, trimmed to BRO_MEMORY_TOKEN_BUDGET."""
+    memory = await db.bro_memory.find_one({"session_id": session_id}, {"_id": 0, "digest": 1, "covered_until": 1}) or {}
+    digest = memory.get("digest", "")[:BRO_DIGEST_MAX_TOKENS * 4]
+    # Turns wait to be folded in batches, so up to a batch more than the recent window is unsummarized
+    limit = BRO_MEMORY_TURNS + BRO_MEMORY_FOLD_BATCH
+    turns = await db.chat_history.find(
+        {"user_id": user_id, "session_id": session_id, "timestamp": {"$gt": memory.get("covered_until", "")}},
+        {"_id": 0, "message": 1, "response": 1}
+    ).sort("timestamp", -1).limit(limit).to_list(limit)
+    
+    budget = BRO_MEMORY_TOKEN_BUDGET - estimate_tokens(digest)
+    recent = []
+    for turn in turns:  # newest first, so the oldest turns are the ones dropped
+        text = format_turn(turn)
+        budget -= estimate_tokens(text)
+        if budget < 0:
+            break
+        recent.append(text)
+    
+    sections = []
+    if digest:
+        sections.append(f"Summary of earlier conversation:\n{digest}")
+    if recent:
+        sections.append("Recent conversation:\n" + "\n\n".join(reversed(recent)))
+    return "\n\n" + "\n\n".join(sections) if sections else ""
+
+async def fold_bro_memory(user_id: str, session_id: str) -> None:
+    """Summarize turns that fell out of the recent window into the session digest, a batch at a time."""
+    memory = await db.bro_memory.find_one({"session_id": session_id}, {"_id": 0}) or {}
+    covered_until = memory.get("covered_until", "")
+    pending = await db.chat_history.find(
+        {"user_id": user_id, "session_id": session_id, "timestamp": {"$gt": covered_until}},
+        {"_id": 0, "message": 1, "response": 1, "timestamp": 1}
+    ).sort("timestamp", 1).to_list(None)
+    overflow = pending[:-BRO_MEMORY_TURNS] if len(pending) > BRO_MEMORY_TURNS else []
+    if len(overflow) < BRO_MEMORY_FOLD_BATCH:
+        return
+    
+    prompt = f"""Update this running summary of a mentoring conversation with the new turns below.
+Keep what the student is working on, what they already understand, and open questions.
+Answer with the summary only, at most {BRO_DIGEST_MAX_TOKENS * 3 // 4} words.
+
+Current summary:
+{memory.get("digest") or "(none)"}
+
+New turns:
+""" + "\n\n".join(format_turn(turn) for turn in overflow)
+    digest = await llm.complete("bro_memory", f"{session_id}-memory", "You summarize conversations concisely.", prompt)
+    # Only advance from the state we summarized; a concurrent fold that got there first wins
     try:
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"bro-{user['id']}-{datetime.now(timezone.utc).strftime('%Y%m%d')}",
-            system_message=system_prompt
+        await db.bro_memory.update_one(
+            {"session_id": session_id, "covered_until": covered_until} if memory else {"session_id": session_id},
+            {"$set": {
+                "user_id": user_id,
+                "digest": digest[:BRO_DIGEST_MAX_TOKENS * 4],
+                "covered_until": overflow[-1]["timestamp"],
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }},
+            upsert=not memory
         )
-        chat.with_model("openai", "gpt-5.2")
-        
-        user_message = UserMessage(text=message.message)
-        response = await chat.send_message(user_message)
-        
-        chat_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": user["id"],
-            "message": message.message,
-            "response": response,
-            "context": message.context,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        await db.chat_history.insert_one(chat_doc)
-        
+    except DuplicateKeyError:
+        pass
+
+bro_memory_tasks: Dict[str, asyncio.Task] = {}
+
+def schedule_bro_memory_fold(user_id: str, session_id: str) -> None:
+    """Fold in the background so the reply is not held up by the summary call; one fold per session at a time."""
+    if session_id in bro_memory_tasks:
+        return
+    async def fold():
+        try:
+            await fold_bro_memory(user_id, session_id)
+        except Exception as e:
+            logger.error(f"BRO memory fold failed for {session_id}: {e!r}")
+    task = asyncio.create_task(fold())
+    bro_memory_tasks[session_id] = task
+    task.add_done_callback(lambda _: bro_memory_tasks.pop(session_id, None))
+
+@api_router.post("/bro/chat")
+async def chat_with_bro(message: ChatMessage, user: dict = Depends(current_user("name", "level", "role"))):
+    llm.ensure_ready()
+    session_id = bro_session_id(user)
+    try:
+        memory = await load_bro_memory(user["id"], session_id)
+        # Replies that depend on earlier turns are not shared through the cache
+        response = await llm.complete("bro_chat", session_id, bro_system_prompt(user) + memory, message.message,
+                                      cache_key=None if memory else bro_cache_key(user, message))
+        await save_bro_exchange(user["id"], session_id, message, response)
+        schedule_bro_memory_fold(user["id"], session_id)
         return {"response": response}
     except Exception as e:
         logger.error(f"BRO chat error: {str(e)}")
         raise HTTPException(status_code=500, detail="BRO is taking a coffee break. Try again!")
 
-@api_router.post("/bro/voice")
-async def bro_voice_input(audio: UploadFile = File(...), context: str = Form(None), user: dict = Depends(get_current_user)):
-    """Handle voice input - transcribe and respond"""
-    from emergentintegrations.llm.openai import OpenAISpeechToText
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@api_router.post("/bro/chat/stream")
+async def stream_chat_with_bro(message: ChatMessage, user: dict = Depends(current_user("name", "level", "role"))):
+    """Server-Sent Events variant of /bro/chat: `delta` events carry reply text, then `done` or `error`.
     
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="API key not configured")
+    History is saved only once the reply completes; a client disconnect cancels the upstream call.
+    """
+    llm.ensure_ready()
+    session_id = bro_session_id(user)
+    chunks: asyncio.Queue = asyncio.Queue()
     
-    try:
-        # Save uploaded audio to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as tmp:
-            content = await audio.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-        
-        # Transcribe audio
-        stt = OpenAISpeechToText(api_key=api_key)
-        with open(tmp_path, "rb") as audio_file:
-            transcription = await stt.transcribe(
-                file=audio_file,
-                model="whisper-1",
-                response_format="json",
-                language="en"
-            )
-        
-        # Clean up temp file
-        os.unlink(tmp_path)
+    async def pump():
+        try:
+            memory = await load_bro_memory(user["id"], session_id)
+            async for chunk in llm.stream("bro_chat", session_id, bro_system_prompt(user) + memory, message.message,
+                                          cache_key=None if memory else bro_cache_key(user, message)):
+                chunks.put_nowait(chunk)
+            chunks.put_nowait(None)
+        except Exception as e:
+            chunks.put_nowait(e)
+    
+    async def events():
+        # The open event goes out before the model is called so the client sees a response immediately
+        yield sse_event("start", {"context": message.context})
+        upstream = asyncio.create_task(pump())
+        parts = []
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.get(), BRO_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                parts.append(chunk)
+                yield sse_event("delta", {"text": chunk})
+            chat_doc = await save_bro_exchange(user["id"], session_id, message, "".join(parts))
+            schedule_bro_memory_fold(user["id"], session_id)
+            yield sse_event("done", {"id": chat_doc["id"]})
+        except Exception as e:
+            logger.error(f"BRO chat stream error: {str(e)}")
+            yield sse_event("error", {"detail": "BRO is taking a coffee break. Try again!"})
+        finally:
+            upstream.cancel()
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+VOICE_READ_CHUNK = 64 * 1024
+
+class RequestBodyLimit:
+    """ASGI middleware capping request bodies per path before anything parses them.
+    
+    A declared Content-Length over the limit is answered with 413 straight away; chunked or
+    understated bodies are cut off with 413 as soon as they pass it while being read.
+    """
+    
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+        detail = f"Request body is limited to {limit // 1024} KB"
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and (not declared.isdigit() or int(declared) > limit):
+            return await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+        received = 0
         
-        transcribed_text = transcription.text
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
         
-        # Now get BRO's response
-        system_prompt = f"""You are BRO, a friendly AI mentor. The user is speaking to you via voice.
+        await self.app(scope, limited_receive, send)
+
+VOICE_BODY_LIMITS = {
+    "/api/bro/voice": VOICE_MAX_BODY_BYTES,
+    "/api/bro/voice/stream": VOICE_MAX_BODY_BYTES,
+}
+
+async def read_voice_upload(audio: UploadFile) -> io.BytesIO:
+    """Copy the upload into a named in-memory buffer, rejecting it once it passes VOICE_MAX_BYTES."""
+    buffer = io.BytesIO()
+    while chunk := await audio.read(VOICE_READ_CHUNK):
+        if buffer.tell() + len(chunk) > VOICE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Voice messages are limited to {VOICE_MAX_BYTES // 1024} KB")
+        buffer.write(chunk)
+    if not buffer.tell():
+        raise HTTPException(status_code=400, detail="Empty audio upload")
+    buffer.seek(0)
+    # The speech API infers the audio format from the file name
+    buffer.name = audio.filename or "voice.webm"
+    return buffer
+
+def bro_voice_prompt(user: dict) -> str:
+    return f"""You are BRO, a friendly AI mentor. The user is speaking to you via voice.
 Keep responses concise and conversational.
 User: {user.get("name")} (Level: {user.get("level")})"""
-        
-        chat = LlmChat(api_key=api_key, session_id=f"bro-voice-{user['id']}", system_message=system_prompt)
-        chat.with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=transcribed_text))
+
+@api_router.post("/bro/voice")
+async def bro_voice_input(audio: UploadFile = File(...), context: str = Form(None), user: dict = Depends(current_user("name", "level"))):
+    """Handle voice input - transcribe and respond"""
+    llm.ensure_ready()
+    audio_file = await read_voice_upload(audio)
+    try:
+        transcribed_text = await llm.transcribe(audio_file)
+        response = await llm.complete("bro_voice", f"bro-voice-{user['id']}", bro_voice_prompt(user), transcribed_text)
         
         return {
             "transcription": transcribed_text,
@@ -1599,8 +2745,28 @@ User: {user.get("name")} (Level: {user.get("level")})"""
         logger.error(f"Voice processing error: {str(e)}")
         raise HTTPException(status_code=500, detail="Voice processing failed. Try text instead!")
 
+@api_router.post("/bro/voice/stream")
+async def stream_bro_voice_input(audio: UploadFile = File(...), context: str = Form(None), user: dict = Depends(current_user("name", "level"))):
+    """Server-Sent Events variant of /bro/voice: `transcription` as soon as it is ready, then reply `delta`s and `done`."""
+    llm.ensure_ready()
+    audio_file = await read_voice_upload(audio)
+    
+    async def events():
+        try:
+            transcribed_text = await llm.transcribe(audio_file)
+            yield sse_event("transcription", {"text": transcribed_text})
+            async for chunk in llm.stream("bro_voice", f"bro-voice-{user['id']}", bro_voice_prompt(user), transcribed_text):
+                yield sse_event("delta", {"text": chunk})
+            yield sse_event("done", {})
+        except Exception as e:
+            logger.error(f"Voice stream error: {str(e)}")
+            yield sse_event("error", {"detail": "Voice processing failed. Try text instead!"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 @api_router.get("/bro/history")
-async def get_chat_history(user: dict = Depends(get_current_user)):
+async def get_chat_history(user: dict = Depends(current_user("id"))):
     history = await db.chat_history.find(
         {"user_id": user["id"]}, {"_id": 0}
     ).sort("timestamp", -1).limit(50).to_list(50)
@@ -1612,92 +2778,812 @@ async def get_chat_history(user: dict = Depends(get_current_user)):
 async def get_resume_templates():
     return {"templates": RESUME_TEMPLATES}
 
+RESUME_PROJECTION = {"_id": 0, "user_id": 0}
+
+async def find_user_resumes(user_id: str) -> List[Dict[str, Any]]:
+    resumes = await db.resumes.find({"user_id": user_id}, RESUME_PROJECTION).sort("created_at", 1).to_list(None)
+    return [resume_buffer.overlay(resume) for resume in resumes]
+
 @api_router.post("/resume/create")
-async def create_resume(resume_data: ResumeCreate, user: dict = Depends(get_current_user)):
+async def create_resume(resume_data: ResumeCreate, user: dict = Depends(current_user("id"))):
     resume_id = str(uuid.uuid4())
     resume = {
         "id": resume_id,
+        "user_id": user["id"],
         "company": resume_data.company,
         "template": resume_data.template,
         "content": resume_data.content,
+        "revision": 1,
         "created_at": datetime.now(timezone.utc).isoformat(),
         "updated_at": datetime.now(timezone.utc).isoformat()
     }
+    await db.resumes.insert_one(resume)
     
-    await db.users.update_one(
-        {"id": user["id"]},
-        {"$push": {"resumes": resume}}
-    )
-    
-    return {"message": "Resume created", "resume_id": resume_id}
+    return {"message": "Resume created", "resume_id": resume_id, "revision": 1}
 
 @api_router.get("/resume/list")
-async def list_resumes(user: dict = Depends(get_current_user)):
-    return {"resumes": user.get("resumes", [])}
+async def list_resumes(user: dict = Depends(current_user("id"))):
+    return {"resumes": await find_user_resumes(user["id"])}
 
-@api_router.put("/resume/{resume_id}")
-async def update_resume(resume_id: str, resume_data: ResumeUpdate, user: dict = Depends(get_current_user)):
-    resumes = user.get("resumes", [])
-    resume_idx = next((i for i, r in enumerate(resumes) if r["id"] == resume_id), None)
+async def apply_resume_update(user_id: str, resume_id: str, revision: Optional[int], update: Dict[str, Any]) -> int:
+    """Apply `update` to one resume, bumping its revision; returns the new revision.
     
-    if resume_idx is None:
+    With `revision` set the write only lands on that revision, and a stale one gets 409 with the current revision.
+    """
+    # Buffered autosave edits land first so this write applies on top of them
+    await resume_buffer.flush(resume_id)
+    query = {"id": resume_id, "user_id": user_id}
+    if revision is not None:
+        query["revision"] = revision
+    update.setdefault("$set", {})["updated_at"] = datetime.now(timezone.utc).isoformat()
+    update["$inc"] = {"revision": 1}
+    updated = await db.resumes.find_one_and_update(
+        query, update, projection={"_id": 0, "revision": 1}, return_document=ReturnDocument.AFTER
+    )
+    if updated:
+        return updated["revision"]
+    current = await db.resumes.find_one({"id": resume_id, "user_id": user_id}, {"_id": 0, "revision": 1})
+    if not current:
         raise HTTPException(status_code=404, detail="Resume not found")
-    
-    resumes[resume_idx]["content"] = resume_data.content
+    raise HTTPException(status_code=409, detail={"message": "Resume was changed elsewhere", "revision": current["revision"]})
+
+@api_router.put("/resume/{resume_id}")
+async def update_resume(resume_id: str, resume_data: ResumeUpdate, user: dict = Depends(current_user("id"))):
+    fields = {"content": resume_data.content}
     if resume_data.template:
-        resumes[resume_idx]["template"] = resume_data.template
-    resumes[resume_idx]["updated_at"] = datetime.now(timezone.utc).isoformat()
+        fields["template"] = resume_data.template
+    revision = await apply_resume_update(user["id"], resume_id, resume_data.revision, {"$set": fields})
+    return {"message": "Resume updated", "revision": revision}
+
+def valid_section_name(key: str) -> bool:
+    # Section names become `content.<key>` update paths, which dots and `$` would reinterpret
+    return bool(key) and "." not in key and not key.startswith("$")
+
+@api_router.patch("/resume/{resume_id}")
+async def patch_resume(resume_id: str, patch: ResumePatch, user: dict = Depends(current_user("id"))):
+    """Replace or remove individual content sections without resending the whole resume."""
+    if not all(valid_section_name(key) for key in patch.content):
+        raise HTTPException(status_code=400, detail="Invalid section name")
+    update: Dict[str, Any] = {}
+    sets = {f"content.{key}": value for key, value in patch.content.items() if value is not None}
+    if patch.template:
+        sets["template"] = patch.template
+    if sets:
+        update["$set"] = sets
+    unsets = {f"content.{key}": "" for key, value in patch.content.items() if value is None}
+    if unsets:
+        update["$unset"] = unsets
+    revision = await apply_resume_update(user["id"], resume_id, patch.revision, update)
+    return {"message": "Resume updated", "revision": revision}
+
+class JsonPatchError(ValueError):
+    def __init__(self, detail: str, status_code: int = 422):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+def parse_json_pointer(pointer: Any) -> List[str]:
+    if pointer == "":
+        return []
+    if not isinstance(pointer, str) or not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+def _list_index(container: list, token: str, allow_end: bool) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {token}")
+    return index
+
+def _pointer_get(doc: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        if isinstance(doc, dict) and token in doc:
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_list_index(doc, token, allow_end=False)]
+        else:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+    return doc
+
+def _pointer_add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _pointer_get(doc, tokens[:-1])
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, tokens[-1], allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to a scalar at /{'/'.join(tokens[:-1])}")
+    return doc
+
+def _pointer_remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+    parent = _pointer_get(doc, tokens[:-1])
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return parent.pop(_list_index(parent, tokens[-1], allow_end=False))
+    raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+def apply_json_patch(doc: Any, ops: List[Dict[str, Any]]) -> Any:
+    """Apply RFC 6902 operations to a copy of `doc`; the input is left untouched if any operation fails."""
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        name = op.get("op")
+        tokens = parse_json_pointer(op.get("path"))
+        if name in ("add", "replace", "test") and "value" not in op:
+            raise JsonPatchError(f"'{name}' requires a value")
+        if name == "add":
+            doc = _pointer_add(doc, tokens, copy.deepcopy(op["value"]))
+        elif name == "remove":
+            _pointer_remove(doc, tokens)
+        elif name == "replace":
+            if tokens:
+                _pointer_remove(doc, tokens)
+            doc = _pointer_add(doc, tokens, copy.deepcopy(op["value"]))
+        elif name in ("move", "copy"):
+            source = parse_json_pointer(op.get("from"))
+            if name == "move" and tokens[:len(source)] == source and len(tokens) > len(source):
+                raise JsonPatchError("Cannot move a value into one of its own children")
+            value = _pointer_remove(doc, source) if name == "move" else copy.deepcopy(_pointer_get(doc, source))
+            doc = _pointer_add(doc, tokens, value)
+        elif name == "test":
+            if _pointer_get(doc, tokens) != op["value"]:
+                raise JsonPatchError(f"Test failed at {op['path']}", status_code=409)
+        else:
+            raise JsonPatchError(f"Unknown operation: {name!r}")
+    return doc
+
+def patched_sections(ops: List[Dict[str, Any]]) -> set:
+    """Top-level content keys an operation list can change; a root path touches every key."""
+    sections = set()
+    for op in ops:
+        if op["op"] == "test":
+            continue
+        for pointer in (op.get("path"), op.get("from") if op["op"] == "move" else None):
+            if pointer is None:
+                continue
+            tokens = parse_json_pointer(pointer)
+            if tokens:
+                sections.add(tokens[0])
+            else:
+                sections.add(None)
+    return sections
+
+class ResumeDraft:
+    """Unflushed autosave state of one resume."""
     
-    await db.users.update_one({"id": user["id"]}, {"$set": {"resumes": resumes}})
+    def __init__(self, user_id: str, content: Dict[str, Any], revision: int):
+        self.user_id = user_id
+        self.content = content
+        self.revision = revision
+        self.persisted_revision = revision
+        self.dirty: set = set()
+        self.first_change = self.last_change = time.monotonic()
+        self.flusher: Optional[asyncio.Task] = None
+        self.failures = 0
+
+class ResumeWriteBuffer:
+    """Write-behind buffer that coalesces rapid JSON Patch autosaves into one Mongo write per resume.
     
-    return {"message": "Resume updated"}
+    A draft is flushed once edits pause for `delay` seconds, or at most `max_delay` after its first edit;
+    the flush only writes the top-level sections that changed and is conditioned on the persisted revision.
+    A draft whose write keeps failing is dropped after `max_retries` retries, and the next patch for that
+    resume gets 409 so the client reloads instead of editing on top of edits that were never stored.
+    """
+    
+    def __init__(self, delay: float, max_delay: float, max_retries: int):
+        self.delay = delay
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self._drafts: Dict[str, ResumeDraft] = {}
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        # Resumes whose buffered edits were dropped, reported to the next patch
+        self._lost: set = set()
+        self.patches = 0
+        self.flushes = 0
+        self.conflicts = 0
+        self.failures = 0
+    
+    def _lock(self, resume_id: str) -> asyncio.Lock:
+        lock = self._locks.get(resume_id)
+        if lock is None:
+            lock = self._locks[resume_id] = asyncio.Lock()
+        return lock
+    
+    async def apply(self, user_id: str, resume_id: str, revision: int, ops: List[Dict[str, Any]]) -> int:
+        async with self._lock(resume_id):
+            draft = self._drafts.get(resume_id)
+            if draft is None:
+                doc = await db.resumes.find_one({"id": resume_id, "user_id": user_id}, {"_id": 0, "content": 1, "revision": 1})
+                if not doc:
+                    raise HTTPException(status_code=404, detail="Resume not found")
+                if resume_id in self._lost:
+                    self._lost.discard(resume_id)
+                    raise HTTPException(status_code=409, detail={"message": "Recent edits could not be saved", "revision": doc["revision"]})
+                draft = ResumeDraft(user_id, doc["content"], doc["revision"])
+            elif draft.user_id != user_id:
+                raise HTTPException(status_code=404, detail="Resume not found")
+            if revision != draft.revision:
+                raise HTTPException(status_code=409, detail={"message": "Resume was changed elsewhere", "revision": draft.revision})
+            try:
+                content = apply_json_patch(draft.content, ops)
+                sections = patched_sections(ops)
+            except JsonPatchError as e:
+                raise HTTPException(status_code=e.status_code, detail=e.detail)
+            if not isinstance(content, dict):
+                raise HTTPException(status_code=422, detail="Resume content must stay an object")
+            if not all(valid_section_name(key) for key in (content if None in sections else sections & set(content))):
+                raise HTTPException(status_code=422, detail="Invalid section name")
+            self.patches += 1
+            if not sections:
+                return draft.revision
+            if None in sections:
+                sections = set(draft.content) | set(content)
+            draft.content = content
+            draft.revision += 1
+            draft.dirty |= sections
+            draft.last_change = time.monotonic()
+            self._drafts[resume_id] = draft
+            if draft.flusher is None:
+                draft.flusher = asyncio.create_task(self._flush_later(resume_id))
+            return draft.revision
+    
+    async def _flush_later(self, resume_id: str) -> None:
+        while True:
+            draft = self._drafts.get(resume_id)
+            if draft is None:
+                return
+            wait = min(draft.last_change + self.delay, draft.first_change + self.max_delay) - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        await self.flush(resume_id)
+    
+    async def flush(self, resume_id: str) -> None:
+        async with self._lock(resume_id):
+            draft = self._drafts.pop(resume_id, None)
+            if draft is None:
+                return
+            if draft.flusher and draft.flusher is not asyncio.current_task():
+                draft.flusher.cancel()
+            draft.flusher = None
+            stamp = {"revision": draft.revision, "updated_at": datetime.now(timezone.utc).isoformat()}
+            if all(valid_section_name(key) for key in draft.dirty):
+                update: Dict[str, Any] = {"$set": {
+                    **{f"content.{key}": draft.content[key] for key in draft.dirty if key in draft.content}, **stamp
+                }}
+                removed = {f"content.{key}": "" for key in draft.dirty if key not in draft.content}
+                if removed:
+                    update["$unset"] = removed
+            else:
+                # Legacy section names that cannot be addressed by path are written as a whole
+                update = {"$set": {"content": draft.content, **stamp}}
+            try:
+                result = await db.resumes.update_one({"id": resume_id, "revision": draft.persisted_revision}, update)
+            except Exception as e:
+                draft.failures += 1
+                if draft.failures > self.max_retries:
+                    self.failures += 1
+                    self._lost.add(resume_id)
+                    logger.error(f"Dropped buffered edits for resume {resume_id} after {draft.failures} failed flushes: {e!r}")
+                    return
+                # Keep the edits and retry after another quiet period
+                logger.error(f"Resume flush failed for {resume_id} (attempt {draft.failures}): {e!r}")
+                draft.first_change = draft.last_change = time.monotonic()
+                draft.flusher = asyncio.create_task(self._flush_later(resume_id))
+                self._drafts[resume_id] = draft
+                return
+            if result.matched_count:
+                self.flushes += 1
+            else:
+                # Another process wrote this resume first; its version wins and the client sees 409 next time
+                self.conflicts += 1
+                logger.warning(f"Dropped buffered edits for resume {resume_id}: revision moved past {draft.persisted_revision}")
+    
+    async def flush_all(self) -> None:
+        await asyncio.gather(*(self.flush(resume_id) for resume_id in list(self._drafts)))
+    
+    def overlay(self, resume: Dict[str, Any]) -> Dict[str, Any]:
+        """Show buffered edits in reads served by this process."""
+        draft = self._drafts.get(resume["id"])
+        if draft:
+            resume.update(content=draft.content, revision=draft.revision)
+        return resume
+    
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._drafts),
+            "patches": self.patches,
+            "flushes": self.flushes,
+            "conflicts": self.conflicts,
+            "failures": self.failures,
+        }
 
-@api_router.post("/resume/analyze")
-async def analyze_resume(resume_data: ResumeCreate, user: dict = Depends(get_current_user)):
-    """AI-powered resume analysis"""
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
+resume_buffer = ResumeWriteBuffer(RESUME_FLUSH_DELAY_SECONDS, RESUME_FLUSH_MAX_DELAY_SECONDS, RESUME_FLUSH_MAX_RETRIES)
+
+@api_router.patch("/resume/{resume_id}/content")
+async def patch_resume_content(resume_id: str, delta: ResumeDelta, user: dict = Depends(current_user("id"))):
+    """Autosave endpoint: apply RFC 6902 JSON Patch operations to the content at `revision`."""
+    revision = await resume_buffer.apply(user["id"], resume_id, delta.revision, delta.ops)
+    return {"revision": revision}
+
+async def migrate_user_resumes_to_collection() -> int:
+    """Move the embedded `users.resumes` arrays into the resumes collection."""
+    moved = 0
+    async for doc in db.users.find({"resumes": {"$exists": True}}, {"_id": 0, "id": 1, "resumes": 1}):
+        resumes = doc.get("resumes") or []
+        if resumes:
+            # Upsert on the resume id so a re-run after a partial failure never duplicates
+            await db.resumes.bulk_write([
+                UpdateOne(
+                    {"id": r["id"]},
+                    {"$setOnInsert": {**r, "user_id": doc["id"], "revision": 1}},
+                    upsert=True
+                )
+                for r in resumes
+            ])
+        await db.users.update_one({"id": doc["id"]}, {"$unset": {"resumes": ""}})
+        invalidate_user_cache(doc["id"])
+        moved += len(resumes)
+    return moved
+
+# ---- Resume export ----
+
+RESUME_RENDERER_VERSION = 1
+RESUME_CONTACT_FIELDS = ("email", "phone", "linkedin", "github")
+# Rendering styles by the resume's `template`; unknown names fall back to "modern"
+RESUME_RENDER_STYLES = {
+    "modern": {"font": "Helvetica", "bold": "Helvetica-Bold", "accent": (0.31, 0.27, 0.90), "css_font": "Helvetica, Arial, sans-serif"},
+    "classic": {"font": "Times-Roman", "bold": "Times-Bold", "accent": (0.0, 0.0, 0.0), "css_font": "Georgia, 'Times New Roman', serif"},
+}
+RESUME_EXPORT_TYPES = {"pdf": "application/pdf", "html": "text/html; charset=utf-8"}
+
+def resume_render_blocks(resume: Dict[str, Any]) -> Tuple[str, str, List[Tuple[str, str]]]:
+    """(name, contact line, [(heading, text)]) in the company template's section order."""
+    content = resume.get("content") or {}
+    sections = RESUME_TEMPLATES[resume_company(resume.get("company"))]["sections"]
+    blocks = [(section, resume_section_text(content, section)) for section in sections]
+    present = {str(key).lower() for key in content}
+    used = {"name", *RESUME_CONTACT_FIELDS}
+    for section, text in blocks:
+        if text:
+            key = section.lower()
+            used.add(key if key in present else next((a for a in RESUME_SECTION_ALIASES.get(key, ()) if a in present), key))
+    # Content the template has no section for is still exported, after the template's sections
+    blocks += [(str(key).title(), resume_section_text(content, key)) for key in content if str(key).lower() not in used]
+    contact = " | ".join(filter(None, (resume_section_text(content, field) for field in RESUME_CONTACT_FIELDS)))
+    return resume_section_text(content, "name") or "Resume", contact, [(h, t) for h, t in blocks if t]
+
+def render_resume_html(resume: Dict[str, Any], style: Dict[str, Any]) -> bytes:
+    name, contact, blocks = resume_render_blocks(resume)
+    accent = "#%02x%02x%02x" % tuple(int(c * 255) for c in style["accent"])
+    body = "".join(
+        f"<section><h2>{html.escape(heading)}</h2><p>{html.escape(text)}</p></section>" for heading, text in blocks
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>{html.escape(name)}</title>
+<style>body{{font-family:{style['css_font']};max-width:760px;margin:40px auto;color:#1e293b;line-height:1.45}}
+h1{{margin:0;color:{accent}}}.contact{{color:#475569;margin:4px 0 16px}}
+h2{{font-size:13px;letter-spacing:.08em;text-transform:uppercase;color:{accent};border-bottom:1px solid #cbd5e1;padding-bottom:2px}}
+p{{white-space:pre-wrap;margin:6px 0 0}}</style></head>
+<body><h1>{html.escape(name)}</h1><div class="contact">{html.escape(contact)}</div>{body}</body></html>""".encode()
+
+def _pdf_text(text: str) -> str:
+    encoded = text.encode("cp1252", "replace").decode("latin-1")
+    return encoded.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _pdf_wrap(text: str, size: float, width: float) -> List[str]:
+    # Base-14 fonts average about half an em per character, which is close enough for line breaking
+    limit = max(10, int(width / (size * 0.5)))
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > limit:
+                lines.append(line)
+                line = ""
+            line = f"{line} {word}" if line else word
+            while len(line) > limit:
+                lines.append(line[:limit])
+                line = line[limit:]
+        lines.append(line)
+    return lines
+
+def render_resume_pdf(resume: Dict[str, Any], style: Dict[str, Any]) -> bytes:
+    """Minimal PDF 1.4 writer: A4 pages of wrapped text in two base-14 fonts, no external dependencies."""
+    page_w, page_h, margin = 595, 842, 50
+    name, contact, blocks = resume_render_blocks(resume)
+    pages: List[List[str]] = [[]]
+    y = page_h - margin
+    
+    def emit(text: str, font: str, size: float, color=(0.12, 0.16, 0.23), gap: float = 0.0):
+        nonlocal y
+        for line in _pdf_wrap(text, size, page_w - 2 * margin):
+            if y - size < margin:
+                pages.append([])
+                y = page_h - margin
+            y -= size + gap
+            gap = 0.0
+            pages[-1].append(f"BT /{font} {size} Tf {color[0]} {color[1]} {color[2]} rg {margin} {y:.1f} Td ({_pdf_text(line)}) Tj ET")
+            y -= size * 0.35
+    
+    emit(name, "F2", 20, style["accent"])
+    if contact:
+        emit(contact, "F1", 10, (0.28, 0.33, 0.41), gap=4)
+    for heading, text in blocks:
+        emit(heading.upper(), "F2", 11, style["accent"], gap=14)
+        emit(text, "F1", 10, gap=4)
+    
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        f"<< /Type /Font /Subtype /Type1 /BaseFont /{style['font']} /Encoding /WinAnsiEncoding >>",
+        f"<< /Type /Font /Subtype /Type1 /BaseFont /{style['bold']} /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for ops in pages:
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode("latin-1") + stream + b"\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + (obj if isinstance(obj, bytes) else obj.encode("latin-1")) + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+RESUME_RENDERERS = {"pdf": render_resume_pdf, "html": render_resume_html}
+
+class ResumeRenderCache:
+    """Size-bounded LRU of rendered exports on local disk, keyed by (resume, revision, style, format)."""
+    
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.renders = 0
+        self.evictions = 0
+    
+    def start(self) -> None:
+        """Adopt exports left by a previous run, oldest access first."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in sorted(self.directory.glob("*.out"), key=lambda p: p.stat().st_mtime):
+            self._files[path.name] = path.stat().st_size
+            self.total_bytes += self._files[path.name]
+        self._evict()
+    
+    @staticmethod
+    def key(resume_id: str, revision: int, style: str, fmt: str) -> str:
+        return hashlib.sha256(f"{RESUME_RENDERER_VERSION}|{resume_id}|{revision}|{style}|{fmt}".encode()).hexdigest()[:32]
+    
+    def get(self, key: str) -> Optional[bytes]:
+        name = f"{key}.out"
+        if name not in self._files:
+            return None
+        path = self.directory / name
+        try:
+            body = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            self.total_bytes -= self._files.pop(name)
+            return None
+        self._files.move_to_end(name)
+        self.hits += 1
+        return body
+    
+    def put(self, key: str, body: bytes) -> None:
+        name = f"{key}.out"
+        self.renders += 1
+        tmp = self.directory / f"{name}.{uuid.uuid4().hex}.tmp"
+        tmp.write_bytes(body)
+        os.replace(tmp, self.directory / name)
+        self.total_bytes += len(body) - self._files.pop(name, 0)
+        self._files[name] = len(body)
+        self._evict()
+    
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            (self.directory / name).unlink(missing_ok=True)
+            self.total_bytes -= size
+            self.evictions += 1
+    
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "files": len(self._files),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "renders": self.renders,
+            "evictions": self.evictions,
+        }
+
+resume_render_cache = ResumeRenderCache(RESUME_RENDER_CACHE_DIR, RESUME_RENDER_CACHE_MAX_BYTES)
+
+@api_router.get("/resume/{resume_id}/export")
+async def export_resume(resume_id: str, request: Request, format: str = "pdf", template: Optional[str] = None,
+                        user: dict = Depends(current_user("id"))):
+    """Render a stored resume to PDF or HTML; each (revision, template, format) is rendered once and then served from disk."""
+    if format not in RESUME_RENDERERS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(RESUME_RENDERERS)}")
+    # Pending autosave edits are written first so the export matches what the student sees
+    await resume_buffer.flush(resume_id)
+    resume = await db.resumes.find_one({"id": resume_id, "user_id": user["id"]}, {"_id": 0, "revision": 1, "template": 1})
+    if not resume:
+        raise HTTPException(status_code=404, detail="Resume not found")
+    style = template or resume.get("template")
+    style = style if style in RESUME_RENDER_STYLES else "modern"
+    key = resume_render_cache.key(resume_id, resume["revision"], style, format)
+    etag = f'"{key}"'
+    headers = {"Content-Disposition": f'attachment; filename="resume-{resume["revision"]}.{format}"'}
+    if etag_matches(request, etag):
+        return etag_response(request, b"", etag, RESUME_EXPORT_TYPES[format], headers)
+    
+    body = resume_render_cache.get(key)
+    if body is None:
+        resume = await db.resumes.find_one({"id": resume_id, "user_id": user["id"]}, {"_id": 0})
+        body = RESUME_RENDERERS[format](resume, RESUME_RENDER_STYLES[style])
+        # The revision may have moved on since the key was computed; cache under the one actually rendered
+        key = resume_render_cache.key(resume_id, resume["revision"], style, format)
+        etag = f'"{key}"'
+        resume_render_cache.put(key, body)
+    return etag_response(request, body, etag, RESUME_EXPORT_TYPES[format], headers)
+
+# Content keys the builder uses for template sections it has no field of its own for
+RESUME_SECTION_ALIASES = {
+    "objective": ("summary",),
+    "internships": ("experience",),
+}
+# Templates' digests are part of the cache key, so editing focus areas or tips re-analyzes every section
+RESUME_TEMPLATE_DIGESTS = {
+    company: hashlib.sha256(json.dumps(template, sort_keys=True).encode()).hexdigest()[:12]
+    for company, template in RESUME_TEMPLATES.items()
+}
+
+# ---- Local ATS scoring ----
+# Deterministic and LLM-free: the same content and company always get the same score.
+
+ATS_SCORER_VERSION = 1
+ATS_WEIGHTS = {"sections": 0.25, "contact": 0.10, "focus": 0.20, "skills": 0.25, "impact": 0.20}
+ATS_CONTACT_FIELDS = ("email", "phone", "linkedin", "github")
+ATS_SKILL_TARGET = 8  # distinct in-demand skills for full skill credit
+ATS_IMPACT_TARGET = 3  # quantified results for full impact credit
+# Filler and instruction words from template tips that say nothing about the resume itself
+ATS_STOPWORDS = frozenset("""a an and any are as at be by for from if in include into is it its of on or relevant
+show the to use with your all clearly x y highlight quantify emphasize mention list align demonstrate examples
+saved improvement experience experiences format thinking star amazon""".split())
+ATS_SUFFIXES = ("ations", "ation", "ating", "ated", "ate", "ing", "ed", "es", "s")
+ATS_IMPACT_PATTERN = re.compile(
+    r"\d+(?:\.\d+)?\s*(?:%|x\b|k\b|m\b|\+)|[$₹€£]\s?\d|\b\d{2,}\s+(?:users|customers|clients|requests|students|members|downloads|hours|days|people|teams)\b",
+    re.IGNORECASE
+)
+
+def ats_stem(word: str) -> str:
+    if not word.isalpha():
+        return word  # node.js, c++, ci/cd
+    for suffix in ATS_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+def ats_terms(text: str) -> set:
+    """Stemmed unigrams, bigrams and trigrams; skills like "node.js" and "ci/cd" stay single tokens."""
+    tokens = [ats_stem(t.strip(".-/")) for t in re.findall(r"[a-z0-9][a-z0-9+#./-]*", text.lower())]
+    tokens = [t for t in tokens if t]
+    return set(tokens) | {" ".join(tokens[i:i + n]) for n in (2, 3) for i in range(len(tokens) - n + 1)}
+
+# stemmed term -> the word or skill as written in the dictionaries, for reporting
+ATS_DISPLAY: Dict[str, str] = {}
+
+def ats_keywords(phrases: List[str]) -> List[str]:
+    keywords = []
+    for phrase in phrases:
+        for word in re.findall(r"[a-z0-9+#./-]+", phrase.lower()):
+            if word not in ATS_STOPWORDS and not word.isdigit() and len(word) > 2:
+                keywords.append(ats_stem(word))
+                ATS_DISPLAY.setdefault(keywords[-1], word)
+    return list(dict.fromkeys(keywords))
+
+ATS_SKILLS = []
+for _skill in dict.fromkeys(skill for trend in JOB_TRENDS for skill in trend["skills"]):
+    ATS_SKILLS.append(" ".join(ats_stem(w) for w in _skill.lower().split()))
+    ATS_DISPLAY[ATS_SKILLS[-1]] = _skill
+ATS_FOCUS = {company: ats_keywords(t["focus"] + t["tips"]) for company, t in RESUME_TEMPLATES.items()}
+ATS_VOCABULARY = {term: i for i, term in enumerate(dict.fromkeys(ATS_SKILLS + [k for ks in ATS_FOCUS.values() for k in ks]))}
+ATS_SKILL_MASK = np.zeros(len(ATS_VOCABULARY), dtype=np.float32)
+ATS_SKILL_MASK[[ATS_VOCABULARY[t] for t in ATS_SKILLS]] = 1.0
+ATS_FOCUS_MASKS = {}
+for _company, _keywords in ATS_FOCUS.items():
+    ATS_FOCUS_MASKS[_company] = np.zeros(len(ATS_VOCABULARY), dtype=np.float32)
+    ATS_FOCUS_MASKS[_company][[ATS_VOCABULARY[t] for t in _keywords]] = 1.0
+
+def ats_features(contents: List[Dict[str, Any]], company: str) -> Dict[str, np.ndarray]:
+    """Feature matrices for a batch of resumes scored against one company template."""
+    sections = RESUME_TEMPLATES[company]["sections"]
+    terms = np.zeros((len(contents), len(ATS_VOCABULARY)), dtype=np.float32)
+    filled = np.zeros((len(contents), len(sections)), dtype=np.float32)
+    contact = np.zeros((len(contents), len(ATS_CONTACT_FIELDS)), dtype=np.float32)
+    impact = np.zeros(len(contents), dtype=np.float32)
+    for row, content in enumerate(contents):
+        texts = [resume_section_text(content, section) for section in sections]
+        filled[row] = [bool(text) for text in texts]
+        contact[row] = [bool(resume_section_text(content, field)) for field in ATS_CONTACT_FIELDS]
+        body = "\n".join(texts)
+        hits = [ATS_VOCABULARY[t] for t in ats_terms(body) if t in ATS_VOCABULARY]
+        terms[row, hits] = 1.0
+        impact[row] = len(ATS_IMPACT_PATTERN.findall(body))
+    return {"terms": terms, "filled": filled, "contact": contact, "impact": impact}
+
+def score_resumes(contents: List[Dict[str, Any]], company: str) -> List[Dict[str, Any]]:
+    """Vectorized ATS score (0-10) with its component breakdown for each resume in `contents`."""
+    features = ats_features(contents, company)
+    focus_mask = ATS_FOCUS_MASKS[company]
+    components = {
+        "sections": features["filled"].mean(axis=1),
+        "contact": features["contact"].mean(axis=1),
+        "focus": features["terms"] @ focus_mask / max(focus_mask.sum(), 1.0),
+        "skills": np.minimum(features["terms"] @ ATS_SKILL_MASK / ATS_SKILL_TARGET, 1.0),
+        "impact": np.minimum(features["impact"] / ATS_IMPACT_TARGET, 1.0),
+    }
+    totals = sum(ATS_WEIGHTS[name] * values for name, values in components.items()) * 10
+    vocabulary = [ATS_DISPLAY[term] for term in ATS_VOCABULARY]
+    results = []
+    for row in range(len(contents)):
+        present = features["terms"][row]
+        results.append({
+            "score": round(float(totals[row]), 1),
+            "breakdown": {name: round(float(values[row]), 2) for name, values in components.items()},
+            "matched_skills": [vocabulary[i] for i in np.flatnonzero(present * ATS_SKILL_MASK)],
+            "missing_keywords": [vocabulary[i] for i in np.flatnonzero((1 - present) * focus_mask)][:10],
+            "version": ATS_SCORER_VERSION,
+        })
+    return results
+
+def resume_company(company: str) -> str:
+    company = (company or "").lower()
+    return company if company in RESUME_TEMPLATES else "google"
+
+async def rescore_stored_resumes(batch_size: int = 1000) -> int:
+    """Recompute and store the ATS score of every resume; run nightly through POST /api/admin/resumes/rescore."""
+    scored = 0
+    cursor = db.resumes.find({}, {"_id": 0, "id": 1, "company": 1, "content": 1}).batch_size(batch_size)
+    while batch := await cursor.to_list(batch_size):
+        by_company: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for resume in batch:
+            by_company[resume_company(resume.get("company"))].append(resume)
+        scored_at = datetime.now(timezone.utc).isoformat()
+        updates = []
+        for company, resumes in by_company.items():
+            for resume, result in zip(resumes, score_resumes([r.get("content") or {} for r in resumes], company)):
+                updates.append(UpdateOne({"id": resume["id"]}, {"$set": {"ats": {**result, "scored_at": scored_at}}}))
+        await db.resumes.bulk_write(updates, ordered=False)
+        scored += len(updates)
+    return scored
+
+@api_router.post("/admin/resumes/rescore", dependencies=[Depends(require_admin)])
+async def rescore_resumes():
+    """Rescore every stored resume, e.g. from a nightly cron job after ATS_SCORER_VERSION changes."""
+    return {"scored": await rescore_stored_resumes(), "version": ATS_SCORER_VERSION}
+
+class ResumeAnalysisCache:
+    """LRU/TTL cache of per-section feedback keyed by section content hash and company template."""
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
     
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="API key not configured")
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
     
-    template = RESUME_TEMPLATES.get(resume_data.company.lower(), RESUME_TEMPLATES["google"])
+    def metrics(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+resume_analysis_cache = ResumeAnalysisCache(RESUME_ANALYSIS_CACHE_SIZE, RESUME_ANALYSIS_CACHE_TTL_SECONDS)
+
+def resume_section_text(content: Dict[str, Any], section: str) -> str:
+    fields = {str(key).lower(): value for key, value in content.items()}
+    key = section.lower()
+    for candidate in (key, *RESUME_SECTION_ALIASES.get(key, ())):
+        value = fields.get(candidate)
+        if value:
+            return value.strip() if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return ""
+
+async def analyze_resume_section(user_id: str, company: str, template: Dict[str, Any], section: str, text: str) -> Dict[str, Any]:
+    """Narrative feedback for one section; `source` says whether it came from the cache or a new LLM call."""
+    if not text:
+        return {"section": section, "feedback": f"Missing. {template['name']} resumes are expected to have this section.", "source": "missing"}
+    key = hashlib.sha256(f"{RESUME_TEMPLATE_DIGESTS[company]}|{section}|{text}".encode()).hexdigest()
+    cached = resume_analysis_cache.get(key)
+    if cached:
+        return {**cached, "source": "cache"}
     
-    prompt = f"""Analyze this resume for {resume_data.company} application.
+    prompt = f"""Review the {section} section of a resume for a {template['name']} application.
 
-Resume Content:
-{resume_data.content}
+{section}:
+{text}
 
 Company Focus Areas: {', '.join(template['focus'])}
 Tips for this company: {'; '.join(template['tips'])}
 
-Provide:
-1. Strength Analysis (what's good)
-2. Gap Analysis (what's missing)
-3. Specific Improvement Suggestions
-4. ATS Compatibility Score (1-10)
-
-Keep it concise and actionable."""
+Give the main strength, the main gap and one specific improvement, in under 80 words."""
+    feedback = await llm.complete("resume_analysis", f"resume-{user_id}", "You are a professional resume reviewer.", prompt)
+    result = {"section": section, "feedback": feedback.strip()}
+    resume_analysis_cache.put(key, result)
+    return {**result, "source": "llm"}
 
-    try:
-        chat = LlmChat(api_key=api_key, session_id=f"resume-{user['id']}", system_message="You are a professional resume reviewer.")
-        chat.with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
-        return {"analysis": response}
-    except Exception as e:
-        logger.error(f"Resume analysis error: {str(e)}")
-        raise HTTPException(status_code=500, detail="Analysis failed")
+@api_router.post("/resume/analyze")
+async def analyze_resume(resume_data: ResumeCreate, user: dict = Depends(current_user("id"))):
+    """Local ATS score plus AI feedback, one LLM call per changed section of the company template"""
+    company = resume_company(resume_data.company)
+    template = RESUME_TEMPLATES[company]
+    ats = score_resumes([resume_data.content], company)[0]
+    
+    results = await asyncio.gather(*(
+        analyze_resume_section(user["id"], company, template, section, resume_section_text(resume_data.content, section))
+        for section in template["sections"]
+    ), return_exceptions=True)
+    
+    sections = []
+    for section, result in zip(template["sections"], results):
+        if isinstance(result, Exception):
+            logger.error(f"Resume analysis error for {section}: {str(result)}")
+            result = {"section": section, "feedback": "Feedback unavailable right now.", "source": "error"}
+        sections.append(result)
+    
+    breakdown = ", ".join(f"{name} {value:.0%}" for name, value in ats["breakdown"].items())
+    analysis = f"ATS Compatibility Score: {ats['score']}/10 ({breakdown})\n"
+    if ats["missing_keywords"]:
+        analysis += f"Keywords {template['name']} looks for that are missing: {', '.join(ats['missing_keywords'])}\n"
+    analysis += "\n" + "\n\n".join(f"{s['section']}\n{s['feedback']}" for s in sections)
+    return {
+        "analysis": analysis,
+        "score": ats["score"],
+        "ats": ats,
+        "sections": sections,
+        "reanalyzed": sum(1 for s in sections if s["source"] == "llm")
+    }
 
 # ============ CONTENT GENERATION ============
 
 @api_router.post("/generate/linkedin")
-async def generate_linkedin_post(request: LinkedInDraftRequest, user: dict = Depends(get_current_user)):
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="API key not configured")
+async def generate_linkedin_post(request: LinkedInDraftRequest, user: dict = Depends(current_user("name", "role"))):
+    llm.ensure_ready()
     
     prompt = f"""Generate a professional LinkedIn post about learning {request.topic} ({request.learning_type}).
 
@@ -1712,21 +3598,15 @@ User's name: {user.get('name')}
 User's role goal: {user.get('role')}"""
 
     try:
-        chat = LlmChat(api_key=api_key, session_id=f"linkedin-{user['id']}", system_message="You write engaging LinkedIn posts.")
-        chat.with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await llm.complete("linkedin_post", f"linkedin-{user['id']}", "You write engaging LinkedIn posts.", prompt,
+                                      cache_key=LLMCacheKey(str(user.get('role')), f"{request.topic}|{request.learning_type}", (user.get('name', ''),)))
         return {"draft": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail="Generation failed")
 
 @api_router.post("/generate/github")
-async def generate_github_commit(request: GitHubDraftRequest, user: dict = Depends(get_current_user)):
-    from emergentintegrations.llm.chat import LlmChat, UserMessage
-    
-    api_key = os.environ.get('EMERGENT_LLM_KEY')
-    if not api_key:
-        raise HTTPException(status_code=500, detail="API key not configured")
+async def generate_github_commit(request: GitHubDraftRequest, user: dict = Depends(current_user("id"))):
+    llm.ensure_ready()
     
     prompt = f"""Generate a professional GitHub commit message and README update for:
 
@@ -1738,10 +3618,8 @@ Provide:
 2. README update snippet"""
 
     try:
-        chat = LlmChat(api_key=api_key, session_id=f"github-{user['id']}", system_message="You write clear technical documentation.")
-        chat.with_model("openai", "gpt-5.2")
-        
-        response = await chat.send_message(UserMessage(text=prompt))
+        response = await llm.complete("github_draft", f"github-{user['id']}", "You write clear technical documentation.", prompt,
+                                      cache_key=LLMCacheKey("", f"{request.project_name}|{request.changes}"))
         return {"draft": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail="Generation failed")
@@ -1749,7 +3627,7 @@ Provide:
 # ============ JOB TRENDS ============
 
 @api_router.get("/trends")
-async def get_job_trends(user: dict = Depends(get_current_user)):
+async def get_job_trends(user: dict = Depends(current_user("role"))):
     user_role = user.get("role", "SDE")
     relevant_trends = [t for t in JOB_TRENDS if t["category"] == user_role or t["category"] == "All"]
     if not relevant_trends:
@@ -1759,7 +3637,7 @@ async def get_job_trends(user: dict = Depends(get_current_user)):
 # ============ PLACEMENT READINESS ============
 
 @api_router.get("/readiness")
-async def get_readiness_score(user: dict = Depends(get_current_user)):
+async def get_readiness_score(user: dict = Depends(current_user("progress", "points", "level", "role", "streak"))):
     progress = user.get("progress", {})
     points = user.get("points", 0)
     level = user.get("level", "Beginner")
@@ -1767,20 +3645,21 @@ async def get_readiness_score(user: dict = Depends(get_current_user)):
     streak = user.get("streak", {})
     
     # Calculate skill scores
-    dsa_completed = sum(1 for k, v in progress.items() if k.startswith(("arr", "str", "ll", "sq", "tree", "dp")) and v.get("completed"))
-    analytics_completed = sum(1 for k, v in progress.items() if k.startswith(("sql", "excel", "eda")) and v.get("completed"))
-    ds_completed = sum(1 for k, v in progress.items() if k.startswith(("pyds", "stats")) and v.get("completed"))
-    ml_completed = sum(1 for k, v in progress.items() if k.startswith("ml") and v.get("completed"))
+    completed = count_completed_by_domain(progress)
+    dsa_completed = completed["dsa"]
+    analytics_completed = completed["analytics"]
+    ds_completed = completed["datascience"]
+    ml_completed = completed["ml"]
     
     # Role-specific readiness
     if role == "SDE":
-        skill_score = min(100, (dsa_completed / 20) * 100)
+        skill_score = min(100, (dsa_completed / DOMAIN_TOTALS["dsa"]) * 100)
     elif role == "Data Analyst":
-        skill_score = min(100, (analytics_completed / 6) * 100)
+        skill_score = min(100, (analytics_completed / DOMAIN_TOTALS["analytics"]) * 100)
     elif role == "Data Scientist":
-        skill_score = min(100, ((ds_completed + analytics_completed) / 10) * 100)
+        skill_score = min(100, ((ds_completed + analytics_completed) / (DOMAIN_TOTALS["datascience"] + DOMAIN_TOTALS["analytics"])) * 100)
     else:  # ML Engineer
-        skill_score = min(100, ((ml_completed + dsa_completed) / 15) * 100)
+        skill_score = min(100, ((ml_completed + dsa_completed) / (DOMAIN_TOTALS["ml"] + DOMAIN_TOTALS["dsa"])) * 100)
     
     consistency_score = min(100, (streak.get("current", 0) / 7) * 100)
     
@@ -1809,23 +3688,426 @@ async def get_readiness_score(user: dict = Depends(get_current_user)):
 
 # ============ CODE EXECUTION ============
 
+SANDBOX_WORKER_SCRIPT = ROOT_DIR / "sandbox_worker.py"
+# Workers must not inherit the server's secrets (JWT_SECRET, EMERGENT_LLM_KEY, MONGO_URL, ...)
+SANDBOX_WORKER_ENV = {"PATH": "/usr/bin:/bin"}
+# Before Python 3.12 the worker cannot unshare its own network namespace, so it is started in one
+SANDBOX_WORKER_PREFIX = () if hasattr(os, "unshare") else ("unshare", "--net")
+
+class SandboxPool:
+    """Pool of warm sandbox_worker.py processes; each run is forked from an idle worker under rlimits."""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.subprocess.Process] = []
+        self.runs = 0
+        self.timeouts = 0
+        self.restarts = 0
+    
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        worker = await asyncio.create_subprocess_exec(
+            *SANDBOX_WORKER_PREFIX, sys.executable, "-I", str(SANDBOX_WORKER_SCRIPT),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=SANDBOX_WORKER_ENV,
+            limit=4 * SANDBOX_OUTPUT_LIMIT + 65536,
+        )
+        self._workers.append(worker)
+        return worker
+    
+    async def start(self) -> None:
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(await self._spawn())
+    
+    async def _replace(self, worker: asyncio.subprocess.Process) -> asyncio.subprocess.Process:
+        self.restarts += 1
+        if worker.returncode is None:
+            worker.kill()
+        await worker.wait()
+        self._workers.remove(worker)
+        return await self._spawn()
+    
+    async def run(self, code: str, stdin: str = "", timeout: Optional[float] = None, **job: Any) -> Dict[str, Any]:
+        """Execute `code` in a sandboxed child; extra keyword args are passed through to the worker job."""
+        if self._idle is None:
+            raise HTTPException(status_code=503, detail="Code runner is starting up. Try again shortly.")
+        timeout = timeout or SANDBOX_TIMEOUT_SECONDS
+        job.update({
+            "code": code,
+            "stdin": stdin,
+            "timeout": timeout,
+            "memory_mb": SANDBOX_MEMORY_MB,
+            "output_limit": SANDBOX_OUTPUT_LIMIT,
+        })
+        worker = await self._idle.get()
+        healthy = False
+        try:
+            worker.stdin.write((json.dumps(job) + "\n").encode())
+            await worker.stdin.drain()
+            # The worker enforces the run timeout itself; this only guards against a wedged worker
+            line = await asyncio.wait_for(worker.stdout.readline(), timeout + 5)
+            if not line:
+                raise ConnectionError("sandbox worker exited")
+            result = json.loads(line)
+            healthy = True
+        except (asyncio.TimeoutError, ConnectionError, ValueError) as e:
+            logger.error(f"Sandbox worker failure: {e!r}")
+            result = {"status": "error", "output": "", "error": "Code runner failed. Please try again.", "time_ms": 0, "memory_kb": 0}
+        finally:
+            # A cancelled or broken run leaves the worker mid-protocol, so it is replaced
+            if not healthy:
+                worker = await asyncio.shield(self._replace(worker))
+            self._idle.put_nowait(worker)
+        self.runs += 1
+        if result["status"] == "timeout":
+            self.timeouts += 1
+        return result
+    
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "workers": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "runs": self.runs,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+    
+    async def shutdown(self) -> None:
+        for worker in self._workers:
+            if worker.returncode is None:
+                worker.kill()
+                await worker.wait()
+
+sandbox = SandboxPool(SANDBOX_WORKERS)
+
+def normalized_code_hash(code: str) -> str:
+    """Hash of the parsed program, so comments, blank lines and spacing don't change the key."""
+    try:
+        canonical = ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        canonical = code
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class GradeCache:
+    """LRU/TTL cache of sandbox grading results keyed by code hash, task and suite version."""
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Identical gradings already in the sandbox are awaited instead of started again
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return result
+    
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic(), result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    async def get_or_run(self, key: str, run) -> Dict[str, Any]:
+        result = self.get(key)
+        if result is None and key in self._inflight:
+            # Shares the outcome of that run, including its failure
+            result = await asyncio.shield(self._inflight[key])
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # marks it retrieved, since there may be no waiter
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if self.cacheable(result):
+            self.put(key, result)
+        return result
+    
+    @staticmethod
+    def cacheable(result: Dict[str, Any]) -> bool:
+        # Runner failures, timeouts and a "too slow" complexity estimate can all be load-dependent,
+        # so only clean runs are kept; a slow verdict is measured again on the next submission
+        complexity = result.get("complexity")
+        return result["status"] == "ok" and not (complexity and not complexity.get("within_budget"))
+    
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+grade_cache = GradeCache(GRADE_CACHE_SIZE, GRADE_CACHE_TTL_SECONDS)
+
+async def run_grading(code: str, task_id: str, tests: Dict[str, Any], scope: str) -> Dict[str, Any]:
+    """Grade `code` against `tests`, reusing the result of an identical earlier grading."""
+    key = f"{task_id}:{tests['version']}:{scope}:{normalized_code_hash(code)}"
+    return await grade_cache.get_or_run(
+        key, lambda: sandbox.run(code, timeout=SANDBOX_GRADE_TIMEOUT_SECONDS, mode="grade", tests=tests)
+    )
+
+async def grade_submission(code: str, task_id: str) -> Dict[str, Any]:
+    """Run all test cases of a task against `code` in a single sandbox launch."""
+    tests = TASK_TESTS[task_id]
+    result = await run_grading(code, task_id, tests, "full")
+    return {
+        "passed": result.get("passed", False),
+        "passed_cases": result.get("passed_cases", 0),
+        "total_cases": result.get("total_cases", len(tests["cases"])),
+        "cases": result.get("cases", []),
+        "complexity": result.get("complexity"),
+        "error": result["error"],
+        "time_ms": result["time_ms"],
+        "memory_kb": result["memory_kb"]
+    }
+
+def validate_code_run(request: CodeRunRequest) -> None:
+    if request.measure_complexity:
+        tests = TASK_TESTS.get(request.task_id) if request.task_id else None
+        if not tests or "performance" not in tests:
+            raise HTTPException(status_code=400, detail="This task has no performance budget to measure against")
+
 @api_router.post("/code/run")
-async def run_code(request: CodeRunRequest, user: dict = Depends(get_current_user)):
-    code = request.code
+async def run_code(request: CodeRunRequest, user: dict = Depends(current_user("id"))):
+    validate_code_run(request)
+    job = job_queue.enqueue(JOB_LANE_RUN, user["id"], partial(execute_code_run, request))
+    return await job.outcome()
+
+async def execute_code_run(request: CodeRunRequest) -> Dict[str, Any]:
+    if request.measure_complexity:
+        # Visible cases guard correctness; hidden cases stay for submission
+        tests = TASK_TESTS[request.task_id]
+        visible = {**tests, "cases": [case for case in tests["cases"] if not case.get("hidden")]}
+        result = await run_grading(request.code, request.task_id, visible, "visible")
+    else:
+        result = await sandbox.run(request.code)
+    return {
+        "success": result["status"] == "ok",
+        "output": result["output"] or ("" if result["error"] else "No output. Add print() statements."),
+        "error": result["error"],
+        "time_ms": result["time_ms"],
+        "memory_kb": result["memory_kb"],
+        "complexity": result.get("complexity")
+    }
+
+# ============ JOB QUEUE ============
+
+JOB_LANE_SUBMIT = "submit"
+JOB_LANE_RUN = "run"
+JOB_FINISHED = ("done", "failed")
+
+class Job:
+    """One queued execution; status changes wake anyone polling or streaming it."""
+    
+    def __init__(self, lane: str, user_id: str, handler):
+        self.id = str(uuid.uuid4())
+        self.lane = lane
+        self.user_id = user_id
+        self.handler = handler
+        self.status = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Event()
+    
+    def set_status(self, status: str) -> None:
+        self.status = status
+        now = time.monotonic()
+        if status == "running":
+            self.started_at = now
+        elif status in JOB_FINISHED:
+            self.finished_at = now
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def wait_change(self, timeout: Optional[float] = None) -> None:
+        await asyncio.wait_for(self._changed.wait(), timeout)
+    
+    async def wait(self, timeout: Optional[float] = None) -> None:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.status not in JOB_FINISHED:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                await self.wait_change(remaining)
+            except asyncio.TimeoutError:
+                return
     
-    dangerous_keywords = ["import os", "import subprocess", "exec(", "eval(", "open(", "__import__"]
-    for kw in dangerous_keywords:
-        if kw in code:
-            return {"success": False, "output": "", "error": f"Security Error: '{kw}' is not allowed."}
+    async def outcome(self) -> Dict[str, Any]:
+        """Wait for the job and return its result, re-raising a failure as the original HTTP error."""
+        await self.wait()
+        if self.error:
+            raise HTTPException(status_code=self.error["status_code"], detail=self.error["detail"])
+        return self.result
     
-    if "print(" in code:
+    def public(self) -> Dict[str, Any]:
         return {
-            "success": True,
-            "output": "Code executed! (Demo mode)\n\nTip: Use 'Submit' to validate against test cases.",
-            "error": None
+            "job_id": self.id,
+            "lane": self.lane,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "queued_ms": round(((self.started_at or time.monotonic()) - self.created_at) * 1000, 1)
         }
+
+class JobQueue:
+    """In-process execution queue with priority lanes and per-lane backpressure."""
+    
+    def __init__(self, workers: int, lane_limits: Dict[str, int]):
+        # Lanes are served in this order: final submissions before interactive runs
+        self.lane_limits = lane_limits
+        self.workers = workers
+        self._lanes = {lane: deque() for lane in lane_limits}
+        self._available: Optional[asyncio.Semaphore] = None
+        self._tasks: List[asyncio.Task] = []
+        self.jobs: Dict[str, Job] = {}
+        self.completed = dict.fromkeys(lane_limits, 0)
+        self.rejected = dict.fromkeys(lane_limits, 0)
+        self.running = 0
+    
+    def start(self) -> None:
+        self._available = asyncio.Semaphore(0)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+    
+    async def shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    def enqueue(self, lane: str, user_id: str, handler) -> Job:
+        if self._available is None:
+            raise HTTPException(status_code=503, detail="Code runner is starting up. Try again shortly.")
+        self._prune()
+        if len(self._lanes[lane]) >= self.lane_limits[lane]:
+            self.rejected[lane] += 1
+            raise HTTPException(status_code=429, detail="Code runner is busy. Please retry in a few seconds.",
+                                headers={"Retry-After": "2"})
+        job = Job(lane, user_id, handler)
+        self.jobs[job.id] = job
+        self._lanes[lane].append(job)
+        self._available.release()
+        return job
+    
+    def get(self, job_id: str, user_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if not job or job.user_id != user_id:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
     
-    return {"success": True, "output": "No output. Add print() statements.", "error": None}
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - JOB_RESULT_TTL_SECONDS
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+    
+    def _next_job(self) -> Job:
+        return next(lane.popleft() for lane in self._lanes.values() if lane)
+    
+    async def _work(self) -> None:
+        while True:
+            await self._available.acquire()
+            job = self._next_job()
+            job.set_status("running")
+            self.running += 1
+            try:
+                job.result = await job.handler()
+                job.set_status("done")
+            except HTTPException as e:
+                job.error = {"status_code": e.status_code, "detail": e.detail}
+                job.set_status("failed")
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.lane}) failed: {e!r}")
+                job.error = {"status_code": 500, "detail": "Execution failed. Please try again."}
+                job.set_status("failed")
+            finally:
+                self.running -= 1
+                self.completed[job.lane] += 1
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": {lane: len(jobs) for lane, jobs in self._lanes.items()},
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+job_queue = JobQueue(JOB_WORKERS, {JOB_LANE_SUBMIT: JOB_QUEUE_MAX_SUBMIT, JOB_LANE_RUN: JOB_QUEUE_MAX_RUN})
+
+@api_router.post("/jobs/code/run", status_code=202)
+async def enqueue_code_run(request: CodeRunRequest, user: dict = Depends(current_user("id"))):
+    validate_code_run(request)
+    return job_queue.enqueue(JOB_LANE_RUN, user["id"], partial(execute_code_run, request)).public()
+
+@api_router.post("/jobs/tasks/{task_id}/submit", status_code=202)
+async def enqueue_submission(task_id: str, submission: TaskSubmission, user: dict = Depends(current_user("id"))):
+    if task_id not in TASK_INDEX:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return job_queue.enqueue(JOB_LANE_SUBMIT, user["id"], partial(process_submission, user["id"], task_id, submission)).public()
+
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0, user: dict = Depends(current_user("id"))):
+    """Poll a job; `wait` long-polls up to 30s for it to finish."""
+    job = job_queue.get(job_id, user["id"])
+    if wait > 0:
+        await job.wait(min(wait, 30))
+    return job.public()
+
+@api_router.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str, user: dict = Depends(current_user("id"))):
+    """Server-Sent Events: one `status` event per state change, ending with the finished job."""
+    job = job_queue.get(job_id, user["id"])
+    
+    async def events():
+        last_status = None
+        while True:
+            if job.status != last_status:
+                last_status = job.status
+                yield f"event: status\ndata: {json.dumps(job.public())}\n\n"
+            if job.status in JOB_FINISHED:
+                return
+            try:
+                await job.wait_change(15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
 # ============ ROOT ============
 
@@ -1833,8 +4115,19 @@ async def run_code(request: CodeRunRequest, user: dict = Depends(get_current_use
 async def root():
     return {"message": "SkillForge API", "version": "2.0.0"}
 
+# Operators are granted the admin role directly in the database; /users/role never assigns it
+@api_router.get("/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    return {"password_hashing": password_hasher.metrics(), "sandbox": sandbox.metrics(), "jobs": job_queue.metrics(),
+            "grade_cache": grade_cache.metrics(), "llm": llm.metrics(),
+            "resume_buffer": resume_buffer.metrics(), "resume_analysis_cache": resume_analysis_cache.metrics(),
+            "resume_render_cache": resume_render_cache.metrics()}
+
 app.include_router(api_router)
 
+# Added before CORS so that CORS wraps it and early 413s still reach the browser
+app.add_middleware(RequestBodyLimit, limits=VOICE_BODY_LIMITS)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1843,6 +4136,101 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ============ STORAGE BOOTSTRAP ============
+
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "chat_history": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)]),
+        IndexModel([("session_id", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "bro_memory": [
+        IndexModel([("session_id", ASCENDING)], unique=True),
+    ],
+    "submissions": [
+        IndexModel([("user_id", ASCENDING), ("task_id", ASCENDING), ("attempt", DESCENDING)]),
+    ],
+    "resumes": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", ASCENDING)]),
+    ],
+    "migrations": [
+        IndexModel([("version", ASCENDING)], unique=True),
+    ],
+}
+
+# (version, name, coroutine function); append only, never renumber
+MIGRATIONS = [
+    (1, "move submitted code out of user documents", migrate_progress_code_to_submissions),
+    (2, "move resumes out of user documents", migrate_user_resumes_to_collection),
+]
+
+async def ensure_indexes() -> None:
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+async def claim_migration(version: int, name: str) -> bool:
+    """Claim `version` for this worker; False if it was applied or another worker holds a live claim."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.migrations.insert_one({"version": version, "name": name, "started_at": now.isoformat(), "applied_at": None})
+        return True
+    except DuplicateKeyError:
+        pass
+    # A claim that never finished within the lease belongs to a worker that died mid-migration
+    stale_before = (now - timedelta(seconds=MIGRATION_LEASE_SECONDS)).isoformat()
+    result = await db.migrations.update_one(
+        {"version": version, "applied_at": None, "started_at": {"$lt": stale_before}},
+        {"$set": {"started_at": now.isoformat()}}
+    )
+    return result.modified_count == 1
+
+async def run_migrations() -> None:
+    """Apply pending migrations in version order, each at most once across all workers.
+    
+    Migrations must be safe to re-run: a failed one releases its claim and is retried on the
+    next startup, and one whose worker died is retried once its lease has expired.
+    """
+    for version, name, migrate in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if not await claim_migration(version, name):
+            continue
+        logger.info(f"Applying migration {version}: {name}")
+        try:
+            result = await migrate()
+        except Exception:
+            logger.exception(f"Migration {version} failed: {name}")
+            await db.migrations.delete_one({"version": version, "applied_at": None})
+            raise
+        await db.migrations.update_one(
+            {"version": version},
+            {"$set": {"applied_at": datetime.now(timezone.utc).isoformat(), "result": result}}
+        )
+
+@app.on_event("startup")
+async def startup_storage():
+    await ensure_indexes()
+    await run_migrations()
+
+@app.on_event("startup")
+async def startup_sandbox():
+    await sandbox.start()
+    job_queue.start()
+
+@app.on_event("startup")
+async def startup_llm():
+    llm.start()
+
+@app.on_event("startup")
+async def startup_render_cache():
+    resume_render_cache.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await resume_buffer.flush_all()
     client.close()
+    password_hasher.shutdown()
+    await job_queue.shutdown()
+    await sandbox.shutdown()
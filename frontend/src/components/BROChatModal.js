@@ -1,6 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { useAuth } from '@/context/AuthContext';
-import axios from 'axios';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent } from '@/components/ui/card';
 import { Input } from '@/components/ui/input';
@@ -18,6 +17,25 @@ const quickPrompts = [
   { label: "DSA Strategy", icon: "📊", message: "What's the best strategy to learn DSA effectively?" },
 ];
 
+// Reads a Server-Sent Events response body, calling onEvent(name, data) per event
+async function readEventStream(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const frames = buffer.split('\n\n');
+    buffer = frames.pop();
+    for (const frame of frames) {
+      const event = frame.match(/^event: (.*)$/m)?.[1];
+      const data = frame.match(/^data: (.*)$/m)?.[1];
+      if (event && data) onEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 export default function BROChatModal({ isOpen, onClose }) {
   const { token, user } = useAuth();
   const [messages, setMessages] = useState([
@@ -34,6 +52,13 @@ export default function BROChatModal({ isOpen, onClose }) {
   const mediaRecorderRef = useRef(null);
   const audioChunksRef = useRef([]);
 
+  const appendToReply = (text) => setMessages(prev => {
+    const updated = [...prev];
+    const last = updated[updated.length - 1];
+    updated[updated.length - 1] = { ...last, content: last.content + text };
+    return updated;
+  });
+
   useEffect(() => {
     chatEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
@@ -48,11 +73,18 @@ export default function BROChatModal({ isOpen, onClose }) {
     setIsLoading(true);
 
     try {
-      const response = await axios.post(`${API}/bro/chat`,
-        { message: userMessage, context: mode === 'resume' ? 'Resume Help Mode' : 'General Chat' },
-        { headers: { Authorization: `Bearer ${token}` }}
-      );
-      setMessages(prev => [...prev, { role: 'bro', content: response.data.response }]);
+      const response = await fetch(`${API}/bro/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+        body: JSON.stringify({ message: userMessage, context: mode === 'resume' ? 'Resume Help Mode' : 'General Chat' })
+      });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      setMessages(prev => [...prev, { role: 'bro', content: '' }]);
+
+      await readEventStream(response, (event, data) => {
+        if (event === 'delta') appendToReply(data.text);
+        if (event === 'error') appendToReply(data.detail);
+      });
     } catch (error) {
       setMessages(prev => [...prev, { 
         role: 'bro', 
@@ -107,17 +139,23 @@ export default function BROChatModal({ isOpen, onClose }) {
       formData.append('audio', audioBlob, 'voice.webm');
       formData.append('context', mode === 'resume' ? 'Resume Help Mode' : 'General Chat');
 
-      const response = await axios.post(`${API}/bro/voice`, formData, {
-        headers: { 
-          Authorization: `Bearer ${token}`,
-          'Content-Type': 'multipart/form-data'
-        }
+      const response = await fetch(`${API}/bro/voice/stream`, {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${token}` },
+        body: formData
       });
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
 
-      setMessages(prev => {
-        const updated = [...prev];
-        updated[updated.length - 1] = { role: 'user', content: response.data.transcription };
-        return [...updated, { role: 'bro', content: response.data.response }];
+      await readEventStream(response, (event, data) => {
+        if (event === 'transcription') {
+          setMessages(prev => {
+            const updated = [...prev];
+            updated[updated.length - 1] = { role: 'user', content: data.text };
+            return [...updated, { role: 'bro', content: '' }];
+          });
+        }
+        if (event === 'delta') appendToReply(data.text);
+        if (event === 'error') setMessages(prev => [...prev, { role: 'bro', content: data.detail }]);
       });
     } catch (error) {
       setMessages(prev => [...prev, { 
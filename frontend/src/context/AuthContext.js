@@ -48,11 +48,19 @@ export const AuthProvider = ({ children }) => {
     return userData;
   };
 
+  const adoptToken = (newToken) => {
+    if (newToken && newToken !== token) {
+      localStorage.setItem('token', newToken);
+      setToken(newToken);
+    }
+  };
+
   const updateRole = async (role) => {
-    await axios.put(`${API}/users/role`, { role }, {
+    const response = await axios.put(`${API}/users/role`, { role }, {
       headers: { Authorization: `Bearer ${token}` }
     });
     setUser(prev => ({ ...prev, role }));
+    adoptToken(response.data.token);
   };
 
   const logout = () => {
@@ -78,6 +86,7 @@ export const AuthProvider = ({ children }) => {
       login, 
       register, 
       updateRole, 
+      adoptToken,
       logout,
       refreshProfile 
     }}>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '@/context/AuthContext';
 import axios from 'axios';
@@ -12,9 +12,15 @@ import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { ScrollArea } from '@/components/ui/scroll-area';
 import { toast } from 'sonner';
-import { ArrowLeft, FileText, Building2, Sparkles, Save, Loader2 } from 'lucide-react';
+import { ArrowLeft, FileText, Building2, Sparkles, Save, Loader2, Download } from 'lucide-react';
 
 const API = `${process.env.REACT_APP_BACKEND_URL}/api`;
+const AUTOSAVE_DELAY_MS = 1000;
+
+// JSON Patch (RFC 6902) ops for the top-level fields that differ between two versions
+const diffContent = (before, after) => Object.keys(after)
+  .filter(key => before[key] !== after[key])
+  .map(key => ({ op: key in before ? 'replace' : 'add', path: `/${key.replace(/~/g, '~0').replace(/\//g, '~1')}`, value: after[key] }));
 
 export default function ResumeBuilderPage() {
   const navigate = useNavigate();
@@ -37,6 +43,10 @@ export default function ResumeBuilderPage() {
   const [isAnalyzing, setIsAnalyzing] = useState(false);
   const [isSaving, setIsSaving] = useState(false);
   const [savedResumes, setSavedResumes] = useState([]);
+  // The resume being edited once it has been saved: { id, revision, content }
+  const savedRef = useRef(null);
+  // Set once the server rejects an edit as conflicting; nothing is saved again until a reload
+  const [conflicted, setConflicted] = useState(false);
 
   useEffect(() => {
     const fetchData = async () => {
@@ -54,6 +64,37 @@ export default function ResumeBuilderPage() {
     fetchData();
   }, [token]);
 
+  // Background autosaves only report conflicts; an explicit save passes rethrow to see every failure
+  const autosave = async (rethrow = false) => {
+    const saved = savedRef.current;
+    if (!saved || conflicted) return;
+    const ops = diffContent(saved.content, resumeContent);
+    if (!ops.length) return;
+    try {
+      const response = await axios.patch(`${API}/resume/${saved.id}/content`,
+        { revision: saved.revision, ops },
+        { headers: { Authorization: `Bearer ${token}` }}
+      );
+      savedRef.current = { ...saved, revision: response.data.revision, content: resumeContent };
+    } catch (error) {
+      if (error.response?.status === 409) {
+        const lost = error.response.data?.detail?.message === 'Recent edits could not be saved';
+        toast.error(lost
+          ? 'Your latest edits could not be saved. Reload to continue editing.'
+          : 'This resume was changed in another tab. Reload to continue editing.');
+        setConflicted(true);
+      }
+      if (rethrow) throw error;
+    }
+  };
+
+  useEffect(() => {
+    if (!savedRef.current || conflicted) return;
+    const timer = setTimeout(autosave, AUTOSAVE_DELAY_MS);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [resumeContent]);
+
   const handleAnalyze = async () => {
     setIsAnalyzing(true);
     try {
@@ -72,24 +113,52 @@ export default function ResumeBuilderPage() {
   };
 
   const handleSave = async () => {
+    if (conflicted) {
+      toast.error('Reload to continue editing this resume.');
+      return;
+    }
     setIsSaving(true);
     try {
-      await axios.post(`${API}/resume/create`, {
-        company: selectedCompany,
-        content: resumeContent,
-        template: 'modern'
-      }, { headers: { Authorization: `Bearer ${token}` }});
+      if (savedRef.current) {
+        await autosave(true);
+      } else {
+        const response = await axios.post(`${API}/resume/create`, {
+          company: selectedCompany,
+          content: resumeContent,
+          template: 'modern'
+        }, { headers: { Authorization: `Bearer ${token}` }});
+        savedRef.current = { id: response.data.resume_id, revision: response.data.revision, content: resumeContent };
+      }
       toast.success('Resume saved!');
       
       const resumesRes = await axios.get(`${API}/resume/list`, { headers: { Authorization: `Bearer ${token}` }});
       setSavedResumes(resumesRes.data.resumes || []);
     } catch (error) {
-      toast.error('Failed to save');
+      // Conflicts were already reported by autosave
+      if (error.response?.status !== 409) toast.error('Failed to save');
     } finally {
       setIsSaving(false);
     }
   };
 
+  const handleDownload = async (resume) => {
+    try {
+      const response = await axios.get(`${API}/resume/${resume.id}/export`, {
+        params: { format: 'pdf' },
+        responseType: 'blob',
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      const url = URL.createObjectURL(response.data);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `${resume.company}-resume.pdf`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      toast.error('Export failed');
+    }
+  };
+
   const template = templates[selectedCompany];
 
   return (
@@ -251,7 +320,7 @@ export default function ResumeBuilderPage() {
                     {isAnalyzing ? <Loader2 className="w-4 h-4 mr-2 animate-spin" /> : <Sparkles className="w-4 h-4 mr-2" />}
                     Analyze with AI
                   </Button>
-                  <Button onClick={handleSave} disabled={isSaving} variant="outline">
+                  <Button onClick={handleSave} disabled={isSaving || conflicted} variant="outline">
                     {isSaving ? <Loader2 className="w-4 h-4 mr-2 animate-spin" /> : <Save className="w-4 h-4 mr-2" />}
                     Save Resume
                   </Button>
@@ -312,7 +381,12 @@ export default function ResumeBuilderPage() {
                           <p className="text-sm font-medium">{resume.company}</p>
                           <p className="text-xs text-slate-500">{new Date(resume.created_at).toLocaleDateString()}</p>
                         </div>
-                        <Badge variant="outline">{resume.template}</Badge>
+                        <div className="flex items-center gap-2">
+                          <Badge variant="outline">{resume.template}</Badge>
+                          <Button variant="ghost" size="sm" onClick={() => handleDownload(resume)} aria-label="Download PDF">
+                            <Download className="w-4 h-4" />
+                          </Button>
+                        </div>
                       </div>
                     ))}
                   </div>
@@ -21,7 +21,7 @@ const difficultyColors = {
 export default function TaskPage() {
   const { trackId, taskId } = useParams();
   const navigate = useNavigate();
-  const { token, refreshProfile } = useAuth();
+  const { token, refreshProfile, adoptToken } = useAuth();
   
   const [task, setTask] = useState(null);
   const [loading, setLoading] = useState(true);
@@ -97,8 +97,23 @@ export default function TaskPage() {
         { headers: { Authorization: `Bearer ${token}` }}
       );
       
+      const grading = response.data.grading;
+      if (grading) {
+        setOutput(grading.cases.map((c) =>
+          `Case ${c.case + 1}${c.hidden ? ' (hidden)' : ''}: ${c.passed ? 'PASS' : 'FAIL'} (${c.time_ms} ms)` +
+          (c.hidden || c.passed ? '' : `\n  input: ${c.input}\n  expected: ${c.expected}\n  got: ${c.actual}`) +
+          (c.error ? `\n  ${c.error}` : '')
+        ).join('\n') + (grading.error ? `\n${grading.error}` : '') +
+          (grading.complexity ? `\nComplexity: ${grading.complexity.inferred || 'unknown'} (target ${grading.complexity.budget})` : ''));
+      }
+      
+      if (!response.data.success) {
+        toast.error(response.data.message);
+        return;
+      }
       if (response.data.points_earned > 0) {
         toast.success(`🎉 +${response.data.points_earned} points!`);
+        adoptToken(response.data.token);
         await refreshProfile();
       } else {
         toast.success('Submission recorded!');
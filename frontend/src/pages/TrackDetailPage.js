@@ -33,6 +33,7 @@ export default function TrackDetailPage() {
     const fetchTrack = async () => {
       try {
         const response = await axios.get(`${API}/skills/dsa/${trackId}`, {
+          params: { view: 'summary' },
           headers: { Authorization: `Bearer ${token}` }
         });
         setTrack(response.data);
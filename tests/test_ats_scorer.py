@@ -0,0 +1,110 @@
+import asyncio
+import copy
+
+import pytest
+
+import server
+
+STRONG = {
+    "Summary": "Backend engineer who led system design for a payments platform.",
+    "Experience": "Improved latency by 40% and cut costs by $20K; shipped APIs used by 500 customers. "
+                  "Drove cross-team collaboration on Kubernetes and Docker rollouts.",
+    "Projects": "Open-source contributions to a Python and PyTorch toolkit.",
+    "Skills": "Python, React, Node.js, AWS, Kubernetes, Docker, PyTorch, TensorFlow, SQL",
+    "Education": "B.Tech Computer Science",
+    "email": "a@example.com",
+    "phone": "+1 555 0100",
+}
+WEAK = {"Summary": "Looking for a job."}
+
+
+def test_same_input_gets_the_same_score():
+    first = server.score_resumes([copy.deepcopy(STRONG), WEAK], "google")
+    for _ in range(3):
+        assert server.score_resumes([copy.deepcopy(STRONG), WEAK], "google") == first
+
+
+def test_score_does_not_depend_on_batch_composition():
+    alone = server.score_resumes([STRONG], "google")[0]
+    batched = server.score_resumes([WEAK, STRONG, {}], "google")[1]
+    assert alone == batched
+
+
+def test_score_does_not_depend_on_key_order():
+    reordered = dict(reversed(list(STRONG.items())))
+    assert server.score_resumes([reordered], "google") == server.score_resumes([STRONG], "google")
+
+
+def test_stronger_resume_scores_higher():
+    strong, weak, empty = server.score_resumes([STRONG, WEAK, {}], "google")
+    assert 0 <= empty["score"] < weak["score"] < strong["score"] <= 10
+    assert {"Python", "Kubernetes", "PyTorch"} <= set(strong["matched_skills"])
+    assert strong["breakdown"]["impact"] == 1.0
+    assert strong["version"] == server.ATS_SCORER_VERSION
+
+
+@pytest.mark.parametrize("company", sorted(server.RESUME_TEMPLATES))
+def test_every_template_scores(company):
+    (result,) = server.score_resumes([STRONG], company)
+    assert 0 <= result["score"] <= 10
+    assert set(result["breakdown"]) == set(server.ATS_WEIGHTS)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.size = None
+
+    def batch_size(self, size):
+        self.size = size
+        return self
+
+    async def to_list(self, length):
+        batch, self.docs = self.docs[:length], self.docs[length:]
+        return batch
+
+
+class FakeResumes:
+    def __init__(self, docs):
+        self.docs = {doc["id"]: doc for doc in docs}
+        self.writes = []
+
+    def find(self, query, projection):
+        return FakeCursor(copy.deepcopy(list(self.docs.values())))
+
+    async def bulk_write(self, ops, ordered=True):
+        self.writes.append(len(ops))
+        for op in ops:
+            self.docs[op._filter["id"]].update(op._doc["$set"])
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.resumes = FakeResumes(docs)
+
+
+@pytest.fixture
+def resumes(monkeypatch):
+    docs = [
+        {"id": "r1", "company": "google", "content": STRONG},
+        {"id": "r2", "company": "Amazon", "content": WEAK},
+        {"id": "r3", "company": "unknown-co", "content": STRONG},
+        {"id": "r4", "company": None, "content": None},
+        {"id": "r5", "company": "microsoft", "content": STRONG},
+    ]
+    fake = FakeDB(docs)
+    monkeypatch.setattr(server, "db", fake)
+    return fake.resumes
+
+
+def test_rescore_stores_scores_in_batches(resumes):
+    assert asyncio.run(server.rescore_stored_resumes(batch_size=2)) == 5
+    assert resumes.writes == [2, 2, 1]
+    google = server.score_resumes([STRONG, WEAK, {}], "google")
+    assert {k: v for k, v in resumes.docs["r1"]["ats"].items() if k != "scored_at"} == google[0]
+    # Unknown companies fall back to the google template
+    assert {k: v for k, v in resumes.docs["r3"]["ats"].items() if k != "scored_at"} == google[0]
+    assert {k: v for k, v in resumes.docs["r4"]["ats"].items() if k != "scored_at"} == google[2]
+    amazon = server.score_resumes([WEAK], "amazon")[0]
+    assert {k: v for k, v in resumes.docs["r2"]["ats"].items() if k != "scored_at"} == amazon
+
@@ -0,0 +1,97 @@
+import asyncio
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+class FakeUsers:
+    def __init__(self, docs):
+        self.docs = {doc["id"]: doc for doc in docs}
+        self.reads = 0
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        doc = self.docs.get(query.get("id"))
+        if doc is None:
+            return None
+        if projection and any(value == 1 for value in projection.values()):
+            return {key: doc[key] for key in projection if key in doc and projection[key] == 1}
+        return {key: value for key, value in doc.items() if projection is None or projection.get(key, 1)}
+
+
+class FakeResumes:
+    def find(self, query, projection):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length):
+        return []
+
+
+class FakeDB:
+    def __init__(self, docs):
+        self.users = FakeUsers(docs)
+        self.resumes = FakeResumes()
+
+
+@pytest.fixture
+def users(monkeypatch):
+    monkeypatch.setattr(server, "STATELESS_TOKENS", True)
+    fake = FakeDB([
+        {"id": "u1", "email": "a@example.com", "role": "SDE", "level": "Beginner", "points": 0, "token_version": 0},
+    ])
+    monkeypatch.setattr(server, "db", fake)
+    server.invalidate_user_cache("u1")
+    yield fake.users
+    server.invalidate_user_cache("u1")
+
+
+def auth(user):
+    return {"Authorization": f"Bearer {server.create_token(user['id'], user['email'], user)}"}
+
+
+def test_tokens_only_claim_what_the_fast_path_reads():
+    token = server.create_token("u1", "a@example.com", {"role": "SDE", "level": "Beginner", "points": 40})
+    claims = jwt.decode(token, server.JWT_SECRET, algorithms=[server.JWT_ALGORITHM]).get("claims", {})
+    assert "points" not in claims
+
+
+@pytest.mark.parametrize("path, method", [("/api/metrics", "get"), ("/api/admin/resumes/rescore", "post")])
+def test_admin_routes_ignore_the_role_claim(users, path, method):
+    client = TestClient(server.app)
+    doc = users.docs["u1"]
+    # A token claiming admin while the database says otherwise
+    forged_claims = auth({**doc, "role": server.ADMIN_ROLE})
+    assert getattr(client, method)(path, headers=forged_claims).status_code == 403
+
+    # Granting the role in the database applies to a token that predates the grant
+    token = auth(doc)
+    doc["role"] = server.ADMIN_ROLE
+    assert getattr(client, method)(path, headers=token).status_code == 200
+
+    # And revoking it applies immediately, despite the user cache
+    doc["role"] = "SDE"
+    assert getattr(client, method)(path, headers=token).status_code == 403
+
+
+def test_rescore_route_reports_the_scorer_version(users):
+    users.docs["u1"]["role"] = server.ADMIN_ROLE
+    response = TestClient(server.app).post("/api/admin/resumes/rescore", headers=auth(users.docs["u1"]))
+    assert response.json() == {"scored": 0, "version": server.ATS_SCORER_VERSION}
+
+
+def test_level_changes_bump_token_version(users):
+    pipelines = []
+
+    async def find_one_and_update(query, update, projection=None, return_document=None):
+        pipelines.append(update)
+        return {"id": "u1", "email": "a@example.com", "points": 10, "level": "Beginner", "token_version": 1}
+
+    users.find_one_and_update = find_one_and_update
+    asyncio.run(server.record_completion("u1", "arr-001", 10, "now", {"_id": 0}))
+    assert pipelines[0][-1]["$set"]["token_version"] == server.LEVEL_TOKEN_VERSION["token_version"]
@@ -0,0 +1,117 @@
+import asyncio
+
+import server
+
+SLOW = {"status": "ok", "passed": False, "complexity": {"inferred": "O(n^2)", "budget": "O(n log n)", "within_budget": False}}
+FAST = {"status": "ok", "passed": True, "complexity": {"inferred": "O(n)", "budget": "O(n log n)", "within_budget": True}}
+
+
+def counting_runner(result):
+    calls = []
+
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return dict(result)
+
+    return run, calls
+
+
+def test_hash_ignores_comments_and_spacing():
+    a = "def f(x):\n    return x + 1\n"
+    b = "# add one\ndef f( x ):\n\n    return x+1  # done\n"
+    assert server.normalized_code_hash(a) == server.normalized_code_hash(b)
+    assert server.normalized_code_hash(a) != server.normalized_code_hash("def f(x):\n    return x + 2\n")
+
+
+def test_hash_of_unparsable_code_is_stable():
+    assert server.normalized_code_hash("def (") == server.normalized_code_hash("def (")
+
+
+def test_clean_results_are_reused():
+    cache = server.GradeCache(10, 60)
+    run, calls = counting_runner(FAST)
+
+    async def go():
+        return [await cache.get_or_run("k", run) for _ in range(3)]
+
+    results = asyncio.run(go())
+    assert calls == [1]
+    assert results[0] == FAST
+    assert cache.hits == 2 and cache.misses == 1
+
+
+def test_concurrent_identical_gradings_share_one_run():
+    cache = server.GradeCache(10, 60)
+    run, calls = counting_runner(FAST)
+
+    async def go():
+        return await asyncio.gather(*(cache.get_or_run("k", run) for _ in range(5)))
+
+    assert asyncio.run(go()) == [FAST] * 5
+    assert calls == [1]
+
+
+def test_failed_runs_and_slow_verdicts_are_not_cached():
+    for result in ({"status": "timeout"}, {"status": "error"}, SLOW):
+        cache = server.GradeCache(10, 60)
+        run, calls = counting_runner(result)
+
+        async def go():
+            await cache.get_or_run("k", run)
+            await cache.get_or_run("k", run)
+
+        asyncio.run(go())
+        assert calls == [1, 1], result
+
+
+def test_entries_expire_and_evict():
+    cache = server.GradeCache(2, 0)
+    cache.put("a", FAST)
+    assert cache.get("a") is None and cache.expirations == 1
+
+    cache = server.GradeCache(2, 60)
+    for key in "abc":
+        cache.put(key, FAST)
+    assert cache.get("a") is None and cache.get("c") == FAST and cache.evictions == 1
+
+
+def test_a_failed_run_fails_its_waiters_and_frees_the_key():
+    cache = server.GradeCache(10, 60)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("sandbox unavailable")
+
+    async def go():
+        results = await asyncio.gather(*(cache.get_or_run("k", failing) for _ in range(3)), return_exceptions=True)
+        assert cache._inflight == {}
+        run, _ = counting_runner(FAST)
+        return results, await cache.get_or_run("k", run)
+
+    results, retried = asyncio.run(go())
+    assert calls == [1]
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == FAST
+
+
+def test_a_cancelled_run_does_not_leave_the_key_busy():
+    cache = server.GradeCache(10, 60)
+
+    async def hanging():
+        await asyncio.sleep(60)
+
+    async def go():
+        owner = asyncio.create_task(cache.get_or_run("k", hanging))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_run("k", hanging))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.gather(owner, waiter, return_exceptions=True)
+        assert cache._inflight == {}
+        run, _ = counting_runner(FAST)
+        return await cache.get_or_run("k", run)
+
+    assert asyncio.run(go()) == FAST
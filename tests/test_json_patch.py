@@ -0,0 +1,226 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+# RFC 6902 appendix A examples
+
+def test_add_object_member():
+    assert server.apply_json_patch({"foo": "bar"}, [{"op": "add", "path": "/baz", "value": "qux"}]) == {"foo": "bar", "baz": "qux"}
+
+
+def test_add_array_element():
+    doc = {"foo": ["bar", "baz"]}
+    assert server.apply_json_patch(doc, [{"op": "add", "path": "/foo/1", "value": "qux"}]) == {"foo": ["bar", "qux", "baz"]}
+
+
+def test_remove_array_element():
+    doc = {"foo": ["bar", "qux", "baz"]}
+    assert server.apply_json_patch(doc, [{"op": "remove", "path": "/foo/1"}]) == {"foo": ["bar", "baz"]}
+
+
+def test_move_array_element():
+    doc = {"foo": ["all", "grass", "cows", "eat"]}
+    result = server.apply_json_patch(doc, [{"op": "move", "from": "/foo/1", "path": "/foo/3"}])
+    assert result == {"foo": ["all", "cows", "eat", "grass"]}
+
+
+def test_append_with_dash():
+    doc = {"foo": ["bar"]}
+    assert server.apply_json_patch(doc, [{"op": "add", "path": "/foo/-", "value": ["abc"]}]) == {"foo": ["bar", ["abc"]]}
+
+
+def test_escaped_pointer_tokens():
+    doc = {"/": 9, "~1": 10}
+    assert server.apply_json_patch(doc, [{"op": "test", "path": "/~01", "value": 10}]) == doc
+    assert server.apply_json_patch(doc, [{"op": "replace", "path": "/~1", "value": 1}]) == {"/": 1, "~1": 10}
+
+
+def test_failed_test_is_a_conflict():
+    with pytest.raises(server.JsonPatchError) as exc:
+        server.apply_json_patch({"baz": "qux"}, [{"op": "test", "path": "/baz", "value": "bar"}])
+    assert exc.value.status_code == 409
+
+
+def test_add_to_nonexistent_target_fails():
+    with pytest.raises(server.JsonPatchError):
+        server.apply_json_patch({"foo": "bar"}, [{"op": "add", "path": "/baz/bat", "value": "qux"}])
+
+
+def test_failed_patch_leaves_the_document_untouched():
+    doc = {"a": [1]}
+    with pytest.raises(server.JsonPatchError):
+        server.apply_json_patch(doc, [{"op": "add", "path": "/a/-", "value": 2}, {"op": "remove", "path": "/missing"}])
+    assert doc == {"a": [1]}
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "add", "path": "/a/5", "value": 1},
+    {"op": "add", "path": "/a/01", "value": 1},
+    {"op": "remove", "path": "/a/-"},
+    {"op": "move", "from": "/a", "path": "/a/0"},
+    {"op": "replace", "path": "/a/0"},
+    {"op": "frobnicate", "path": "/a"},
+    {"op": "add", "path": "a", "value": 1},
+])
+def test_invalid_operations_are_rejected(op):
+    with pytest.raises(server.JsonPatchError):
+        server.apply_json_patch({"a": [1]}, [op])
+
+
+def test_patched_sections():
+    ops = [
+        {"op": "test", "path": "/skip", "value": 1},
+        {"op": "replace", "path": "/summary", "value": "x"},
+        {"op": "move", "from": "/old", "path": "/new/0"},
+    ]
+    assert server.patched_sections(ops) == {"summary", "old", "new"}
+    assert server.patched_sections([{"op": "replace", "path": "", "value": {}}]) == {None}
+
+
+# Write buffer
+
+class FakeUpdateResult:
+    def __init__(self, matched_count):
+        self.matched_count = matched_count
+
+
+class FakeResumes:
+    def __init__(self, doc):
+        self.doc = doc
+        self.updates = []
+        self.failing = False
+
+    async def find_one(self, query, projection=None):
+        if query.get("id") == self.doc["id"] and query.get("user_id") == self.doc["user_id"]:
+            return {"content": self.doc["content"], "revision": self.doc["revision"]}
+        return None
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+        if self.failing:
+            raise RuntimeError("primary stepped down")
+        if query["revision"] != self.doc["revision"]:
+            return FakeUpdateResult(0)
+        for key, value in update.get("$set", {}).items():
+            if key.startswith("content."):
+                self.doc["content"][key[len("content."):]] = value
+            else:
+                self.doc[key] = value
+        for key in update.get("$unset", {}):
+            self.doc["content"].pop(key[len("content."):], None)
+        return FakeUpdateResult(1)
+
+
+class FakeDB:
+    def __init__(self, doc):
+        self.resumes = FakeResumes(doc)
+
+
+@pytest.fixture
+def resumes(monkeypatch):
+    fake = FakeDB({"id": "r1", "user_id": "u1", "content": {"summary": "hi"}, "revision": 1})
+    monkeypatch.setattr(server, "db", fake)
+    return fake.resumes
+
+
+def make_buffer(max_retries=2):
+    # Long delays so flushes only happen when the test asks for them
+    return server.ResumeWriteBuffer(3600, 3600, max_retries)
+
+
+@pytest.mark.parametrize("ops", [
+    [{"op": "add", "path": "/a.b", "value": 1}],
+    [{"op": "add", "path": "/$where", "value": 1}],
+    [{"op": "add", "path": "/", "value": 1}],
+    [{"op": "replace", "path": "", "value": {"ok": 1, "a.b": 2}}],
+    [{"op": "copy", "from": "/summary", "path": "/$set"}],
+])
+def test_unaddressable_section_names_are_rejected(resumes, ops):
+    buffer = make_buffer()
+
+    async def go():
+        with pytest.raises(HTTPException) as exc:
+            await buffer.apply("u1", "r1", 1, ops)
+        return exc.value
+
+    assert asyncio.run(go()).status_code == 422
+    assert buffer.metrics()["pending"] == 0
+
+
+def test_flush_writes_only_changed_sections(resumes):
+    buffer = make_buffer()
+
+    async def go():
+        revision = await buffer.apply("u1", "r1", 1, [{"op": "add", "path": "/skills", "value": ["py"]}])
+        revision = await buffer.apply("u1", "r1", revision, [{"op": "remove", "path": "/summary"}])
+        await buffer.flush("r1")
+        return revision
+
+    assert asyncio.run(go()) == 3
+    assert resumes.updates == [{
+        "$set": {"content.skills": ["py"], "revision": 3, "updated_at": resumes.updates[0]["$set"]["updated_at"]},
+        "$unset": {"content.summary": ""},
+    }]
+    assert resumes.doc["content"] == {"skills": ["py"]}
+    assert resumes.doc["revision"] == 3
+
+
+def test_legacy_section_names_are_written_as_a_whole(resumes):
+    resumes.doc["content"]["a.b"] = 1
+    buffer = make_buffer()
+
+    async def go():
+        await buffer.apply("u1", "r1", 1, [{"op": "remove", "path": "/a.b"}])
+        await buffer.flush("r1")
+
+    asyncio.run(go())
+    assert resumes.updates[0]["$set"]["content"] == {"summary": "hi"}
+
+
+def test_failing_flush_gives_up_and_reports_the_loss(resumes):
+    resumes.failing = True
+    buffer = make_buffer(max_retries=2)
+
+    async def go():
+        await buffer.apply("u1", "r1", 1, [{"op": "replace", "path": "/summary", "value": "new"}])
+        for _ in range(3):
+            await buffer.flush("r1")
+        with pytest.raises(HTTPException) as exc:
+            await buffer.apply("u1", "r1", 2, [{"op": "replace", "path": "/summary", "value": "newer"}])
+        return exc.value
+
+    error = asyncio.run(go())
+    assert len(resumes.updates) == 3
+    assert error.status_code == 409
+    assert error.detail == {"message": "Recent edits could not be saved", "revision": 1}
+    assert buffer.metrics()["failures"] == 1
+    assert buffer.metrics()["pending"] == 0
+
+    # After reloading, the client can keep editing from the stored revision
+    resumes.failing = False
+
+    async def resume_editing():
+        await buffer.apply("u1", "r1", 1, [{"op": "replace", "path": "/summary", "value": "again"}])
+        await buffer.flush("r1")
+
+    asyncio.run(resume_editing())
+    assert resumes.doc["content"] == {"summary": "again"}
+
+
+def test_transient_flush_failure_is_retried(resumes):
+    resumes.failing = True
+    buffer = make_buffer(max_retries=2)
+
+    async def go():
+        await buffer.apply("u1", "r1", 1, [{"op": "replace", "path": "/summary", "value": "new"}])
+        await buffer.flush("r1")
+        resumes.failing = False
+        await buffer.flush("r1")
+
+    asyncio.run(go())
+    assert resumes.doc["content"] == {"summary": "new"}
+    assert buffer.metrics()["failures"] == 0
@@ -0,0 +1,56 @@
+import numpy as np
+
+import server
+
+
+def make_cache(max_size=100):
+    return server.LLMResponseCache({"bro_chat": "semantic", "github_draft": "exact"}, max_size, 60, 0.8)
+
+
+def key(query, scope="Beginner|SDE|general", private=()):
+    return server.LLMCacheKey(scope, query, private)
+
+
+def test_similar_query_hits_within_scope_only():
+    cache = make_cache()
+    cache.put("bro_chat", key("How do I prepare for coding interviews?"), "Practice daily.")
+    assert cache.get("bro_chat", key("how do i prepare for coding interviews")) == "Practice daily."
+    assert cache.get("bro_chat", key("how do I prepare for my coding interviews")) == "Practice daily."
+    assert cache.get("bro_chat", key("How do I prepare for coding interviews?", scope="Advanced|SDE|general")) is None
+    assert cache.get("bro_chat", key("What is a linked list?")) is None
+    assert cache.semantic_hits == 1
+
+
+def test_exact_routes_do_not_match_by_similarity():
+    cache = make_cache()
+    cache.put("github_draft", key("todo app in react"), "README")
+    assert cache.get("github_draft", key("Todo app in React.")) == "README"
+    assert cache.get("github_draft", key("todo app in react native")) is None
+
+
+def test_private_replies_are_not_cached():
+    cache = make_cache()
+    cache.put("bro_chat", key("hi", private=("Asha",)), "Hi Asha!")
+    assert cache.get("bro_chat", key("hi")) is None
+    assert cache.private_skips == 1
+
+
+def test_evicted_queries_leave_the_index():
+    cache = make_cache(max_size=2)
+    for query in ("arrays basics", "graph traversal tips", "dynamic programming help"):
+        cache.put("bro_chat", key(query), query.upper())
+    assert cache.get("bro_chat", key("arrays basics")) is None
+    assert cache.get("bro_chat", key("dynamic programming help")) == "DYNAMIC PROGRAMMING HELP"
+
+
+def test_embedding_index_reuses_rows_and_grows():
+    index = server.EmbeddingIndex(server.LLM_CACHE_EMBED_DIM, capacity=2)
+    vectors = {f"q{i}": server.embed_query(f"question number {i} about topic {i}") for i in range(5)}
+    for query, vector in vectors.items():
+        index.add(query, vector)
+    assert len(index) == 5 and len(index.matrix) >= 5
+    index.remove("q1")
+    index.add("q5", server.embed_query("a brand new question"))
+    assert len(index.queries) == 5 and index.rows["q5"] == 1
+    nearest, score = index.nearest(vectors["q3"])
+    assert nearest == "q3" and np.isclose(score, 1.0)
@@ -0,0 +1,122 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import server
+
+
+class FakeUpdateResult:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class FakeMigrations:
+    """Just enough of the `migrations` collection for run_migrations()."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        for key, condition in query.items():
+            if isinstance(condition, dict):
+                if not doc.get(key) < condition["$lt"]:
+                    return False
+            elif doc.get(key) != condition:
+                return False
+        return True
+
+    async def insert_one(self, doc):
+        if doc["version"] in self.docs:
+            raise DuplicateKeyError("duplicate version")
+        self.docs[doc["version"]] = dict(doc)
+
+    async def update_one(self, query, update):
+        for doc in self.docs.values():
+            if self._matches(doc, query):
+                doc.update(update["$set"])
+                return FakeUpdateResult(1)
+        return FakeUpdateResult(0)
+
+    async def delete_one(self, query):
+        for version, doc in list(self.docs.items()):
+            if self._matches(doc, query):
+                del self.docs[version]
+                return
+
+
+class FakeDB:
+    def __init__(self):
+        self.migrations = FakeMigrations()
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(server, "db", fake)
+    return fake
+
+
+def install(monkeypatch, migrate):
+    monkeypatch.setattr(server, "MIGRATIONS", [(1, "test migration", migrate)])
+
+
+def test_applied_migration_runs_once(fake_db, monkeypatch):
+    calls = []
+
+    async def migrate():
+        calls.append(1)
+        return 3
+
+    install(monkeypatch, migrate)
+    asyncio.run(server.run_migrations())
+    asyncio.run(server.run_migrations())
+    assert calls == [1]
+    assert fake_db.migrations.docs[1]["applied_at"] is not None
+    assert fake_db.migrations.docs[1]["result"] == 3
+
+
+def test_failed_migration_releases_its_claim_and_is_retried(fake_db, monkeypatch):
+    attempts = []
+
+    async def migrate():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+        return 0
+
+    install(monkeypatch, migrate)
+    with pytest.raises(RuntimeError):
+        asyncio.run(server.run_migrations())
+    assert 1 not in fake_db.migrations.docs
+
+    asyncio.run(server.run_migrations())
+    assert len(attempts) == 2
+    assert fake_db.migrations.docs[1]["applied_at"] is not None
+
+
+def test_live_claim_is_left_to_its_holder(fake_db, monkeypatch):
+    calls = []
+
+    async def migrate():
+        calls.append(1)
+
+    install(monkeypatch, migrate)
+    fake_db.migrations.docs[1] = {"version": 1, "started_at": datetime.now(timezone.utc).isoformat(), "applied_at": None}
+    asyncio.run(server.run_migrations())
+    assert calls == []
+
+
+def test_stale_claim_is_taken_over(fake_db, monkeypatch):
+    calls = []
+
+    async def migrate():
+        calls.append(1)
+
+    install(monkeypatch, migrate)
+    started = datetime.now(timezone.utc) - timedelta(seconds=server.MIGRATION_LEASE_SECONDS + 60)
+    fake_db.migrations.docs[1] = {"version": 1, "started_at": started.isoformat(), "applied_at": None}
+    asyncio.run(server.run_migrations())
+    assert calls == [1]
+    assert fake_db.migrations.docs[1]["applied_at"] is not None
@@ -0,0 +1,115 @@
+import io
+import warnings
+from html.parser import HTMLParser
+
+import pytest
+from pypdf import PdfReader
+
+import server
+
+RESUME = {
+    "id": "r1",
+    "company": "google",
+    "template": "modern",
+    "revision": 3,
+    "content": {
+        "name": "Asha Rao",
+        "email": "asha@example.com",
+        "summary": "Engineer (backend) who writes C:\\tools and ships.",
+        "experience": "Cut p99 latency by 40%.\nLed a team of 5.",
+        "skills": ["Python", "Go"],
+        "hobbies": "Chess",
+    },
+}
+
+
+def read_pdf(body):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        return PdfReader(io.BytesIO(body), strict=True)
+
+
+@pytest.mark.parametrize("style", sorted(server.RESUME_RENDER_STYLES))
+def test_pdf_parses_and_contains_every_section(style):
+    reader = read_pdf(server.render_resume_pdf(RESUME, server.RESUME_RENDER_STYLES[style]))
+    text = "\n".join(page.extract_text() for page in reader.pages)
+    for expected in ("Asha Rao", "asha@example.com", "SUMMARY", "Engineer (backend) who writes C:\\tools",
+                     "Cut p99 latency by 40%.", "SKILLS", "Python", "HOBBIES", "Chess"):
+        assert expected in text
+    fonts = {font["/BaseFont"] for font in reader.pages[0]["/Resources"]["/Font"].values()}
+    style_fonts = server.RESUME_RENDER_STYLES[style]
+    assert fonts == {"/" + style_fonts["font"], "/" + style_fonts["bold"]}
+
+
+def test_long_pdf_breaks_into_pages():
+    long = {**RESUME, "content": {**RESUME["content"], "experience": "\n".join(f"Shipped feature {i}" for i in range(200))}}
+    reader = read_pdf(server.render_resume_pdf(long, server.RESUME_RENDER_STYLES["modern"]))
+    assert len(reader.pages) > 1
+    text = "\n".join(page.extract_text() for page in reader.pages)
+    assert "Shipped feature 0" in text and "Shipped feature 199" in text
+    for page in reader.pages:
+        assert [float(v) for v in page.mediabox] == [0, 0, 595, 842]
+
+
+def test_pdf_replaces_unencodable_characters():
+    resume = {**RESUME, "content": {"name": "Zoë 李", "summary": "naïve – café"}}
+    text = read_pdf(server.render_resume_pdf(resume, server.RESUME_RENDER_STYLES["modern"])).pages[0].extract_text()
+    assert "Zoë ?" in text
+    assert "naïve – café" in text
+
+
+def test_empty_resume_still_renders():
+    reader = read_pdf(server.render_resume_pdf({"id": "r", "content": {}}, server.RESUME_RENDER_STYLES["classic"]))
+    assert "Resume" in reader.pages[0].extract_text()
+
+
+class Collector(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.headings = []
+        self.tags = []
+        self._in_h2 = False
+
+    def handle_starttag(self, tag, attrs):
+        self.tags.append(tag)
+        self._in_h2 = tag == "h2"
+
+    def handle_data(self, data):
+        if self._in_h2:
+            self.headings.append(data)
+            self._in_h2 = False
+
+
+def test_html_escapes_content():
+    resume = {**RESUME, "content": {"name": "<script>alert(1)</script>", "summary": "a < b & \"c\""}}
+    body = server.render_resume_html(resume, server.RESUME_RENDER_STYLES["modern"]).decode()
+    assert "<script>" not in body
+    assert "a &lt; b &amp; &quot;c&quot;" in body
+    parser = Collector()
+    parser.feed(body)
+    assert "script" not in parser.tags
+
+
+def test_html_sections_follow_the_template_order():
+    body = server.render_resume_html(RESUME, server.RESUME_RENDER_STYLES["classic"]).decode()
+    parser = Collector()
+    parser.feed(body)
+    assert parser.headings == ["Summary", "Experience", "Skills", "Hobbies"]
+    assert "Georgia" in body
+
+
+def test_render_cache_evicts_least_recently_used(tmp_path):
+    cache = server.ResumeRenderCache(tmp_path, max_bytes=10)
+    cache.start()
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    assert cache.get("a") == b"12345"
+    cache.put("c", b"12345")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.out", "c.out"]
+
+    reopened = server.ResumeRenderCache(tmp_path, max_bytes=10)
+    reopened.start()
+    assert reopened.metrics()["files"] == 2
+    assert reopened.get("c") == b"12345"
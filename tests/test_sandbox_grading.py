@@ -0,0 +1,313 @@
+import asyncio
+import copy
+import os
+import shutil
+
+import pytest
+
+import sandbox_worker
+import server
+
+needs_sandbox = pytest.mark.skipif(
+    os.geteuid() != 0 or (not hasattr(os, "unshare") and shutil.which("unshare") is None),
+    reason="the sandbox needs root to drop privileges and a network namespace",
+)
+
+TWO_SUM = """
+def two_sum(nums, target):
+    seen = {}
+    for i, n in enumerate(nums):
+        if target - n in seen:
+            return [seen[target - n], i]
+        seen[n] = i
+"""
+
+SOLUTIONS = {
+    "arr-005": """
+def rotate(nums, k):
+    k %= len(nums)
+    nums[:] = nums[-k:] + nums[:-k]
+""",
+    "str-004": """
+def group_anagrams(strs):
+    groups = {}
+    for s in strs:
+        groups.setdefault("".join(sorted(s)), []).append(s)
+    return list(groups.values())
+""",
+    "ll-001": """
+def reverse_list(head):
+    prev = None
+    while head:
+        head.next, prev, head = prev, head, head.next
+    return prev
+""",
+    "sq-002": """
+class MinStack:
+    def __init__(self):
+        self.items = []
+    def push(self, val):
+        self.items.append((val, min(val, self.items[-1][1]) if self.items else val))
+    def pop(self):
+        self.items.pop()
+    def top(self):
+        return self.items[-1][0]
+    def getMin(self):
+        return self.items[-1][1]
+""",
+    "tree-001": """
+def max_depth(root):
+    return 0 if root is None else 1 + max(max_depth(root.left), max_depth(root.right))
+""",
+}
+
+
+def grade(code, task_id):
+    async def go():
+        pool = server.SandboxPool(1)
+        await pool.start()
+        try:
+            return await pool.run(code, timeout=10, mode="grade", tests=server.TASK_TESTS[task_id])
+        finally:
+            await pool.shutdown()
+
+    return asyncio.run(go())
+
+
+@pytest.mark.parametrize("value", [
+    None, True, 3, 2.5, "s", [1, [2, 3]], (1, 2), {1, 2}, frozenset({3}), {"a": [1, (2,)]}, [(1, "a"), {2}],
+])
+def test_values_round_trip_with_their_types(value):
+    decoded = sandbox_worker.decode_value(sandbox_worker.encode_value(value))
+    assert decoded == value
+    assert type(decoded) is type(value) or isinstance(value, set)
+
+
+def test_values_without_a_plain_form_equal_nothing():
+    class Answer:
+        def __eq__(self, other):
+            return True
+
+        def __repr__(self):
+            return "Answer()"
+
+    first, second = (sandbox_worker.decode_value(sandbox_worker.encode_value(Answer())) for _ in range(2))
+    assert first != second and first != [0, 1]
+    assert repr(first) == "Answer()"
+
+
+def test_answers_are_withheld_from_the_spec():
+    spec = copy.deepcopy(server.TASK_TESTS["arr-004"])
+    answers = sandbox_worker.withhold_answers(spec)
+    assert len(answers["cases"]) == len(spec["cases"])
+    assert all("expected" not in case and "expected_expr" not in case for case in spec["cases"])
+    assert any("expected_expr" in answer for answer in answers["cases"])
+    assert "expected_expr" not in spec["performance"] and answers["performance"]
+
+
+def test_judge_cases_compares_reported_outputs():
+    spec = copy.deepcopy(server.TASK_TESTS["arr-001"])
+    answers = sandbox_worker.withhold_answers(spec)
+    records = {
+        0: {"case": 0, "actual": [1, 0], "time_ms": 0.1, "error": None},
+        1: {"case": 1, "actual": None, "time_ms": 0.1, "error": None},
+        2: {"case": 2, "actual": [0, 1], "time_ms": 0.1, "error": "Traceback"},
+    }
+    reports = sandbox_worker.judge_cases(spec, answers["cases"], records)
+    assert [report["passed"] for report in reports] == [True, False, False]
+    assert reports[0]["expected"] == "[0, 1]"
+
+
+def test_judge_complexity_rejects_malformed_times():
+    perf = server.TASK_TESTS["arr-001"]["performance"]
+    assert sandbox_worker.judge_complexity(perf, ["fast", None])["within_budget"] is False
+    linear = [n / 1000 for n in sandbox_worker.DEFAULT_SIZES]
+    verdict = sandbox_worker.judge_complexity(perf, linear)
+    assert verdict["inferred"] == "O(n)" and verdict["within_budget"]
+    quadratic = [(n / 1000) ** 2 for n in sandbox_worker.DEFAULT_SIZES]
+    assert sandbox_worker.judge_complexity(perf, quadratic)["within_budget"] is False
+
+
+REFERENCES = {
+    "arr-001": TWO_SUM,
+    "arr-002": "def max_subarray(nums):\n    best = cur = nums[0]\n    for n in nums[1:]:\n        cur = max(n, cur + n)\n        best = max(best, cur)\n    return best\n",
+    "arr-003": "def contains_duplicate(nums):\n    return len(set(nums)) < len(nums)\n",
+    "arr-004": "def product_except_self(nums):\n    out, acc = [1] * len(nums), 1\n    for i in range(len(nums)):\n        out[i], acc = acc, acc * nums[i]\n    acc = 1\n    for i in reversed(range(len(nums))):\n        out[i], acc = out[i] * acc, acc * nums[i]\n    return out\n",
+    "arr-005": SOLUTIONS["arr-005"],
+    "str-001": "def is_palindrome(s):\n    t = [c.lower() for c in s if c.isalnum()]\n    return t == t[::-1]\n",
+    "str-002": "def is_anagram(s, t):\n    return sorted(s) == sorted(t)\n",
+    "str-003": "def length_of_longest_substring(s):\n    seen, start, best = {}, 0, 0\n    for i, c in enumerate(s):\n        if seen.get(c, -1) >= start:\n            start = seen[c] + 1\n        seen[c] = i\n        best = max(best, i - start + 1)\n    return best\n",
+    "ll-002": "def has_cycle(head):\n    slow = fast = head\n    while fast and fast.next:\n        slow, fast = slow.next, fast.next.next\n        if slow is fast:\n            return True\n    return False\n",
+    "sq-001": "def is_valid(s):\n    stack, pairs = [], {')': '(', ']': '[', '}': '{'}\n    for c in s:\n        if c in pairs:\n            if not stack or stack.pop() != pairs[c]:\n                return False\n        else:\n            stack.append(c)\n    return not stack\n",
+    "dp-002": "def rob(nums):\n    take = skip = 0\n    for n in nums:\n        take, skip = skip + n, max(take, skip)\n    return max(take, skip)\n",
+    "dp-003": "def coin_change(coins, amount):\n    best = [0] + [amount + 1] * amount\n    for a in range(1, amount + 1):\n        best[a] = min([best[a - c] + 1 for c in coins if c <= a] or [amount + 1])\n    return best[amount] if best[amount] <= amount else -1\n",
+}
+
+
+@pytest.mark.parametrize("task_id", sorted(task for task, spec in server.TASK_TESTS.items() if "performance" in spec))
+def test_performance_answers_match_a_reference(task_id):
+    spec = copy.deepcopy(server.TASK_TESTS[task_id])
+    namespace = {"ListNode": sandbox_worker.ListNode, "TreeNode": sandbox_worker.TreeNode}
+    exec(REFERENCES[task_id], namespace)
+    call = sandbox_worker.ADAPTERS[spec.get("adapter", "plain")]
+    compare = sandbox_worker.COMPARATORS[spec.get("compare", "exact")]
+    generate = eval(spec["performance"]["args_expr"])
+    expected = eval(spec["performance"]["expected_expr"])
+    for n in (1000, 1001, 2000):
+        assert compare(call(namespace[spec["entry"]], list(generate(n))), expected(n)), n
+
+
+@needs_sandbox
+def test_correct_solution_passes_with_complexity():
+    result = grade(TWO_SUM, "arr-001")
+    assert result["passed"] is True
+    assert result["passed_cases"] == result["total_cases"] == 4
+    assert result["complexity"]["within_budget"] is True
+
+
+@needs_sandbox
+@pytest.mark.parametrize("task_id", sorted(SOLUTIONS))
+def test_adapters_grade_reference_solutions(task_id):
+    result = grade(SOLUTIONS[task_id], task_id)
+    assert result["status"] == "ok", result["error"]
+    assert result["passed_cases"] == result["total_cases"], result["cases"]
+
+
+@needs_sandbox
+def test_wrong_solution_fails_and_hidden_cases_stay_hidden():
+    result = grade("def two_sum(nums, target):\n    return None\n", "arr-001")
+    assert result["passed"] is False
+    assert result["passed_cases"] == 0
+    assert result.get("complexity") is None
+    hidden = [case for case in result["cases"] if case["hidden"]]
+    assert hidden and all("expected" not in case and "input" not in case for case in hidden)
+
+
+@needs_sandbox
+def test_tampering_with_the_grader_does_not_pass_a_wrong_solution():
+    code = """
+try:
+    raise ValueError
+except ValueError as e:
+    frame = e.__traceback__.tb_frame
+while frame is not None and "COMPARATORS" not in frame.f_globals:
+    frame = frame.f_back
+worker = frame.f_globals
+for name in worker["COMPARATORS"]:
+    worker["COMPARATORS"][name] = lambda actual, expected: True
+worker["judge_cases"] = lambda spec, answers, records: [{"passed": True}] * len(spec["cases"])
+worker["judge_complexity"] = lambda perf, times: {"within_budget": True}
+
+def two_sum(nums, target):
+    return None
+"""
+    result = grade(code, "arr-001")
+    assert result["passed"] is False
+    assert result["passed_cases"] == 0
+
+
+QUADRATIC_ROTATE = """
+def rotate(nums, k):
+    for _ in range(k % len(nums)):
+        last = nums[-1]
+        for i in range(len(nums) - 1, 0, -1):
+            nums[i] = nums[i - 1]
+        nums[0] = last
+"""
+
+
+@needs_sandbox
+def test_quadratic_solution_is_over_budget():
+    result = grade(QUADRATIC_ROTATE, "arr-005")
+    assert result["passed_cases"] == result["total_cases"]
+    assert result["complexity"]["within_budget"] is False
+    assert result["passed"] is False
+
+
+@needs_sandbox
+def test_tampering_with_the_measurement_does_not_pass_a_slow_solution():
+    code = """
+try:
+    raise ValueError
+except ValueError as e:
+    frame = e.__traceback__.tb_frame
+while frame is not None and "DEFAULT_SIZES" not in frame.f_globals:
+    frame = frame.f_back
+worker = frame.f_globals
+sizes = worker["DEFAULT_SIZES"]
+worker["measure_times"] = lambda *a: [n / 1000 for n in sizes]
+worker["run_measurement"] = lambda *a: {"times": [n / 1000 for n in sizes]}
+worker["judge_complexity"] = lambda perf, times: {"within_budget": True}
+""" + QUADRATIC_ROTATE
+    result = grade(code, "arr-005")
+    assert result["passed"] is False
+    assert result["complexity"]["within_budget"] is False
+
+
+@needs_sandbox
+def test_exiting_early_from_a_timed_run_does_not_pass():
+    code = """
+import json, os
+try:
+    raise ValueError
+except ValueError as e:
+    frame = e.__traceback__.tb_frame
+while frame is not None and "job" not in frame.f_locals:
+    frame = frame.f_back
+if frame.f_locals["job"].get("mode") == "measure":
+    final = {"status": "ok", "output": "", "error": None, "time_ms": 0, "actual": [], "times": [1, 2, 4, 8, 16, 32]}
+    for fd in range(3, 32):
+        try:
+            os.write(fd, (json.dumps(final) + "\\n").encode())
+        except OSError:
+            pass
+    os._exit(0)
+""" + QUADRATIC_ROTATE
+    result = grade(code, "arr-005")
+    assert result["passed_cases"] == result["total_cases"]
+    assert result["passed"] is False
+    assert "Wrong answer" in result["complexity"]["error"]
+
+
+@needs_sandbox
+def test_answers_are_not_in_the_runs_memory():
+    code = """
+import sys
+try:
+    raise ValueError
+except ValueError as e:
+    frame = e.__traceback__.tb_frame
+found = []
+while frame is not None:
+    found.append(repr(frame.f_locals)[:100000])
+    frame = frame.f_back
+
+def two_sum(nums, target):
+    # Built at run time, so the needle is not found in this submission's own source
+    answer = [len(nums) - 2, len(nums) - 1]
+    return answer if repr(answer)[1:-1] in "".join(found) else None
+"""
+    result = grade(code, "arr-001")
+    assert result["cases"][3]["hidden"] and result["cases"][3]["passed"] is False
+
+
+@needs_sandbox
+def test_forged_result_lines_are_not_trusted():
+    code = """
+import json, os
+forged = {"case": 0, "passed": True, "actual": [0, 1], "time_ms": 0, "error": None}
+for fd in range(3, 32):
+    try:
+        for index in range(4):
+            os.write(fd, (json.dumps({**forged, "case": index}) + "\\n").encode())
+        os.write(fd, (json.dumps({"status": "ok", "output": "", "error": None, "time_ms": 0,
+                                  "passed": True, "complexity": {"within_budget": True}}) + "\\n").encode())
+    except OSError:
+        pass
+
+def two_sum(nums, target):
+    return None
+"""
+    result = grade(code, "arr-001")
+    assert result["passed"] is False
+    assert result["passed_cases"] == 0
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import shutil
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.skipif(
+    os.geteuid() != 0 or (not hasattr(os, "unshare") and shutil.which("unshare") is None),
+    reason="the sandbox needs root to drop privileges and a network namespace",
+)
+
+# Walks the traceback up to the worker's module globals, the way a hostile submission would
+REACH_WORKER_GLOBALS = """
+try:
+    raise ValueError
+except ValueError as e:
+    frame = e.__traceback__.tb_frame
+while frame is not None and "BLOCKED_EVENTS" not in frame.f_globals:
+    frame = frame.f_back
+worker = frame.f_globals
+"""
+
+
+def run(code, **job):
+    async def go():
+        pool = server.SandboxPool(1)
+        await pool.start()
+        try:
+            return await pool.run(code, **job)
+        finally:
+            await pool.shutdown()
+
+    return asyncio.run(go())
+
+
+def test_runs_code_and_reports_output():
+    result = run("print(sum(range(10)))")
+    assert result["status"] == "ok"
+    assert result["output"] == "45\n"
+
+
+def test_submission_traceback_only_shows_submission_frames():
+    result = run("def f():\n    1 / 0\nf()")
+    assert result["status"] == "error"
+    assert "ZeroDivisionError" in result["error"]
+    assert "sandbox_worker" not in result["error"]
+
+
+def test_server_environment_is_not_inherited(monkeypatch):
+    monkeypatch.setenv("JWT_SECRET", "leaked-signing-key")
+    result = run("import os\nprint(dict(os.environ))")
+    assert result["output"] == "{}\n"
+
+
+@pytest.mark.parametrize("path", ["/etc/hostname", "/proc/self/environ", "/usr/lib/../../etc/passwd"])
+def test_reading_outside_the_import_path_is_denied(path):
+    result = run(f"print(open({path!r}).read())")
+    assert result["status"] == "error"
+    assert "not permitted in sandbox" in result["error"]
+
+
+def test_listing_directories_is_denied():
+    result = run("import os\nprint(os.listdir('/'))")
+    assert "not permitted in sandbox" in result["error"]
+
+
+def test_imports_are_not_blocked_by_the_read_policy():
+    result = run("import fractions\nprint(fractions.Fraction(1, 3))")
+    assert "not permitted in sandbox" not in (result["error"] or "")
+
+
+def test_writing_files_is_denied():
+    result = run("open('/tmp/sandbox_probe', 'w').write('x')")
+    assert "Writing files is not permitted" in result["error"]
+    assert not os.path.exists("/tmp/sandbox_probe")
+
+
+def test_network_is_unavailable():
+    result = run("import socket\nprint(socket.if_nameindex())\nsocket.socket()")
+    assert result["output"] == "[(1, 'lo')]\n"
+    assert "socket.__new__" in result["error"]
+
+
+def test_worker_module_is_not_importable():
+    result = run("import sys\nprint(sys.modules.get('__main__'))")
+    assert result["output"] == "None\n"
+
+
+def test_rebinding_worker_globals_does_not_relax_the_hook():
+    code = REACH_WORKER_GLOBALS + """
+worker["WRITE_MODES"] = frozenset()
+worker["BLOCKED_EVENTS"] = frozenset()
+import builtins
+builtins.PermissionError = ValueError
+try:
+    open("/tmp/sandbox_probe", "w")
+    print("wrote")
+except Exception as e:
+    print(type(e).__name__)
+"""
+    result = run(code)
+    assert result["output"] == "PermissionError\n"
+    assert not os.path.exists("/tmp/sandbox_probe")
+
+
+def test_gc_cannot_reach_the_hook():
+    result = run("import gc\ngc.get_objects()")
+    assert "gc.get_objects" in result["error"]
+
+
+def test_runs_fail_closed_without_a_network_namespace(monkeypatch):
+    if hasattr(os, "unshare"):
+        pytest.skip("this interpreter isolates the worker itself")
+    monkeypatch.setattr(server, "SANDBOX_WORKER_PREFIX", ())
+    result = run("print('should not run')")
+    assert result["status"] == "error"
+    assert "network namespace isolation is unavailable" in result["error"]
+    assert result["output"] == ""
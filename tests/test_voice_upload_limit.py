@@ -0,0 +1,124 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import server
+
+CHUNK = 64 * 1024
+
+
+def multipart(size):
+    return {"audio": ("voice.webm", b"\0" * size, "audio/webm")}
+
+
+def call(path, chunks, content_length=None):
+    """Drive RequestBodyLimit around an app that reads the whole body; returns (status, chunks read)."""
+    pulled = []
+    sent = []
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+
+    async def receive():
+        pulled.append(1)
+        return {"type": "http.request", "body": chunks[len(pulled) - 1], "more_body": len(pulled) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    async def app(scope, receive, send):
+        try:
+            while (await receive()).get("more_body"):
+                pass
+            status = 200
+        except server.HTTPException as e:
+            status = e.status_code
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = server.RequestBodyLimit(app, {"/limited": 4 * CHUNK})
+    scope = {"type": "http", "path": path, "headers": headers}
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], len(pulled)
+
+
+def test_declared_oversized_body_is_rejected_without_reading_it():
+    assert call("/limited", [b"\0" * CHUNK] * 8, content_length=8 * CHUNK) == (413, 0)
+
+
+def test_streamed_body_is_cut_off_once_past_the_limit():
+    assert call("/limited", [b"\0" * CHUNK] * 64) == (413, 5)
+
+
+def test_understated_content_length_does_not_bypass_the_limit():
+    assert call("/limited", [b"\0" * CHUNK] * 64, content_length=CHUNK) == (413, 5)
+
+
+def test_bodies_within_the_limit_and_other_paths_pass():
+    assert call("/limited", [b"\0" * CHUNK] * 4, content_length=4 * CHUNK) == (200, 4)
+    assert call("/other", [b"\0" * CHUNK] * 64) == (200, 64)
+
+
+def test_voice_routes_are_limited():
+    client = TestClient(server.app)
+    assert client.post("/api/bro/voice", files=multipart(server.VOICE_MAX_BYTES + CHUNK)).status_code == 413
+    assert client.post("/api/bro/voice/stream", files=multipart(server.VOICE_MAX_BYTES + CHUNK)).status_code == 413
+    # Small uploads get through to authentication
+    assert client.post("/api/bro/voice", files=multipart(1024)).status_code == 403
+
+
+def parse_form(body, boundary):
+    """Parse `body` the way the voice routes do, behind the body limit; returns (status, form)."""
+    parsed = {}
+
+    async def app(scope, receive, send):
+        request = server.Request(scope, receive)
+        try:
+            parsed["form"] = await request.form()
+            status = 200
+        except server.HTTPException as e:
+            status = e.status_code
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    chunks = [body[i:i + CHUNK] for i in range(0, len(body), CHUNK)]
+    sent = []
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    async def go():
+        middleware = server.RequestBodyLimit(app, server.VOICE_BODY_LIMITS)
+        scope = {"type": "http", "method": "POST", "path": "/api/bro/voice", "query_string": b"",
+                 "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]}
+        await middleware(scope, receive, send)
+        form = parsed.get("form")
+        rolled = form and form["audio"].file._rolled
+        if form:
+            await form.close()
+        return sent[0]["status"], rolled
+
+    return asyncio.run(go())
+
+
+def voice_body(audio_size, boundary="b0undary"):
+    return (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"context\"\r\n\r\nhello\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"audio\"; filename=\"voice.webm\"\r\n"
+        f"Content-Type: audio/webm\r\n\r\n"
+    ).encode() + b"\0" * audio_size + f"\r\n--{boundary}--\r\n".encode()
+
+
+def test_largest_accepted_body_stays_in_memory():
+    assert server.VOICE_MAX_BODY_BYTES <= server.MultiPartParser.max_file_size
+    body = voice_body(server.VOICE_MAX_BODY_BYTES)
+    body = voice_body(server.VOICE_MAX_BODY_BYTES - (len(body) - server.VOICE_MAX_BODY_BYTES) - 1)
+    assert len(body) == server.VOICE_MAX_BODY_BYTES - 1
+    assert parse_form(body, "b0undary") == (200, False)
+
+
+def test_largest_audio_fits_in_the_body_limit():
+    assert len(voice_body(server.VOICE_MAX_BYTES)) <= server.VOICE_MAX_BODY_BYTES
+    assert parse_form(voice_body(server.VOICE_MAX_BODY_BYTES), "b0undary")[0] == 413